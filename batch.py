@@ -0,0 +1,276 @@
+import argparse
+import json
+import multiprocessing
+import resource
+import signal
+import sys
+import time
+
+import rushhour
+import solution_cache
+
+
+# Solves many Rush Hour puzzles with a pool of worker processes
+#
+# The puzzles are read one per line, either as JSON or as plain text:
+#   ["--B---", "--B---", "XXB---", "--AA--", "------", "------"]
+#   {"id": "p1", "board": ["--B---", ...]}  (the board may also be a string)
+#   --B-----B---XXB-----AA--------------   (six rows may also be separated
+#                                           by spaces)
+# A board given as rows may have any number of rows and columns, one given
+# as a single string has to be square. A JSON object may also give the
+# "exit_row" of the board, counted from 0 (the middle row by default, see
+# rushhour.BoardShape).
+# Blank lines and lines starting with '#' are skipped.
+#
+# One JSON object is written per puzzle as soon as it is solved, so the
+# results come out in the order they finish:
+#   index: the line number of the puzzle in the input, starting from 1
+#   id: the id given with the puzzle, if any
+#   status: "solved", "unsolvable", "timeout", "memory", "invalid" or "error"
+#   moves: the number of moves of the solution
+#   explored: the number of states explored
+#   generated: the number of states generated
+#   time: the wall time of the search in seconds
+#   solution: the moves, such as "A+1" (only when asked for)
+#   cached: true when the solution was read from the solution cache
+#   stats: the metrics of the search (see rushhour.SearchStats, only when
+#          asked for and not cached)
+#   reason: why an "unsolvable" puzzle can never be solved, when it was
+#           found without searching (see rushhour.VehicleTable.unsolvable)
+#   error: the reason of an "invalid" or "error" status
+
+
+
+
+# Raised in a worker when a puzzle runs past its time limit
+class PuzzleTimeout(Exception):
+    pass
+
+
+# The options of the search, set in every worker by init_worker()
+options = {}
+
+# The SolutionCache of the worker, if one is used
+cache = None
+
+
+
+
+# This function reads one puzzle from a line of the input
+#   @param:
+#   line: the line of the input
+#
+#   returns (id, rows, exit_row), id being None when it is not given, or
+#   None when the line holds no puzzle
+#   raises ValueError when the line is not a valid puzzle
+def parse_puzzle(line):
+    line = line.strip()
+    if line == "" or line.startswith("#"):
+        return None
+
+    puzzle_id = None
+    exit_row = None
+    if line[0] in "[{\"":
+        board = json.loads(line)
+        if isinstance(board, dict):
+            puzzle_id = board.get("id")
+            exit_row = board.get("exit_row")
+            board = board.get("board")
+    else:
+        board = line.split()
+
+    if isinstance(board, str):
+        board = [board]
+    if not isinstance(board, list) or not board or \
+       not all(isinstance(row, str) for row in board):
+        raise ValueError("the board must be a string or a list of strings")
+    if exit_row is not None and not isinstance(exit_row, int):
+        raise ValueError("the exit row must be an integer")
+    board, shape = rushhour.parse_state(board[0] if len(board) == 1
+                                        else board, exit_row)
+    rushhour.validate_board(board, shape)
+    rows = [board[i:i+shape.width] for i in range(0, shape.size, shape.width)]
+    return puzzle_id, rows, shape.exit_row
+
+
+
+
+# The SIGALRM handler ending the search of a puzzle past its time limit
+def alarm(signum, frame):
+    raise PuzzleTimeout()
+
+
+# Sets up a worker process
+#   @param:
+#   search_options: the options of the search (see solve_batch)
+#   memory_mb: the limit of the address space of the worker in megabytes,
+#              or None for no limit
+#   cache_path: the file of the SolutionCache, or None for no cache
+def init_worker(search_options, memory_mb, cache_path=None):
+    global cache
+    options.update(search_options)
+    signal.signal(signal.SIGALRM, alarm)
+    if cache_path:
+        cache = solution_cache.SolutionCache(cache_path)
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+# This function solves the puzzle on one line of the input
+#   @param:
+#   task: (index, line) of the puzzle
+#
+#   returns the result of the puzzle as a dictionary
+def solve_line(task):
+    index, line = task
+    result = {"index": index}
+    try:
+        puzzle = parse_puzzle(line)
+    except ValueError as error:
+        result["status"] = "invalid"
+        result["error"] = str(error)
+        return result
+    puzzle_id, rows, exit_row = puzzle
+    if puzzle_id is not None:
+        result["id"] = puzzle_id
+
+    extra = {"exit_row": exit_row}
+    if options["stats"]:
+        extra["stats"] = rushhour.SearchStats()
+    start = time.perf_counter()
+    if options["timeout"]:
+        signal.setitimer(signal.ITIMER_REAL, options["timeout"])
+    try:
+        if cache is not None:
+            hits = cache.hits
+            solution = solution_cache.cached_solve(cache, options["heuristic"],
+                                                   rows, options["backend"],
+                                                   options["frontier"],
+                                                   **extra)
+            if cache.hits > hits:
+                result["cached"] = True
+        else:
+            solution = rushhour.solve(options["heuristic"], rows,
+                                      options["backend"], options["frontier"],
+                                      **extra)
+    except PuzzleTimeout:
+        result["status"] = "timeout"
+        return result
+    except MemoryError:
+        result["status"] = "memory"
+        return result
+    except Exception as error:
+        result["status"] = "error"
+        result["error"] = repr(error)
+        return result
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        result["time"] = round(time.perf_counter() - start, 6)
+
+    result["explored"] = solution.expanded
+    result["generated"] = solution.generated
+    if "stats" in solution.info:
+        result["stats"] = solution.info["stats"]
+    if not solution.solved:
+        result["status"] = "unsolvable"
+        if "unsolvable" in solution.info:
+            result["reason"] = solution.info["unsolvable"]
+        return result
+    result["status"] = "solved"
+    result["moves"] = solution.length
+    if options["solution"]:
+        result["solution"] = solution.move_names()
+    return result
+
+
+
+
+# This function solves a stream of puzzles with a pool of processes
+#   @param:
+#   lines: an iterable of the lines of the input
+#   heuristic: the choice of heuristic to use in the search
+#   workers: the number of worker processes (the number of CPUs if None)
+#   chunksize: the number of puzzles sent to a worker at once
+#   timeout: the time limit of one puzzle in seconds, or None
+#   memory_mb: the memory limit of one worker in megabytes, or None
+#   solution: whether the moves of the solutions are returned
+#   backend, frontier: passed on to rushhour.solve()
+#   cache_path: the file of a SolutionCache shared by the workers, or None
+#   stats: whether the metrics of every search are returned
+#
+#   yields the result of every puzzle as soon as it is solved
+def solve_batch(lines, heuristic=0, workers=None, chunksize=1, timeout=None,
+                memory_mb=None, solution=False, backend="vehicles",
+                frontier=None, cache_path=None, stats=False):
+    search_options = {
+        "heuristic": heuristic,
+        "backend": backend,
+        "frontier": frontier,
+        "timeout": timeout,
+        "solution": solution,
+        "stats": stats,
+    }
+    tasks = ((index, line) for index, line in enumerate(lines, 1)
+             if line.strip() and not line.lstrip().startswith("#"))
+    with multiprocessing.Pool(workers, init_worker,
+                              (search_options, memory_mb, cache_path)) as pool:
+        for result in pool.imap_unordered(solve_line, tasks, chunksize):
+            yield result
+
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Solve a file of Rush Hour puzzles in parallel.")
+    parser.add_argument("input", help="puzzle file, one per line ('-' for "
+                                      "standard input)")
+    parser.add_argument("-o", "--output", default="-",
+                        help="JSONL result file ('-' for standard output)")
+    parser.add_argument("--heuristic", type=int, default=0,
+                        help="0 for blocking, 1 for the custom heuristic, "
+                             "2 for the blocker graph heuristic, 3 for the "
+                             "same counting slides")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of worker processes")
+    parser.add_argument("--chunksize", type=int, default=1,
+                        help="puzzles sent to a worker at once")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="time limit per puzzle in seconds")
+    parser.add_argument("--memory-mb", type=int, default=None,
+                        help="memory limit per worker in megabytes")
+    parser.add_argument("--solution", action="store_true",
+                        help="write the moves of every solution")
+    parser.add_argument("--backend", default="vehicles",
+                        choices=sorted(rushhour.BACKENDS))
+    parser.add_argument("--frontier", default=None,
+                        choices=sorted(rushhour.FRONTIERS),
+                        help="the queue of the A* search, by default bucket "
+                             "with heuristics 2 and 3 and heap otherwise")
+    parser.add_argument("--cache", default=None,
+                        help="sqlite file of a solution cache to use")
+    parser.add_argument("--stats", action="store_true",
+                        help="write the metrics of every search")
+    args = parser.parse_args(argv)
+
+    infile = sys.stdin if args.input == "-" else open(args.input)
+    outfile = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        for result in solve_batch(infile, args.heuristic, args.workers,
+                                  args.chunksize, args.timeout,
+                                  args.memory_mb, args.solution,
+                                  args.backend, args.frontier, args.cache,
+                                  args.stats):
+            outfile.write(json.dumps(result) + "\n")
+            outfile.flush()
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+
+
+if __name__ == "__main__":
+    main()
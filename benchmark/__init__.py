@@ -0,0 +1,315 @@
+import json
+import multiprocessing
+import os
+import resource
+import signal
+import time
+
+import rushhour
+
+
+# Benchmarks the search modes and heuristics over a graded corpus
+#
+# CORPUS holds one puzzle per line as a JSON object:
+#   id: the name of the puzzle
+#   grade: "trivial", "easy", "medium", "hard" or "expert", from the
+#          fewest moves to a goal state
+#   board: the gameboard, as one string when it is 6x6, as a list of rows
+#          otherwise
+#   exit_row: the row of the exit, only when the board is not 6x6
+#   distance: the fewest moves to a goal state (as defined by reach_goal),
+#             found by cluster.cluster_distances()
+#   length: the moves of the shortest solution reaching the exit through
+#           such a goal state
+#
+# Every run solves one puzzle with one of CONFIGS in a new process, so the
+# peak memory is its own, and reports
+#   config, id, grade: what was run
+#   status: "solved", "unsolvable", "timeout" or "error"
+#   time: the wall time of the search in seconds
+#   expanded: the number of states expanded
+#   rate: the states expanded per second
+#   peak_rss_kb: the peak resident memory of the process in kilobytes
+#   node_bytes: the bytes of the states recorded by the search (see
+#               rushhour.NodeStore.memory_usage), only for the searches
+#               reporting it
+#   length: the number of moves of the solution
+#   distance: the moves of the solution to its first goal state
+#   correct: whether the distance is the one of the corpus, None when the
+#            configuration is not expected to find the fewest moves
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      "corpus.jsonl")
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        "baseline.json")
+
+GRADES = ("trivial", "easy", "medium", "hard", "expert")
+
+# The configurations benchmarked, each as (heuristic, mode, options, exact),
+# exact telling whether it always finds the fewest moves to a goal state
+# The hda configurations run HDA* with 1, 2, 4 and 8 workers, to measure
+# how it scales with the CPUs of the host.
+CONFIGS = {
+    "astar-blocking": (0, "astar", {}, False),
+    "astar-custom": (1, "astar", {}, False),
+    "astar-blocker-graph": (2, "astar", {}, True),
+    "idastar": (2, "idastar", {}, True),
+    "idastar-commute": (2, "idastar", {"pruning": "commute"}, True),
+    "bidirectional": (2, "bidirectional", {}, True),
+    "anytime": (2, "anytime", {"weight": 2.0}, True),
+    "hda-1": (2, "hda", {"workers": 1}, True),
+    "hda": (2, "hda", {"workers": 2}, True),
+    "hda-4": (2, "hda", {"workers": 4}, True),
+    "hda-8": (2, "hda", {"workers": 8}, True),
+    "external": (2, "external", {"memory_states": 100000}, True),
+    "vectorized": (0, "vectorized", {}, False),
+}
+
+# The measures summed up over the puzzles of a configuration, and whether
+# the largest value is taken instead of the sum
+MEASURES = (("time", False), ("expanded", False), ("peak_rss_kb", True))
+
+# The measures compared with the baseline: the states expanded, which do
+# not depend on the host, the wall time divided by the time of the
+# reference run on the same host (see calibrate) and the peak memory
+GATED = ("expanded", "time", "peak_rss_kb")
+
+# The search modes whose states expanded change from run to run, as they
+# depend on how the processes of the search are scheduled, and are not
+# compared
+UNSTEADY = ("hda",)
+
+# The gameboard solved by the reference run, with the blocker graph
+# heuristic (the puzzle m4 of the corpus)
+REFERENCE = "-----H---BBHC-XXEIC--JEI--AJFFDDAJGG"
+
+
+
+
+# Raised in a run past its time limit
+class RunTimeout(Exception):
+    pass
+
+
+# The SIGALRM handler ending a run past its time limit
+def alarm(signum, frame):
+    raise RunTimeout()
+
+
+# This function reads the puzzles of the corpus
+#   @param:
+#   path: the corpus file
+#   grades: the grades to keep, or None for all of them
+#
+#   returns the list of puzzles as dictionaries
+def load_corpus(path=CORPUS, grades=None):
+    puzzles = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line == "" or line.startswith("#"):
+                continue
+            puzzle = json.loads(line)
+            if grades is None or puzzle["grade"] in grades:
+                puzzles.append(puzzle)
+    return puzzles
+
+
+# Returns the number of moves of a solution up to its first goal state
+def goal_distance(solution):
+    table = solution.table
+    board = table.start
+    for i in range(len(solution.moves)):
+        if table.reach_goal(board):
+            return i
+        board = table.apply(board, solution.moves[i:i+1])
+    return len(solution.moves)
+
+
+# This function runs one configuration on one puzzle, in a worker process
+#   @param:
+#   task: (config, puzzle, backend, timeout)
+#
+#   returns the result of the run as a dictionary
+def run_one(task):
+    config, puzzle, backend, timeout = task
+    heuristic, mode, options, exact = CONFIGS[config]
+    result = {"config": config, "id": puzzle["id"], "grade": puzzle["grade"]}
+
+    signal.signal(signal.SIGALRM, alarm)
+    if timeout:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    start = time.perf_counter()
+    try:
+        solution = rushhour.solve(heuristic, puzzle["board"], backend,
+                                  mode=mode, exit_row=puzzle.get("exit_row"),
+                                  **options)
+    except RunTimeout:
+        result["status"] = "timeout"
+        return result
+    except Exception as error:
+        result["status"] = "error"
+        result["error"] = repr(error)
+        return result
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        result["time"] = round(time.perf_counter() - start, 6)
+        result["peak_rss_kb"] = \
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    result["expanded"] = solution.expanded
+    if "node_bytes" in solution.info:
+        result["node_bytes"] = solution.info["node_bytes"]
+    result["rate"] = round(solution.expanded / max(solution.time, 1e-9))
+    if not solution.solved:
+        result["status"] = "unsolvable"
+        result["correct"] = False if exact else None
+        return result
+    result["status"] = "solved"
+    result["length"] = solution.length
+    result["distance"] = goal_distance(solution)
+    result["correct"] = None
+    if exact:
+        result["correct"] = result["distance"] == puzzle["distance"]
+    return result
+
+
+# Runs a task of run_one() in a new process, which may start processes of
+# its own, and sends the result back through the pipe
+def run_child(task, sender):
+    sender.send(run_one(task))
+    sender.close()
+
+
+# Returns the result of a task of run_one() run in a new process
+def run_isolated(task):
+    receiver, sender = multiprocessing.Pipe(False)
+    process = multiprocessing.Process(target=run_child, args=(task, sender))
+    process.start()
+    sender.close()
+    try:
+        result = receiver.recv()
+    except EOFError:
+        config, puzzle = task[:2]
+        result = {"config": config, "id": puzzle["id"],
+                  "grade": puzzle["grade"], "status": "error",
+                  "error": "the process ended early"}
+    process.join()
+    return result
+
+
+# This function runs the benchmark
+#   @param:
+#   puzzles: the puzzles, as returned by load_corpus()
+#   configs: the names of the configurations to run
+#   backend: the backend of every search
+#   timeout: the time limit of one run in seconds, or None
+#   repeat: the number of times every run is repeated, keeping the fastest
+#
+#   yields the result of every run in order
+def run_benchmark(puzzles, configs, backend="vehicles", timeout=None,
+                  repeat=1):
+    for config in configs:
+        if config not in CONFIGS:
+            raise ValueError("unknown configuration: " + str(config))
+    for config in configs:
+        for puzzle in puzzles:
+            task = (config, puzzle, backend, timeout)
+            run = run_isolated(task)
+            for _ in range(repeat - 1):
+                other = run_isolated(task)
+                if other.get("time", 0) < run.get("time", 0):
+                    run = other
+            yield run
+
+
+# This function times the reference run, to compare the wall times of
+# runs made on different hosts
+#   @param:
+#   repeat: the number of times the reference is solved, keeping the
+#           fastest
+#
+#   returns the seconds of the fastest run
+def calibrate(repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rushhour.solve(2, REFERENCE)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return round(best, 6)
+
+
+# This function sums up the results of every configuration
+#   @param:
+#   results: the results of the runs
+#
+#   returns a dictionary mapping every configuration to its totals of
+#   MEASURES over the runs solved
+def summarize(results):
+    summary = {}
+    for result in results:
+        if result["status"] != "solved":
+            continue
+        totals = summary.setdefault(result["config"],
+                                    {"runs": 0, "time": 0.0, "expanded": 0,
+                                     "peak_rss_kb": 0})
+        totals["runs"] += 1
+        for measure, largest in MEASURES:
+            if largest:
+                totals[measure] = max(totals[measure], result[measure])
+            else:
+                totals[measure] += result[measure]
+    for totals in summary.values():
+        totals["time"] = round(totals["time"], 6)
+    return summary
+
+
+# This function compares the results with a baseline on the measures of
+# GATED
+# The wall times are only compared when the reference time of both hosts
+# is known, as multiples of it.
+#   @param:
+#   results: the results of the runs
+#   baseline: the results of the baseline runs
+#   threshold: the fraction a measure may grow by before it counts as a
+#              regression
+#   reference: the time of the reference run with the results, or None
+#   baseline_reference: the time of the reference run with the baseline,
+#                       or None
+#
+#   returns a list of the regressions found, as messages
+def compare(results, baseline, threshold, reference=None,
+            baseline_reference=None):
+    regressions = []
+    current = {(r["config"], r["id"]): r for r in results}
+    before = {(r["config"], r["id"]): r for r in baseline}
+
+    # Only the runs solved on both sides are compared
+    common = [key for key in current if key in before
+              and current[key]["status"] == "solved"
+              and before[key]["status"] == "solved"]
+    new = summarize(current[key] for key in common)
+    old = summarize(before[key] for key in common)
+    for config in sorted(new):
+        for measure in GATED:
+            new_value = new[config][measure]
+            old_value = old[config][measure]
+            if measure == "expanded" and CONFIGS[config][1] in UNSTEADY:
+                continue
+            if measure == "time":
+                if not reference or not baseline_reference:
+                    continue
+                new_value = round(new_value / reference, 3)
+                old_value = round(old_value / baseline_reference, 3)
+                measure = "time/reference"
+            if new_value > old_value * (1 + threshold):
+                regressions.append("%s: %s went from %s to %s" %
+                                   (config, measure, old_value, new_value))
+    for key in sorted(before):
+        if before[key]["status"] == "solved" and key in current and \
+           current[key]["status"] != "solved":
+            regressions.append("%s: %s is now %s" %
+                               (key[0], key[1], current[key]["status"]))
+    return regressions
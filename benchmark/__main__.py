@@ -0,0 +1,108 @@
+import argparse
+import json
+import sys
+
+import benchmark
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmark",
+        description="Benchmark the Rush Hour searches over a graded corpus.")
+    parser.add_argument("--corpus", default=benchmark.CORPUS,
+                        help="the corpus file")
+    parser.add_argument("--configs", default=",".join(benchmark.CONFIGS),
+                        help="comma separated configurations to run, out "
+                             "of " + ", ".join(benchmark.CONFIGS))
+    parser.add_argument("--grades", default=",".join(benchmark.GRADES),
+                        help="comma separated grades of the puzzles to run")
+    parser.add_argument("--backend", default="vehicles",
+                        help="the backend of every search")
+    parser.add_argument("--timeout", type=float, default=60.0,
+                        help="time limit of one run in seconds")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="runs of every puzzle, keeping the fastest")
+    parser.add_argument("--baseline", default=benchmark.BASELINE,
+                        help="the baseline file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.20,
+                        help="fraction a total may grow by before it "
+                             "counts as a regression")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="write the results to the baseline file "
+                             "instead of comparing")
+    parser.add_argument("-o", "--output", default=None,
+                        help="write the results and the summary as JSON")
+    args = parser.parse_args(argv)
+
+    puzzles = benchmark.load_corpus(args.corpus, args.grades.split(","))
+    reference = benchmark.calibrate()
+    print("Reference run: %.4f s" % reference)
+    results = []
+    print("%-20s %-6s %-8s %4s %4s %9s %9s %10s %7s" %
+          ("config", "id", "grade", "dist", "len", "time", "expanded",
+           "exp/s", "rss_mb"))
+    for result in benchmark.run_benchmark(puzzles, args.configs.split(","),
+                                          args.backend, args.timeout,
+                                          args.repeat):
+        results.append(result)
+        if result["status"] != "solved":
+            print("%-20s %-6s %-8s %s %s" %
+                  (result["config"], result["id"], result["grade"],
+                   result["status"], result.get("error", "")))
+            continue
+        print("%-20s %-6s %-8s %4d %4d %9.4f %9d %10d %7.1f%s" %
+              (result["config"], result["id"], result["grade"],
+               result["distance"], result["length"], result["time"],
+               result["expanded"], result["rate"],
+               result["peak_rss_kb"] / 1024.0,
+               "  WRONG" if result["correct"] is False else ""))
+
+    summary = benchmark.summarize(results)
+    print()
+    for config, totals in summary.items():
+        print("%-20s %3d runs %9.4f s %10d expanded %7.1f MB" %
+              (config, totals["runs"], totals["time"], totals["expanded"],
+               totals["peak_rss_kb"] / 1024.0))
+
+    failed = False
+    wrong = [r for r in results if r.get("correct") is False]
+    for result in wrong:
+        print("Wrong distance: %s on %s" % (result["config"], result["id"]))
+        failed = True
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"reference": reference, "results": results}, f,
+                      indent=1)
+            f.write("\n")
+        print("Baseline written to " + args.baseline)
+    else:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print("No baseline at " + args.baseline)
+        else:
+            if baseline.get("reference") is None:
+                print("No reference time in the baseline, the wall times "
+                      "are not compared")
+            regressions = benchmark.compare(results, baseline["results"],
+                                            args.threshold, reference,
+                                            baseline.get("reference"))
+            for regression in regressions:
+                print("Regression: " + regression)
+                failed = True
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"reference": reference, "results": results,
+                       "summary": summary, "regressions": regressions}, f,
+                      indent=1)
+            f.write("\n")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+import argparse
+import mmap
+import struct
+import sys
+import time
+from array import array
+from collections import deque
+
+import rushhour
+
+
+# Solves every position of a cluster at once by retrograde analysis
+#
+# A cluster is the set of all the gameboards reachable from a gameboard by
+# moving its vehicles. build_cluster() enumerates the cluster, runs a
+# breadth first search backwards from all of its goal states (as defined by
+# reach_goal) and writes the distance of every gameboard to the closest
+# goal state to a file. ClusterTable maps that file into memory and solves
+# any gameboard of the cluster by always moving to a neighbour one step
+# closer to the goal, with no search at all.
+#
+# Like the A* search, a solution takes the fewest moves to a goal state and
+# then moves X to the exit. Among the closest goal states, the table also
+# records the fewest moves left for X, so the solutions never end further
+# from the exit than the ones found by the search.
+#
+# The file holds, in order:
+#   the header: MAGIC, the number of vehicles, the number of gameboards and
+#               the 36-character gameboard the cluster was built from
+#   the keys: the offsets of every gameboard (see VehicleTable), sorted,
+#             padded to an even number of bytes
+#   the distances: one unsigned 16-bit integer per gameboard, in the order
+#                  of the keys, UNSOLVABLE when no goal state is reachable
+#   the exits: one byte per gameboard, the fewest moves of X to the exit
+#              from the closest goal states
+
+MAGIC = b"RHCL0001"
+HEADER = struct.Struct("<8sIQ36s")
+UNSOLVABLE = 0xFFFF
+
+
+
+
+# This function enumerates a cluster and computes the distances
+#   @param:
+#   table: the VehicleTable of a gameboard of the cluster
+#   limit: the largest number of gameboards enumerated, None for no limit
+#   slides: whether the distances are counted in slides, a slide moving
+#           one vehicle any number of cells in one direction, instead of
+#           one-cell moves
+#
+#   returns a dictionary mapping the offsets of every gameboard of the
+#   cluster to (distance, exit): its distance to the closest goal state and
+#   the fewest moves of X to the exit from those goal states, or to None
+#   when no goal state is reachable; None when the cluster is over the limit
+def cluster_distances(table, limit=None, slides=False):
+    moves = table.slides if slides else table.successors
+    # Enumerates the cluster and collects its goal states
+    distances = {table.start: None}
+    goals = []
+    todo = [table.start]
+    while todo:
+        board = todo.pop()
+        if table.reach_goal(board):
+            goals.append(board)
+        for new_board, vehicle, delta in table.successors(board):
+            if new_board not in distances:
+                distances[new_board] = None
+                todo.append(new_board)
+        if limit is not None and len(distances) > limit:
+            return None
+
+    # Every move can be undone, so the neighbours of a gameboard are also
+    # the gameboards it can be reached from
+    # A whole layer is done before the next one starts, so the exit of a
+    # gameboard is final by the time it comes out of the queue
+    for board in goals:
+        distances[board] = (0, len(table.exit_moves(board, slides)))
+    layer = deque(goals)
+    while layer:
+        board = layer.popleft()
+        distance, exit = distances[board]
+        for new_board, vehicle, delta in moves(board):
+            known = distances[new_board]
+            if known is None:
+                distances[new_board] = (distance + 1, exit)
+                layer.append(new_board)
+            elif known[0] == distance + 1 and exit < known[1]:
+                distances[new_board] = (distance + 1, exit)
+    return distances
+
+
+# This function writes the distance table of the cluster of a gameboard
+#   @param:
+#   state: a gameboard of the cluster, as a list of rows or a single string
+#   path: the file to write
+#
+#   returns (size, depth): the number of gameboards of the cluster and the
+#   largest finite distance
+def build_cluster(state, path):
+    board, shape = rushhour.parse_state(state)
+    if shape != rushhour.STANDARD:
+        raise ValueError("cluster tables only hold 6x6 gameboards")
+    table = rushhour.VehicleTable(board)
+    distances = cluster_distances(table)
+
+    keys = sorted(distances)
+    values = array('H', (UNSOLVABLE if distances[k] is None
+                         else distances[k][0] for k in keys))
+    exits = bytes(0 if distances[k] is None else distances[k][1]
+                  for k in keys)
+    if sys.byteorder != "little":
+        values.byteswap()
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(table.ids), len(keys),
+                            board.encode("ascii")))
+        f.write(b"".join(keys))
+        if len(keys) * len(table.ids) % 2:
+            f.write(b"\0")
+        values.tofile(f)
+        f.write(exits)
+
+    depth = max((d[0] for d in distances.values() if d is not None),
+                default=0)
+    return len(keys), depth
+
+
+
+
+# This function checks a heuristic against the exact distances of the
+# cluster of a gameboard
+# A heuristic is admissible when it never gives more than the distance of a
+# gameboard to the closest goal state, and consistent when it never drops
+# by more than the cost of a move along it. The unsolvable gameboards are
+# left out.
+#   @param:
+#   heuristic: the choice of heuristic to check
+#   state: a gameboard of the cluster, as a list of rows or a single string
+#   backend: the name of the backend computing the heuristic
+#   exit_row: the row of the exit, the middle row when None
+#   metric: the moves and their costs, one of rushhour.METRICS; a slide
+#           costs the cells it travels with "distance", so the distances
+#           are the ones of the one-cell moves
+#
+#   returns a dictionary of
+#   states: the number of gameboards checked
+#   overestimated: the number of them whose h_n is over their distance
+#   largest_overestimate: the largest difference between the two
+#   inconsistent: the number of moves along which h_n drops by more than
+#                 their cost
+#   example: the gameboard string of the largest overestimate, or None
+def check_heuristic(heuristic, state, backend="vehicles", exit_row=None,
+                    metric="cells"):
+    if metric not in rushhour.METRICS:
+        raise ValueError("unknown metric: " + str(metric))
+    board, shape = rushhour.parse_state(state, exit_row)
+    backend = rushhour.BACKENDS[backend](board, shape)
+    table = backend.table
+    distances = cluster_distances(table, slides=metric == "slides")
+    moves = table.successors if metric == "cells" else table.slides
+    h_values = {board: backend.heuristic(heuristic,
+                                         backend.from_offsets(board))
+                for board, distance in distances.items()
+                if distance is not None}
+
+    report = {"states": len(h_values), "overestimated": 0,
+              "largest_overestimate": 0, "inconsistent": 0, "example": None}
+    for board, h_n in h_values.items():
+        over = h_n - distances[board][0]
+        if over > 0:
+            report["overestimated"] += 1
+            if over > report["largest_overestimate"]:
+                report["largest_overestimate"] = over
+                report["example"] = table.to_string(board)
+        for new_board, vehicle, delta in moves(board):
+            cost = abs(delta) if metric == "distance" else 1
+            if h_n > cost + h_values[new_board]:
+                report["inconsistent"] += 1
+    return report
+
+
+
+
+# An object answering queries from a file written by build_cluster()
+#   @param:
+#   path: the file of the distance table
+class ClusterTable(object):
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.width, self.size, board = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(path + " is not a cluster distance table")
+        self.table = rushhour.VehicleTable(board.decode("ascii"))
+        self.keys = HEADER.size
+        keys_size = self.size * self.width
+        start = self.keys + keys_size + keys_size % 2
+        distances = memoryview(self.map)[start:start + self.size * 2]
+        if sys.byteorder == "little":
+            self.distances = distances.cast('H')
+        else:
+            # The distances are written little-endian (see build_cluster),
+            # so they are copied and swapped on a big-endian host
+            self.distances = array('H')
+            self.distances.frombytes(distances)
+            self.distances.byteswap()
+            distances.release()
+        self.exits = memoryview(self.map)[start + self.size * 2:
+                                          start + self.size * 3]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if isinstance(self.distances, memoryview):
+            self.distances.release()
+        self.exits.release()
+        self.map.close()
+        self.file.close()
+
+    # Returns the position of the offsets among the sorted keys, or -1 when
+    # the gameboard is not part of the cluster
+    def find(self, board):
+        width = self.width
+        start = self.keys
+        low = 0
+        high = self.size
+        while low < high:
+            middle = (low + high) // 2
+            key = self.map[start + middle * width:
+                           start + (middle + 1) * width]
+            if key < board:
+                low = middle + 1
+            elif key > board:
+                high = middle
+            else:
+                return middle
+        return -1
+
+    # Returns (distance, exit) for the offsets (see cluster_distances), None
+    # when no goal state is reachable
+    # raises KeyError when the gameboard is not part of the cluster
+    def entry_of(self, board):
+        index = self.find(board)
+        if index < 0:
+            raise KeyError("the gameboard is not part of the cluster")
+        distance = self.distances[index]
+        if distance == UNSOLVABLE:
+            return None
+        return distance, self.exits[index]
+
+    # Returns the distance from a gameboard to the closest goal state, None
+    # when no goal state is reachable
+    #   @param:
+    #   state: the gameboard, as a list of rows or a single string
+    def distance(self, state):
+        entry = self.entry_of(self.table.offsets_of("".join(state)))
+        if entry is None:
+            return None
+        return entry[0]
+
+    # Solves a gameboard of the cluster by greedy descent of the distances
+    #   @param:
+    #   state: the gameboard, as a list of rows or a single string
+    #
+    #   returns a rushhour.Solution, whose expanded count is the number of
+    #   gameboards stepped through and generated the number of lookups
+    #   raises KeyError when the gameboard is not part of the cluster
+    def solve(self, state):
+        start = time.perf_counter()
+        table = self.table
+        board = table.offsets_of("".join(state))
+        entry = self.entry_of(board)
+        lookups = 1
+        if entry is None:
+            return rushhour.Solution(table, None, 0, lookups,
+                                     time.perf_counter() - start)
+
+        # Moves to any neighbour one step closer to the same closest exit
+        initial = board
+        moves = []
+        distance, exit = entry
+        steps = distance
+        while distance > 0:
+            for new_board, vehicle, delta in table.successors(board):
+                lookups += 1
+                if self.entry_of(new_board) == (distance - 1, exit):
+                    moves.append((vehicle, delta))
+                    board = new_board
+                    distance -= 1
+                    break
+        moves += table.exit_moves(board)
+
+        # The solution is replayed from the table's own initial gameboard,
+        # so it is given a table starting from the queried one
+        solved_table = rushhour.VehicleTable(table.to_string(initial))
+        order = [solved_table.ids.index(i) for i in table.ids]
+        moves = [(order[v], delta) for v, delta in moves]
+        return rushhour.Solution(solved_table, moves, steps, lookups,
+                                 time.perf_counter() - start)
+
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build or query the distance table of a Rush Hour "
+                    "cluster.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="write the table of the "
+                                              "cluster of a gameboard")
+    build.add_argument("board", help="the 36 cells of the gameboard")
+    build.add_argument("path", help="the file to write")
+    query = commands.add_parser("solve", help="solve a gameboard from a "
+                                              "table")
+    query.add_argument("path", help="the file of the table")
+    query.add_argument("board", help="the 36 cells of the gameboard")
+    check = commands.add_parser("check", help="check a heuristic against "
+                                              "the cluster of a gameboard")
+    check.add_argument("board", help="the cells of a square gameboard, "
+                                     "row after row")
+    check.add_argument("--heuristic", type=int, default=2,
+                       help="0 for blocking, 1 for the custom heuristic, "
+                            "2 for the blocker graph heuristic, 3 for the "
+                            "same counting slides")
+    check.add_argument("--metric", default="cells",
+                       choices=rushhour.METRICS,
+                       help="the moves and their costs, the slides being "
+                            "checked against a breadth first search over "
+                            "slides")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        size, depth = build_cluster(args.board, args.path)
+        print("Cluster size: %d" % size)
+        print("Largest distance: %d" % depth)
+        print("Time: %.3f s" % (time.perf_counter() - start))
+    elif args.command == "check":
+        report = check_heuristic(args.heuristic, args.board,
+                                 metric=args.metric)
+        print("States: %d" % report["states"])
+        print("Overestimated: %d (by up to %d)"
+              % (report["overestimated"], report["largest_overestimate"]))
+        print("Inconsistent moves: %d" % report["inconsistent"])
+        if report["example"] is not None:
+            print("Example: " + report["example"])
+        if report["overestimated"]:
+            sys.exit(1)
+    else:
+        with ClusterTable(args.path) as cluster:
+            solution = cluster.solve(args.board)
+        if not solution.solved:
+            print("No solution found")
+        else:
+            print("Total moves: %d" % solution.length)
+            print(" ".join(solution.move_names()))
+
+
+if __name__ == "__main__":
+    main()
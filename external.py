@@ -0,0 +1,340 @@
+import heapq
+import os
+import tempfile
+
+import rushhour
+
+
+# Runs the A* search with the frontier and the explored states on disk
+#
+# The states are put in buckets by their g_n and h_n, and the buckets are
+# expanded one at a time in order of f_n = g_n + h_n, the smallest g_n
+# first among the same f_n. Only the new states of the bucket being
+# expanded and a buffer of the children generated are held in memory; all
+# the other states are in files, so the memory of the search is bounded by
+# memory_states however large the state space is.
+#
+# Every state is stored as a record of fixed width: the offset of every
+# vehicle (see VehicleTable), one byte each, followed by one byte for the
+# move reaching it from its parent (see encode_move). The children are
+# buffered in memory by bucket, and when the buffer holds memory_states
+# records every bucket of it is sorted and written to a file of its own,
+# a sorted run. The duplicates are only removed when a bucket is about to
+# be expanded (delayed duplicate detection): its runs are merged, keeping
+# one record of every state, and the states already in the expanded files
+# of the same h_n with a g_n smaller by one or two, or of the bucket
+# itself, are dropped in the same pass. Every move can be undone, so a
+# state found again through a shorter path is almost always found in one of
+# these; the few others are expanded again, which costs time but never
+# the moves of the solution.
+#
+# The heuristics may change by more than one from a state to its children,
+# so a child may fall in a bucket of a smaller f_n than the one being
+# expanded. The bucket with the smallest f_n still waiting is always taken
+# next, even if it was expanded before, so with the blocker graph heuristic
+# the first goal state taken out of a bucket is still a shortest one.
+#
+# The expanded files are kept until the end of the search; the moves of
+# the solution are found from the goal state by undoing its move, and
+# looking the parent up in the expanded files of its own bucket with a
+# binary search, up to the initial board.
+
+# The move byte of the initial board
+NO_MOVE = 0
+
+# The largest number of vehicles whose moves fit in the move byte
+MAX_VEHICLES = 127
+
+# The number of records read from a file at once
+READ_RECORDS = 4096
+
+# The largest number of files merged at once, more runs are merged in
+# several passes
+MERGE_FILES = 64
+
+
+
+
+# Returns the move byte of a one-cell move of a vehicle
+def encode_move(vehicle, delta):
+    return 1 + vehicle * 2 + (delta > 0)
+
+
+# Returns the (vehicle, delta) of a move byte
+def decode_move(code):
+    return (code - 1) >> 1, 1 if (code - 1) & 1 else -1
+
+
+# The files of the buckets of the search
+#   directory: the directory of the files
+#   width: the number of bytes of a record
+#   memory_states: the largest number of records held in the buffer
+#   buffers: the records waiting in memory, by bucket
+#   buffered: the number of records in the buffers
+#   runs: the sorted runs written for every bucket
+#   pending: the number of records waiting in every bucket, in the buffer
+#            and in the runs, duplicates included
+#   done: the expanded files of every bucket
+#   spills, bytes_written, bytes_read: counters of the input/output
+class BucketFiles(object):
+    def __init__(self, directory, width, memory_states):
+        self.directory = directory
+        self.width = width
+        self.memory_states = memory_states
+        self.buffers = {}
+        self.buffered = 0
+        self.runs = {}
+        self.pending = {}
+        self.done = {}
+        self.files = 0
+        self.spills = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+
+    # Returns the path of a new file
+    def new_file(self):
+        self.files += 1
+        return os.path.join(self.directory, "%d.bin" % self.files)
+
+    # Adds a record to a bucket, writing the buffer out when it is full
+    def add(self, bucket, record):
+        buffer = self.buffers.get(bucket)
+        if buffer is None:
+            buffer = self.buffers[bucket] = []
+        buffer.append(record)
+        self.pending[bucket] = self.pending.get(bucket, 0) + 1
+        self.buffered += 1
+        if self.buffered >= self.memory_states:
+            self.spill()
+
+    # Sorts the buffer of every bucket and writes it as a run
+    def spill(self):
+        for bucket, buffer in self.buffers.items():
+            buffer.sort()
+            self.runs.setdefault(bucket, []).append(self.write(buffer))
+        self.spills += 1
+        self.buffers = {}
+        self.buffered = 0
+
+    # Writes the records to a new file and returns its path
+    def write(self, records):
+        path = self.new_file()
+        with open(path, "wb") as f:
+            for i in range(0, len(records), READ_RECORDS):
+                chunk = b"".join(records[i:i+READ_RECORDS])
+                f.write(chunk)
+                self.bytes_written += len(chunk)
+        return path
+
+    # Yields the records of a file in order
+    def read(self, path):
+        width = self.width
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(width * READ_RECORDS)
+                if not chunk:
+                    break
+                self.bytes_read += len(chunk)
+                for i in range(0, len(chunk), width):
+                    yield chunk[i:i+width]
+
+    # Merges sorted runs into one, and deletes them
+    def merge_runs(self, runs):
+        path = self.new_file()
+        with open(path, "wb") as f:
+            chunk = []
+            for record in heapq.merge(*[self.read(run) for run in runs]):
+                chunk.append(record)
+                if len(chunk) == READ_RECORDS:
+                    f.write(b"".join(chunk))
+                    self.bytes_written += len(chunk) * self.width
+                    chunk = []
+            f.write(b"".join(chunk))
+            self.bytes_written += len(chunk) * self.width
+        for run in runs:
+            os.remove(run)
+        return path
+
+    # This function merges the waiting records of a bucket into a new
+    # expanded file, without the duplicates
+    #   @param:
+    #   bucket: the (g_n, h_n) of the bucket
+    #
+    #   returns (path, count) of the new file and its number of records,
+    #   path being None when no new state is left
+    def merge(self, bucket):
+        g_n, h_n = bucket
+        state_width = self.width - 1
+        del self.pending[bucket]
+        runs = self.runs.pop(bucket, [])
+        while len(runs) > MERGE_FILES:
+            runs = runs[MERGE_FILES:] + [self.merge_runs(runs[:MERGE_FILES])]
+        streams = [self.read(run) for run in runs]
+        buffer = self.buffers.pop(bucket, None)
+        if buffer:
+            self.buffered -= len(buffer)
+            buffer.sort()
+            streams.append(iter(buffer))
+
+        # The states found before with as few moves or fewer
+        older = []
+        for other in (bucket, (g_n - 1, h_n), (g_n - 2, h_n)):
+            older += self.done.get(other, [])
+        seen = heapq.merge(*[self.read(path) for path in older])
+        old = next(seen, None)
+
+        path = self.new_file()
+        count = 0
+        last = None
+        with open(path, "wb") as f:
+            chunk = []
+            for record in heapq.merge(*streams):
+                state = record[:state_width]
+                if state == last:
+                    continue
+                last = state
+                while old is not None and old[:state_width] < state:
+                    old = next(seen, None)
+                if old is not None and old[:state_width] == state:
+                    continue
+                chunk.append(record)
+                count += 1
+                if len(chunk) == READ_RECORDS:
+                    f.write(b"".join(chunk))
+                    self.bytes_written += len(chunk) * self.width
+                    chunk = []
+            f.write(b"".join(chunk))
+            self.bytes_written += len(chunk) * self.width
+        for run in runs:
+            os.remove(run)
+
+        if count == 0:
+            os.remove(path)
+            return None, 0
+        self.done.setdefault(bucket, []).append(path)
+        return path, count
+
+    # Returns the record of a state in the expanded files of a bucket, None
+    # if it is not there
+    def find(self, bucket, state):
+        width = self.width
+        for path in self.done.get(bucket, []):
+            with open(path, "rb") as f:
+                low = 0
+                high = os.path.getsize(path) // width
+                while low < high:
+                    middle = (low + high) // 2
+                    f.seek(middle * width)
+                    record = f.read(width)
+                    self.bytes_read += width
+                    if record[:-1] < state:
+                        low = middle + 1
+                    elif record[:-1] > state:
+                        high = middle
+                    else:
+                        return record
+        return None
+
+
+
+
+# This function runs the external memory A* search
+#   @param:
+#   heuristic: the choice of heuristic to use in the search
+#   backend: the board representation (see rushhour.StringBackend), the
+#            states on disk always hold the offsets of the vehicles
+#   memory_states: the largest number of generated states held in memory
+#                  before they are written to disk
+#   directory: the directory in which the files are made, the default
+#              temporary directory if None; they are deleted at the end
+#
+#   info reports the buckets merged, the buckets expanded again, the times
+#   the buffer was written out and the bytes written and read
+def external_search(heuristic, backend, memory_states=1000000,
+                    directory=None):
+    if memory_states < 1:
+        raise ValueError("memory_states must be at least 1")
+    if len(backend.table.ids) > MAX_VEHICLES:
+        raise ValueError("the external search takes at most %d vehicles"
+                         % MAX_VEHICLES)
+    # The moves are given by vehicle index, the same in both tables as they
+    # are built from the same gameboard
+    vehicles = rushhour.VehicleBackend(backend.to_string(backend.initial),
+                                       backend.table.shape)
+    table = vehicles.table
+    state_width = len(table.start)
+
+    expanded = 0
+    generated = 0
+    merged = 0
+    reopened = 0
+    with tempfile.TemporaryDirectory(prefix="rushhour-",
+                                     dir=directory) as path:
+        buckets = BucketFiles(path, state_width + 1, memory_states)
+        buckets.add((0, vehicles.heuristic(heuristic, table.start)),
+                    table.start + bytes((NO_MOVE,)))
+
+        moves = None
+        while buckets.pending and moves is None:
+            bucket = min(buckets.pending, key=lambda b: (b[0] + b[1], b[0]))
+            if bucket in buckets.done:
+                reopened += 1
+            bucket_path, count = buckets.merge(bucket)
+            merged += 1
+            if bucket_path is None:
+                continue
+
+            g_n = bucket[0]
+            for record in buckets.read(bucket_path):
+                board = record[:state_width]
+                if table.reach_goal(board):
+                    moves = trace(buckets, vehicles, heuristic, g_n, record)
+                    break
+                expanded += 1
+                # The move undoing the last one leads back to the parent,
+                # which is always a duplicate
+                if record[-1] != NO_MOVE:
+                    last_vehicle, last_delta = decode_move(record[-1])
+                for new_board, v, delta in table.successors(board):
+                    if record[-1] != NO_MOVE and v == last_vehicle and \
+                       delta == -last_delta:
+                        continue
+                    generated += 1
+                    buckets.add((g_n + 1,
+                                 vehicles.heuristic(heuristic, new_board)),
+                                new_board + bytes((encode_move(v, delta),)))
+
+        info = {
+            "buckets": merged,
+            "reopened": reopened,
+            "spills": buckets.spills,
+            "bytes_written": buckets.bytes_written,
+            "bytes_read": buckets.bytes_read,
+        }
+    return moves, expanded, generated, info
+
+
+# This function finds the moves from the initial board to a state
+#   @param:
+#   buckets: the BucketFiles of the search
+#   vehicles: the VehicleBackend of the search
+#   heuristic: the choice of heuristic used in the search
+#   g_n: the number of moves to the state
+#   record: the record of the state
+#
+#   returns the list of (vehicle, delta) moves
+def trace(buckets, vehicles, heuristic, g_n, record):
+    moves = []
+    while record[-1] != NO_MOVE:
+        vehicle, delta = decode_move(record[-1])
+        moves.append((vehicle, delta))
+        board = bytearray(record[:-1])
+        board[vehicle] -= delta
+        board = bytes(board)
+        g_n -= 1
+        record = buckets.find((g_n, vehicles.heuristic(heuristic, board)),
+                              board)
+        if record is None:
+            raise RuntimeError("the parent of a state was not found on disk")
+    moves.reverse()
+    return moves
@@ -0,0 +1,266 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+
+import cluster
+import rushhour
+
+
+# Generates hard Rush Hour puzzles from random sets of vehicles
+#
+# Every attempt places a random set of vehicles on an empty gameboard,
+# enumerates its whole cluster (every gameboard reachable by moving them,
+# see cluster.cluster_distances) and keeps the gameboard of the cluster
+# farthest from any goal state. Among the gameboards equally far, the one
+# with the most moves left for X to the exit is kept, and then the first
+# one in the order of their canonical strings, so the same cluster always
+# gives the same puzzle whichever gameboard of it was placed.
+#
+# A gameboard is written in its canonical form: the vehicles other than X
+# are named A, B, C, ... in the order they are first met row by row, so the
+# same positions give the same string and the puzzles are deduplicated on
+# it.
+#
+# Attempt i of a run draws its vehicles from a random generator seeded with
+# the seed of the run and i alone, and the results are taken in the order
+# of the attempts, so a run gives the same puzzles whatever the number of
+# worker processes.
+#
+# One JSON object is written per puzzle, in the format of the benchmark
+# corpus (see benchmark/__init__.py):
+#   id: the seed of the run and the number of the attempt
+#   grade: the grade of the puzzle from its distance (see GRADES)
+#   board: the gameboard, as one string when it is 6x6, as a list of rows
+#          otherwise
+#   exit_row: the row of the exit, only when the board is not 6x6
+#   distance: the fewest moves to a goal state (as defined by reach_goal)
+#   length: the moves of the shortest solution reaching the exit through
+#           such a goal state
+#   cluster_size: the number of gameboards of its cluster
+
+# The smallest distance of every grade of the benchmark corpus
+GRADES = ((30, "expert"), (21, "hard"), (12, "medium"), (6, "easy"),
+          (0, "trivial"))
+
+# The names given to the vehicles other than X, in order
+NAMES = "ABCDEFGHIJKLMNOPQRSTUVWYZabcdefghijklmnopqrstuvwxyz"
+
+
+
+
+# Returns the grade of a puzzle from its distance
+def grade(distance):
+    for lowest, name in GRADES:
+        if distance >= lowest:
+            return name
+
+
+# Returns the gameboard string with the vehicles other than X renamed in
+# the order they are first met
+def canonical(board):
+    names = {'-': '-', 'X': 'X'}
+    for cell in board:
+        if cell not in names:
+            names[cell] = NAMES[len(names) - 2]
+    return "".join(names[cell] for cell in board)
+
+
+# This function places a random set of vehicles on an empty gameboard
+#   @param:
+#   rng: the random.Random drawing the vehicles
+#   shape: the BoardShape of the gameboard
+#   vehicles: the number of vehicles other than X to place
+#   trucks: the share of trucks among them
+#
+#   returns the gameboard string, which may hold fewer vehicles when no
+#   room was found for them
+def random_board(rng, shape, vehicles, trucks=0.25):
+    height, width = shape.height, shape.width
+    cells = ['-'] * shape.size
+    x_col = rng.randrange(width - 2)
+    x_cell = shape.exit_row * width + x_col
+    cells[x_cell] = cells[x_cell + 1] = 'X'
+    placed = 0
+    for _ in range(vehicles * 20):
+        if placed == vehicles or placed == len(NAMES):
+            break
+        length = 3 if rng.random() < trucks else 2
+        horizontal = rng.random() < 0.5
+        row = rng.randrange(height)
+        col = rng.randrange(width)
+        # Only X stands along the exit row, any other vehicle there would
+        # block it for good or never be in its way
+        if horizontal and row == shape.exit_row:
+            continue
+        if horizontal:
+            taken = [row * width + col + k for k in range(length)]
+            fits = col + length <= width
+        else:
+            taken = [(row + k) * width + col for k in range(length)]
+            fits = row + length <= height
+        if not fits or any(cells[c] != '-' for c in taken):
+            continue
+        for c in taken:
+            cells[c] = NAMES[placed]
+        placed += 1
+    return "".join(cells)
+
+
+# This function finds the hardest gameboard of the cluster of a gameboard
+#   @param:
+#   board: a gameboard string of the cluster
+#   shape: the BoardShape of the gameboard
+#   max_cluster: the largest cluster enumerated, None for no limit
+#
+#   returns (board, distance, length, cluster_size), board being in its
+#   canonical form, or None when the cluster has no goal state or is over
+#   the limit
+def hardest(board, shape, max_cluster=None):
+    table = rushhour.VehicleTable(board, shape)
+    distances = cluster.cluster_distances(table, max_cluster)
+    if distances is None or distances[table.start] is None:
+        return None
+    farthest = max(distances[key] for key in distances
+                   if distances[key] is not None)
+    best = min(canonical(table.to_string(key)) for key in distances
+               if distances[key] == farthest)
+    distance, exit_moves = farthest
+    return best, distance, distance + exit_moves, len(distances)
+
+
+# This function makes one attempt at a puzzle
+#   @param:
+#   task: (seed, index, shape, min_vehicles, max_vehicles, trucks,
+#          max_cluster)
+#
+#   returns (board, distance, length, cluster_size) as hardest() does, or
+#   None
+def attempt(task):
+    seed, index, shape, min_vehicles, max_vehicles, trucks, max_cluster = \
+        task
+    rng = random.Random("%d:%d" % (seed, index))
+    board = random_board(rng, shape,
+                         rng.randint(min_vehicles, max_vehicles), trucks)
+    return hardest(board, shape, max_cluster)
+
+
+# This function generates deduplicated puzzles
+#   @param:
+#   count: the number of puzzles to generate
+#   seed: the seed of the run
+#   shape: the BoardShape of the gameboards
+#   min_distance: the fewest moves to a goal state of a puzzle kept
+#   min_vehicles, max_vehicles: the range of the number of vehicles placed
+#                               besides X, from a quarter to a third of the
+#                               cells when None
+#   trucks: the share of trucks among the vehicles placed
+#   max_cluster: the largest cluster enumerated, None for no limit
+#   workers: the number of worker processes (the number of CPUs if None)
+#   max_attempts: the number of attempts before giving up, None for no
+#                 limit
+#
+#   yields the puzzles as dictionaries, in the order of the attempts
+def generate(count, seed=0, shape=rushhour.STANDARD, min_distance=20,
+             min_vehicles=None, max_vehicles=None, trucks=0.25,
+             max_cluster=1000000, workers=None, max_attempts=None):
+    if min_vehicles is None:
+        min_vehicles = shape.size // 4
+    if max_vehicles is None:
+        max_vehicles = max(min_vehicles, shape.size // 3)
+    if not 0 <= min_vehicles <= max_vehicles:
+        raise ValueError("the range of vehicles is empty")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    seen = set()
+    found = 0
+    index = 0
+    with multiprocessing.Pool(workers) as pool:
+        # The attempts are sent in rounds, so no more than a round is
+        # done past the last puzzle needed
+        round_size = 16 * workers
+        while found < count and (max_attempts is None or
+                                 index < max_attempts):
+            end = index + round_size
+            if max_attempts is not None:
+                end = min(end, max_attempts)
+            tasks = [(seed, i, shape, min_vehicles, max_vehicles, trucks,
+                      max_cluster) for i in range(index, end)]
+            for i, result in zip(range(index, end),
+                                 pool.imap(attempt, tasks, 4)):
+                if found == count:
+                    break
+                if result is None or result[1] < min_distance or \
+                   result[0] in seen:
+                    continue
+                seen.add(result[0])
+                board, distance, length, size_of_cluster = result
+                puzzle = {"id": "%d-%d" % (seed, i),
+                          "grade": grade(distance)}
+                if shape == rushhour.STANDARD:
+                    puzzle["board"] = board
+                else:
+                    puzzle["board"] = [board[k:k+shape.width] for k in
+                                       range(0, shape.size, shape.width)]
+                    puzzle["exit_row"] = shape.exit_row
+                puzzle["distance"] = distance
+                puzzle["length"] = length
+                puzzle["cluster_size"] = size_of_cluster
+                found += 1
+                yield puzzle
+            index = end
+
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate hard Rush Hour puzzles as JSON lines.")
+    parser.add_argument("-n", "--count", type=int, default=100,
+                        help="number of puzzles to generate")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the run")
+    parser.add_argument("-o", "--output", default="-",
+                        help="JSONL puzzle file ('-' for standard output)")
+    parser.add_argument("--min-distance", type=int, default=20,
+                        help="fewest moves to a goal state of a puzzle")
+    parser.add_argument("--height", type=int, default=6,
+                        help="number of rows of the gameboard")
+    parser.add_argument("--width", type=int, default=6,
+                        help="number of columns of the gameboard")
+    parser.add_argument("--exit-row", type=int, default=None,
+                        help="row of the exit, counted from 0 (the middle "
+                             "row by default)")
+    parser.add_argument("--min-vehicles", type=int, default=None,
+                        help="fewest vehicles placed besides X")
+    parser.add_argument("--max-vehicles", type=int, default=None,
+                        help="most vehicles placed besides X")
+    parser.add_argument("--trucks", type=float, default=0.25,
+                        help="share of trucks among the vehicles placed")
+    parser.add_argument("--max-cluster", type=int, default=1000000,
+                        help="largest cluster enumerated")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of worker processes")
+    parser.add_argument("--max-attempts", type=int, default=None,
+                        help="attempts before giving up")
+    args = parser.parse_args(argv)
+
+    shape = rushhour.BoardShape(args.height, args.width, args.exit_row)
+    outfile = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        for puzzle in generate(args.count, args.seed, shape,
+                               args.min_distance, args.min_vehicles,
+                               args.max_vehicles, args.trucks,
+                               args.max_cluster, args.workers,
+                               args.max_attempts):
+            outfile.write(json.dumps(puzzle) + "\n")
+            outfile.flush()
+    finally:
+        if outfile is not sys.stdout:
+            outfile.close()
+
+
+if __name__ == "__main__":
+    main()
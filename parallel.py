@@ -0,0 +1,308 @@
+import multiprocessing
+import os
+import queue
+import time
+import zlib
+
+import rushhour
+
+
+# Runs the A* search over several processes with hash distributed A* (HDA*)
+#
+# Every gameboard is owned by one worker, chosen by a hash of the gameboard
+# (see owner_key). Each worker keeps its own frontier and its own table of
+# the states it owns, and only ever expands those. The children of an
+# expanded state are sent to their owners in batches through the inbox
+# queue of each worker; the owner computes their h_n, drops the ones it
+# already holds with as few steps and puts the others in its frontier.
+# In a batch the children are grouped under their parent, so the parent
+# gameboard and the g_n are sent once for all the children of a state
+# going to the same owner.
+#
+# The first worker to take a goal state out of its frontier records its g_n
+# as the incumbent, shared by all the workers. A state whose f_n is over the
+# incumbent is never expanded, but the search goes on until every worker has
+# run out of states up to it, so a shorter solution found by another worker
+# still wins. With the blocker graph heuristic (heuristics 2 and 3), which
+# never overestimates the moves left, a state whose f_n equals the incumbent
+# cannot lead to a shorter solution either, and is not expanded; the
+# solution then takes the fewest moves. Heuristics 0 and 1 may overestimate,
+# so the states with f_n equal to the incumbent are still expanded, but the
+# solution found is not always the shortest one, as with the A* search.
+#
+# The search is over when every worker is waiting for work and every batch
+# sent has been received. Each worker publishes whether it is waiting and
+# the numbers of batches it has sent and received in a shared array; the
+# main process reads all of them at once under the lock of the array, and a
+# worker only stops waiting after receiving a batch, so no work can be left
+# once they add up.
+#
+# The parent of a state may be owned by another worker, so the moves of the
+# solution are put together at the end by asking the owner of every state
+# on the way back from the goal for its parent.
+
+# The fields of every worker in the shared status array
+WAITING = 0
+SENT = 1
+RECEIVED = 2
+FIELDS = 3
+
+# The incumbent before any goal state is found
+NO_INCUMBENT = 1 << 30
+
+
+
+
+# Returns the function turning a gameboard of the backend into the bytes
+# hashed to find its owner
+# The built-in hash of bytes and strings changes with every process, so it
+# cannot be used to agree on the owners.
+def owner_key(backend):
+    if isinstance(backend.initial, int):
+        return lambda board: board.to_bytes((board.bit_length() + 7) // 8,
+                                            "little")
+    if isinstance(backend.initial, str):
+        return lambda board: board.encode()
+    return lambda board: board
+
+
+# The main loop of a worker process
+#   @param:
+#   index: the number of the worker
+#   workers: the number of worker processes
+#   backend_class: the class of the backend (see rushhour.BACKENDS)
+#   initial_board: the initial gameboard string
+#   shape: the rushhour.BoardShape of the gameboard
+#   heuristic: the choice of heuristic to use in the search
+#   frontier: the name of the frontier, one of the keys of rushhour.FRONTIERS
+#   batch_size: the number of states expanded between two sends
+#   inboxes: the inbox queue of every worker
+#   results: the queue of the replies to the main process
+#   status: the shared status array (see WAITING, SENT and RECEIVED)
+#   incumbent: the shared g_n of the shortest solution found so far
+#
+# Apart from the batches of states, a worker takes these messages:
+#   ("finish",): replies with its counters and the best goal state it found
+#   ("trace", board): replies with the parent of one of its states
+#   ("stop",): ends the worker
+def hda_worker(index, workers, backend_class, initial_board, shape,
+               heuristic, frontier, batch_size, inboxes, results, status,
+               incumbent):
+    backend = backend_class(initial_board, shape)
+    key = owner_key(backend)
+    table = backend.table
+    exit_col = shape.width - table.length[table.x]
+    # Whether the heuristic never overestimates the moves left, so that the
+    # states with f_n equal to the incumbent are not expanded
+    admissible = heuristic in (2, 3)
+    inbox = inboxes[index]
+    base = index * FIELDS
+    lock = status.get_lock()
+
+    frontier_class = rushhour.FRONTIERS[frontier]
+    open_states = frontier_class()
+    # Maps every gameboard owned by the worker to (g_n, parent, vehicle,
+    # delta), the parent being None for the initial board
+    states = {}
+    outboxes = [[] for _ in range(workers)]
+    expanded = 0
+    generated = 0
+    goal = None
+
+    # Adds a batch of (parent, g_n, children) to the frontier, children
+    # being a list of (board, vehicle, delta)
+    def receive(batch):
+        for parent, g_n, children in batch:
+            for board, vehicle, delta in children:
+                known = states.get(board)
+                if known is not None and known[0] <= g_n:
+                    continue
+                states[board] = (g_n, parent, vehicle, delta)
+                h_n = backend.heuristic(heuristic, board)
+                open_states.put(rushhour.BoardState(board, g_n, h_n,
+                                                    g_n + h_n, -1))
+
+    # Sends the states waiting in the outboxes to their owners
+    def flush():
+        for owner in range(workers):
+            if outboxes[owner]:
+                with lock:
+                    status[base + SENT] += 1
+                inboxes[owner].put(("nodes", outboxes[owner]))
+                outboxes[owner] = []
+
+    # Handles one message and returns False when the worker should end
+    def handle(message):
+        nonlocal goal
+        if message[0] == "nodes":
+            with lock:
+                status[base + RECEIVED] += 1
+                status[base + WAITING] = 0
+            receive(message[1])
+        elif message[0] == "finish":
+            results.put(("done", index, expanded, generated, len(states),
+                         goal))
+        elif message[0] == "trace":
+            results.put(("parent", states[message[1]]))
+        elif message[0] == "stop":
+            return False
+        return True
+
+    while True:
+        # Takes in the batches already waiting without blocking
+        while True:
+            try:
+                message = inbox.get_nowait()
+            except queue.Empty:
+                break
+            if not handle(message):
+                return
+
+        # Expands up to batch_size states below the incumbent
+        count = 0
+        while count < batch_size and not open_states.empty():
+            state = open_states.get()
+            known = states[state.board]
+            # Skips the outdated entries left behind in the frontier
+            if known[0] != state.g_n:
+                continue
+            if backend.is_goal(state):
+                # Among the goal states with the fewest moves, keeps the one
+                # leaving the fewest moves of X to the exit
+                exit_left = exit_col - backend.offset(state.board, table.x)
+                if goal is None or (state.g_n, exit_left) < goal[:2]:
+                    goal = (state.g_n, exit_left, state.board)
+                with incumbent.get_lock():
+                    if state.g_n < incumbent.value:
+                        incumbent.value = state.g_n
+                continue
+            if state.f_n > incumbent.value or \
+               (admissible and state.f_n == incumbent.value):
+                # The frontier comes out in order of f_n, nothing left in it
+                # can lead to a shorter solution
+                open_states = frontier_class()
+                break
+
+            expanded += 1
+            count += 1
+            g_n = state.g_n + 1
+            children = {}
+            for board, vehicle, delta in backend.successors(state):
+                generated += 1
+                owner = zlib.crc32(key(board)) % workers
+                children.setdefault(owner, []).append((board, vehicle,
+                                                       delta))
+            for owner in children:
+                entry = (state.board, g_n, children[owner])
+                if owner == index:
+                    receive((entry,))
+                else:
+                    outboxes[owner].append(entry)
+        flush()
+
+        # Waits for more work once the frontier has run out
+        if open_states.empty():
+            with lock:
+                status[base + WAITING] = 1
+            if not handle(inbox.get()):
+                return
+
+
+
+
+# This one runs the A* search over several processes with HDA*
+# The solution takes the fewest moves only with heuristics 2 and 3, which
+# never overestimate the moves left.
+#   @param:
+#   workers: the number of worker processes (the number of CPUs if None)
+#   frontier: the name of the frontier used by every worker, None for the
+#             one of rushhour.default_frontier()
+#   batch_size: the number of states a worker expands before sending their
+#               children to their owners
+#
+#   info reports the number of workers, the states expanded and stored by
+#   each of them and the number of batches sent
+def hda_search(heuristic, backend, workers=None, frontier=None,
+               batch_size=64):
+    if frontier is None:
+        frontier = rushhour.default_frontier(heuristic)
+    if frontier not in rushhour.FRONTIERS:
+        raise ValueError("unknown frontier: " + str(frontier))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    key = owner_key(backend)
+    initial_board = backend.to_string(backend.initial)
+
+    inboxes = [multiprocessing.Queue() for _ in range(workers)]
+    results = multiprocessing.Queue()
+    # One more SENT field for the initial state sent by the main process
+    status = multiprocessing.Array('q', workers * FIELDS + FIELDS)
+    incumbent = multiprocessing.Value('q', NO_INCUMBENT)
+    processes = [multiprocessing.Process(
+                     target=hda_worker,
+                     args=(index, workers, type(backend), initial_board,
+                           backend.table.shape, heuristic, frontier,
+                           batch_size, inboxes, results, status, incumbent),
+                     daemon=True)
+                 for index in range(workers)]
+    for process in processes:
+        process.start()
+
+    try:
+        owner = zlib.crc32(key(backend.initial)) % workers
+        with status.get_lock():
+            status[workers * FIELDS + SENT] = 1
+        inboxes[owner].put(("nodes", [(None, 0, [(backend.initial, 0, 0)])]))
+
+        # Waits until every worker waits and no batch is on its way
+        while True:
+            time.sleep(0.001)
+            with status.get_lock():
+                fields = status[:]
+            waiting = all(fields[index * FIELDS + WAITING]
+                          for index in range(workers))
+            if waiting and sum(fields[SENT::FIELDS]) == \
+                           sum(fields[RECEIVED::FIELDS]):
+                break
+            for process in processes:
+                if process.exitcode is not None:
+                    raise RuntimeError("HDA* worker exited with code %d"
+                                       % process.exitcode)
+
+        # Collects the counters and the goal states of the workers
+        for inbox in inboxes:
+            inbox.put(("finish",))
+        replies = [results.get() for _ in range(workers)]
+        replies.sort()
+        goals = [reply[5] for reply in replies if reply[5] is not None]
+        info = {
+            "workers": workers,
+            "worker_expanded": [reply[2] for reply in replies],
+            "worker_states": [reply[4] for reply in replies],
+            "batches": sum(fields[SENT::FIELDS]),
+        }
+        expanded = sum(reply[2] for reply in replies)
+        generated = sum(reply[3] for reply in replies)
+
+        moves = None
+        if goals:
+            # Follows the parents back from the goal state with the fewest
+            # moves, asking the owner of every state on the way
+            board = min(goals)[2]
+            moves = []
+            while True:
+                inboxes[zlib.crc32(key(board)) % workers].put(("trace", board))
+                g_n, parent, vehicle, delta = results.get()[1]
+                if parent is None:
+                    break
+                moves.append((vehicle, delta))
+                board = parent
+            moves = rushhour.reverse(moves)
+        return moves, expanded, generated, info
+    finally:
+        for inbox in inboxes:
+            inbox.put(("stop",))
+        for process in processes:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
@@ -1,25 +1,30 @@
 import queue
 from queue import PriorityQueue
-import sys
-import copy
+from array import array
+import heapq
+import json
+import time
 
 
-# Sets the default recursion limit to satisfy the search
-sys.setrecursionlimit(10**6)
-
 # An object storing all the relevant information about the state,
-#   game board: stored as a single string
+#   game board: stored in the representation chosen for the search
 #   g_n: the number of steps taken from the start to the current state
 #   h_n: the minimum number of steps needed to reach the goal state
 #   f_n: sum of g_n and h_n
-#   parent: the parent state which the current state derived from
+#   node: the index of the state in the NodeStore, which keeps its parent
+#         and the move taken from the parent
+#   h_parts: the parts of h_n kept by IncrementalHeuristic, if it is used
+# Only the states waiting in the frontier are kept as BoardState objects
 class BoardState(object):
-    def __init__(self, board, g_n, h_n, f_n, parent):
+    __slots__ = ("board", "g_n", "h_n", "f_n", "node", "h_parts")
+
+    def __init__(self, board, g_n, h_n, f_n, node, h_parts=None):
         self.board = board
         self.g_n = g_n
         self.h_n = h_n
         self.f_n = f_n
-        self.parent = parent
+        self.node = node
+        self.h_parts = h_parts
 
     # Overloads the less than comparator
     # in order for the PriorityQueue to sort this class object
@@ -29,63 +34,1068 @@ class BoardState(object):
 
 
 
+# An object storing the dimensions of the gameboard and the row of its exit
+#   height: the number of rows
+#   width: the number of columns
+#   exit_row: the row X drives out of, through the right edge of the board,
+#             counted from 0 (the middle row when not given, the third row
+#             of the standard 6x6 board)
+#
+# A gameboard string holds the rows one after the other, so the cell at row
+# r and column c is at index r * width + c.
+class BoardShape(object):
+    __slots__ = ("height", "width", "exit_row")
+
+    def __init__(self, height=6, width=6, exit_row=None):
+        if height < 1 or width < 2:
+            raise ValueError("the board must have at least one row and two "
+                             "columns, not %dx%d" % (height, width))
+        if exit_row is None:
+            exit_row = (height - 1) // 2
+        if not 0 <= exit_row < height:
+            raise ValueError("the exit row must be one of the %d rows, "
+                             "not %d" % (height, exit_row))
+        self.height = height
+        self.width = width
+        self.exit_row = exit_row
+
+    # The number of cells of the gameboard
+    @property
+    def size(self):
+        return self.height * self.width
+
+    # The indices of the cells of the exit row
+    def exit_cells(self):
+        return range(self.exit_row * self.width,
+                     (self.exit_row + 1) * self.width)
+
+    def __eq__(self, other):
+        return isinstance(other, BoardShape) and \
+               (self.height, self.width, self.exit_row) == \
+               (other.height, other.width, other.exit_row)
+
+    def __hash__(self):
+        return hash((self.height, self.width, self.exit_row))
+
+    def __repr__(self):
+        return "BoardShape(%d, %d, %d)" % (self.height, self.width,
+                                           self.exit_row)
+
+
+# The standard 6x6 gameboard with the exit on the third row
+STANDARD = BoardShape(6, 6, 2)
+
+
+# This function reads the gameboard string and its shape from the initial
+# state of a puzzle
+#   @param:
+#   state: the rows of the gameboard as strings, or the whole gameboard as
+#          a single string when it is square
+#   exit_row: the row of the exit, the middle row when None
+#
+#   returns (board, shape), board being the gameboard as a single string
+#   raises ValueError when the rows do not make a rectangle, or when they
+#   are not a gameboard at all
+def parse_state(state, exit_row=None):
+    rows = [state] if isinstance(state, str) else list(state)
+    if not rows:
+        raise ValueError("the board has no rows")
+    # Checks that the cells look like a gameboard at all before its shape,
+    # so a line of text is not reported as a board of the wrong size
+    for row in rows:
+        for cell in row:
+            if cell != '-' and not cell.isalnum():
+                raise ValueError("not a gameboard: invalid character %r"
+                                 % cell)
+    if isinstance(state, str):
+        side = 1
+        while side * side < len(state):
+            side += 1
+        if side * side != len(state):
+            raise ValueError("not a gameboard: %d characters are not the "
+                             "cells of a square board" % len(state))
+        return state, BoardShape(side, side, exit_row)
+    for row in rows:
+        if len(row) != len(rows[0]):
+            raise ValueError("the rows of the board must all have %d cells"
+                             % len(rows[0]))
+    return "".join(rows), BoardShape(len(rows), len(rows[0]), exit_row)
+
+
+
+
+# An object recording every state created in the search as columns of
+# compact arrays, a state being only an index into them
+#   parent: the index of the parent state (-1 for the initial state)
+#   vehicle: the index of the vehicle moved from the parent
+#   delta: the number of cells the vehicle moved (negative is left/up)
+#   g_n: the number of steps taken from the start to the state
+class NodeStore(object):
+    def __init__(self):
+        self.parent = array('i')
+        self.vehicle = array('B')
+        self.delta = array('b')
+        self.g_n = array('H')
+
+    def __len__(self):
+        return len(self.parent)
+
+    # Records a new state and returns its index
+    def add(self, parent, vehicle, delta, g_n):
+        self.parent.append(parent)
+        self.vehicle.append(vehicle)
+        self.delta.append(delta)
+        self.g_n.append(g_n)
+        return len(self.parent) - 1
+
+    # Returns the list of (vehicle, delta) moves from the initial state to
+    # the state at the given index
+    def path(self, node):
+        moves = []
+        while self.parent[node] >= 0:
+            moves.append((self.vehicle[node], self.delta[node]))
+            node = self.parent[node]
+        return reverse(moves)
+
+    # Returns the number of bytes used by the arrays
+    def memory_usage(self):
+        return sum(column.itemsize * len(column) for column in
+                   (self.parent, self.vehicle, self.delta, self.g_n))
+
+
+
+
+# The following classes are the frontiers the search can use in place of the
+# PriorityQueue. All of them provide the put(state), get() and empty()
+# functions of the PriorityQueue, but without its thread lock.
+#
+# This one keeps the states in a heap ordered by f_n alone, as the
+# PriorityQueue does, so the ties between states of the same f_n come out
+# in the same order and the same moves are found
+class PlainHeapFrontier(object):
+    def __init__(self):
+        self.heap = []
+
+    def put(self, state):
+        heapq.heappush(self.heap, state)
+
+    def get(self):
+        return heapq.heappop(self.heap)
+
+    def empty(self):
+        return not self.heap
+
+
+# The two below break the ties between states of the same f_n: the state
+# with the smaller h_n comes out first, and among those the one put last.
+#
+# This one keeps the states in a heap
+class HeapFrontier(object):
+    def __init__(self):
+        self.heap = []
+        self.count = 0
+
+    def put(self, state):
+        self.count -= 1
+        heapq.heappush(self.heap, (state.f_n, state.h_n, self.count, state))
+
+    def get(self):
+        return heapq.heappop(self.heap)[3]
+
+    def empty(self):
+        return not self.heap
+
+
+# This one keeps the states in buckets indexed by f_n and then h_n, each
+# bucket being a stack, so that put and get take constant time as long as
+# the values stay small integers: the bits of f_mask are the f_n of the
+# buckets holding states, and the bits of masks[f_n] the h_n of the
+# stacks of that bucket holding states, so the lowest set bits give the
+# stack to pop without looking at the empty ones
+class BucketFrontier(object):
+    def __init__(self):
+        self.buckets = []
+        self.masks = []
+        self.f_mask = 0
+        self.size = 0
+
+    def put(self, state):
+        # custome_heuristic gives -1 with X at the exit, which shares the
+        # bucket of 0
+        f_n = max(state.f_n, 0)
+        h_n = max(state.h_n, 0)
+        while len(self.buckets) <= f_n:
+            self.buckets.append([])
+            self.masks.append(0)
+        bucket = self.buckets[f_n]
+        while len(bucket) <= h_n:
+            bucket.append([])
+        bucket[h_n].append(state)
+        self.masks[f_n] |= 1 << h_n
+        self.f_mask |= 1 << f_n
+        self.size += 1
+
+    def get(self):
+        f_n = (self.f_mask & -self.f_mask).bit_length() - 1
+        mask = self.masks[f_n]
+        h_n = (mask & -mask).bit_length() - 1
+        stack = self.buckets[f_n][h_n]
+        state = stack.pop()
+        if not stack:
+            mask ^= 1 << h_n
+            self.masks[f_n] = mask
+            if not mask:
+                self.f_mask ^= 1 << f_n
+        self.size -= 1
+        return state
+
+    def empty(self):
+        return self.size == 0
+
+
+# The frontiers that can be chosen in rushhour()
+# The order of the states of the same f_n only changes the states explored
+# with the blocker graph heuristics, but with the other two heuristics,
+# which may overestimate the moves left, it also changes the solution
+# found: the tie-breaking of "heapq" and "bucket" may give a few more moves
+# than the PriorityQueue. The default frontier (see default_frontier) is
+# thus "bucket" with the blocker graph heuristics, where its tie-breaking
+# explores about 6% fewer states on the benchmark corpus, and "heap",
+# which finds the same moves as the PriorityQueue, with the other two.
+FRONTIERS = {
+    "priorityqueue": PriorityQueue,
+    "heap": PlainHeapFrontier,
+    "heapq": HeapFrontier,
+    "bucket": BucketFrontier,
+}
+
+
+# Returns the name of the frontier used when none is given
+#   @param:
+#   heuristic: the choice of heuristic of the search
+#   metric: the moves and their costs, one of METRICS, the slides being
+#           searched with heuristic 3
+def default_frontier(heuristic, metric="cells"):
+    if heuristic in (2, 3) or metric == "slides":
+        return "bucket"
+    return "heap"
+
+
+
+
+# An object collecting the metrics of an A* search, passed to solve() as
+# the stats option (the search runs without any of this when it is not)
+#   @param:
+#   hook: a function called with the SearchStats every `every` expansions,
+#         or None
+#   every: the number of expansions between two calls of the hook
+#
+# The counters:
+#   expanded: the number of states expanded
+#   successors: the number of gameboards reached by the moves of those
+#   generated: the number of states put in the frontier
+#   pruned: the successors dropped as redundant moves (see MovePruning)
+#   duplicates: the successors dropped as already reached in as few moves
+#   reopened: the explored states put back in the frontier after being
+#             reached through a shorter path
+#   peak_frontier: the largest number of states waiting in the frontier
+#   peak_closed: the largest number of explored states
+#   node_bytes: the bytes of the NodeStore at the end of the search (see
+#               NodeStore.memory_usage)
+#   times: the seconds spent in move generation ("successors"), heuristic
+#          evaluation ("heuristic"), duplicate detection ("duplicates")
+#          and goal testing ("goal")
+class SearchStats(object):
+    def __init__(self, hook=None, every=1000):
+        self.hook = hook
+        self.every = every
+        self.expanded = 0
+        self.successors = 0
+        self.generated = 0
+        self.pruned = 0
+        self.duplicates = 0
+        self.reopened = 0
+        self.peak_frontier = 0
+        self.peak_closed = 0
+        self.node_bytes = 0
+        self.times = {"successors": 0.0, "heuristic": 0.0,
+                      "duplicates": 0.0, "goal": 0.0}
+
+    # Returns the function adding the time spent in every call to times
+    def timed(self, name, function):
+        times = self.times
+
+        def timed_function(*args):
+            start = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                times[name] += time.perf_counter() - start
+        return timed_function
+
+    # Records one expansion, with the sizes of the tables after it
+    def expansion(self, frontier_size, closed_size):
+        self.expanded += 1
+        if frontier_size > self.peak_frontier:
+            self.peak_frontier = frontier_size
+        if closed_size > self.peak_closed:
+            self.peak_closed = closed_size
+        if self.hook is not None and self.expanded % self.every == 0:
+            self.hook(self)
+
+    # Returns the metrics as a dictionary
+    def to_dict(self):
+        return {
+            "expanded": self.expanded,
+            "successors": self.successors,
+            "generated": self.generated,
+            "pruned": self.pruned,
+            "duplicates": self.duplicates,
+            "reopened": self.reopened,
+            "peak_frontier": self.peak_frontier,
+            "peak_closed": self.peak_closed,
+            "node_bytes": self.node_bytes,
+            "times": dict(self.times),
+        }
+
+    # Returns the metrics as a JSON string
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+
+# A backend timing its calls into a SearchStats, and counting the
+# successors, with every other member taken from the backend it wraps
+class InstrumentedBackend(object):
+    def __init__(self, backend, stats):
+        self.backend = backend
+        self.stats = stats
+        self.is_goal = stats.timed("goal", backend.is_goal)
+        self.heuristic = stats.timed("heuristic", backend.heuristic)
+        self.timed_successors = stats.timed("successors", backend.successors)
+        self.timed_slides = stats.timed("successors", backend.slides)
+
+    def successors(self, state):
+        new_boards = self.timed_successors(state)
+        self.stats.successors += len(new_boards)
+        return new_boards
+
+    def slides(self, state):
+        new_boards = self.timed_slides(state)
+        self.stats.successors += len(new_boards)
+        return new_boards
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+
+
+
+# The result of solving a gameboard, returned by solve()
+#   table: the VehicleTable of the initial board
+#   moves: the list of (vehicle, delta) moves taking X to the exit,
+#          None if there is no solution
+#   expanded: the number of states explored
+#   generated: the number of states put in the frontier
+#   time: the wall time of the search in seconds
+#   info: a dictionary of other counters reported by the search mode
+class Solution(object):
+    __slots__ = ("table", "moves", "expanded", "generated", "time", "info")
+
+    def __init__(self, table, moves, expanded, generated, time, info=None):
+        self.table = table
+        self.moves = moves
+        self.expanded = expanded
+        self.generated = generated
+        self.time = time
+        self.info = {} if info is None else info
+
+    # Whether a solution was found
+    @property
+    def solved(self):
+        return self.moves is not None
+
+    # The number of moves of the solution, None if there is no solution
+    @property
+    def length(self):
+        if self.moves is None:
+            return None
+        return len(self.moves)
+
+    # The number of cells travelled by the vehicles, the same as the length
+    # when every move takes one cell
+    @property
+    def cells(self):
+        if self.moves is None:
+            return None
+        return sum(abs(delta) for vehicle, delta in self.moves)
+
+    # Returns the moves written such as "A+1" or "X+2"
+    def move_names(self):
+        if self.moves is None:
+            return None
+        return self.table.move_names(self.moves)
+
+    # Generates the gameboard strings from the initial board to the exit
+    def boards(self):
+        if self.moves is None:
+            return iter(())
+        return self.table.replay(self.moves)
+
+    def __repr__(self):
+        return "Solution(length=%r, moves=%r, expanded=%d, generated=%d, " \
+               "time=%.6f)" % (self.length, self.move_names(), self.expanded,
+                               self.generated, self.time)
 
 
 
 
 # This function provides an overall structure on the steps taken to solve
-# the game Rush Hour
+# the game Rush Hour, printing out every board of the solution
 #   @param:
 #   heuristic: the choice to heuristic to use in solve the game
 #   state: the initial state of the gameboard
-def rushhour(heuristic, state):
-    # Converts the list of string into a single string for the initial board
-    initial_board = ""
-    for row in state:
-        initial_board += row
+#   The other parameters are passed on to solve()
+def rushhour(heuristic, state, backend="vehicles", frontier=None,
+             incremental=False, verify_heuristic=False, mode="astar",
+             **options):
+    solution = solve(heuristic, state, backend, frontier, incremental,
+                     verify_heuristic, mode, **options)
+    if not solution.solved:
+        print ("No solution found")
+        if "unsolvable" in solution.info:
+            print ("Unsolvable: " + solution.info["unsolvable"])
+        print ("Total states explored: " + str(solution.expanded))
+        return
+
+    # Prints out the result of the game
+    for board in solution.boards():
+        print_board(construct_board(board, solution.table.shape))
+    print ('Total moves: ' + str(solution.length))
+    print ("Total states explored: " + str(solution.expanded))
+
+
+
+
+# This function solves the game Rush Hour without printing anything
+#   @param:
+#   heuristic: the choice to heuristic to use in solve the game, 0 for
+#              blocking_heuristic, 1 for custome_heuristic, 2 for
+#              VehicleTable.blocker_graph_heuristic, which never
+#              overestimates the moves left counted in cells (the cells
+#              and distance metrics) but does overestimate the slides
+#              left, and 3 for the same heuristic counting slides, which
+#              never overestimates the moves left under any metric (see
+#              cluster.check_heuristic)
+#   state: the initial state of the gameboard, as its rows (see
+#          parse_state)
+#   backend: the name of the board representation used in the search,
+#            one of the keys of BACKENDS
+#   frontier: the name of the queue ordering the states to explore,
+#             one of the keys of FRONTIERS (A* only), which may change the
+#             moves found with heuristics 0 and 1, or None for the one of
+#             default_frontier()
+#   incremental: whether the h_n of a new state is updated from its parent
+#                (see IncrementalHeuristic) instead of computed again
+#                (A* only)
+#   verify_heuristic: checks every updated h_n against a full computation
+#   mode: the search algorithm, one of the keys of SEARCHES
+#   metric: the moves and their costs, one of METRICS (A* only); the
+#           slides are always searched with heuristic 3, whatever the
+#           heuristic given, as the others may overestimate the slides left
+#   precheck: whether VehicleTable.unsolvable() is asked first, returning
+#             a Solution without moves and with the reason under
+#             info["unsolvable"] when the puzzle can never be solved
+#   exit_row: the row of the exit, counted from 0, the middle row (the
+#             third row of a 6x6 board) when None
+#   options: the other options of the search algorithm
+#
+#   returns a Solution
+#   raises ValueError when the gameboard is not valid (see validate_board)
+def solve(heuristic, state, backend="vehicles", frontier=None,
+          incremental=False, verify_heuristic=False, mode="astar",
+          metric="cells", precheck=True, exit_row=None, **options):
+    start = time.perf_counter()
+
+    # Converts the list of string into a single string for the initial
+    # board, and finds the shape of the board from the rows
+    initial_board, shape = parse_state(state, exit_row)
+
+    # Parses the initial board into the chosen representation
+    if backend not in BACKENDS:
+        raise ValueError("unknown backend: " + str(backend))
+    if mode not in SEARCHES:
+        raise ValueError("unknown mode: " + str(mode))
+    if mode == "astar":
+        options.update(frontier=frontier, incremental=incremental,
+                       verify_heuristic=verify_heuristic, metric=metric)
+    elif metric != "cells":
+        raise ValueError("the %s metric needs the astar mode" % metric)
+    validate_board(initial_board, shape)
+    backend = BACKENDS[backend](initial_board, shape)
+    table = backend.table
+    if precheck:
+        reason = table.unsolvable()
+        if reason is not None:
+            return Solution(table, None, 0, 0, time.perf_counter() - start,
+                            {"unsolvable": reason})
+
+    # Gets the moves from the initial board to a goal state, and completes
+    # the move to the exit in case it has not reach the exit
+    moves, expanded, generated, info = SEARCHES[mode](heuristic, backend,
+                                                      **options)
+    if moves is not None:
+        moves += table.exit_moves(table.apply(table.start, moves),
+                                  metric != "cells")
+    return Solution(table, moves, expanded, generated,
+                    time.perf_counter() - start, info)
+
+
+
+
+# Every search algorithm below is a function taking the heuristic, the
+# backend (see StringBackend) and its own options, and returning
+# (moves, expanded, generated, info): the list of (vehicle, delta) moves to
+# a goal state (None if there is none), the numbers of states expanded and
+# generated, and a dictionary of other counters
+#
+# This one runs the A* search of state_search()
+#   @param:
+#   frontier: the name of the queue ordering the states to explore, None
+#             for the one of default_frontier()
+#   incremental: whether IncrementalHeuristic is used
+#   verify_heuristic: checks every updated h_n against a full computation
+#   metric: the moves and their costs, one of METRICS, the slides being
+#           searched with heuristic 3 in place of the heuristic given
+#   stats: a SearchStats collecting the metrics of the search, or None
+#   pruning: the moves dropped from every expanded state, one of PRUNINGS
+#            (see MovePruning), "commute" needing the cells metric
+#
+#   info holds the metrics of the stats under "stats" when it is given, the
+#   moves dropped under "pruned" and the bytes of the NodeStore under
+#   "node_bytes"
+def astar_search(heuristic, backend, frontier=None, incremental=False,
+                 verify_heuristic=False, metric="cells", stats=None,
+                 pruning="inverse"):
+    if frontier is None:
+        frontier = default_frontier(heuristic, metric)
+    if frontier not in FRONTIERS:
+        raise ValueError("unknown frontier: " + str(frontier))
+    if metric not in METRICS:
+        raise ValueError("unknown metric: " + str(metric))
+    if pruning == "commute" and metric != "cells":
+        raise ValueError("the commute pruning needs the cells metric")
+    if metric == "slides":
+        # Only heuristic 3 never overestimates the slides left
+        heuristic = 3
+    initial_board = backend.initial
+    pruner = None
+    if pruning != "none":
+        pruner = MovePruning(backend, pruning)
 
     # Finds the h(n) of the initial state
-    cur_h_n = 0
-    if heuristic == 0:
-        cur_h_n = blocking_heuristic(initial_board)
-    else :
-        cur_h_n = custome_heuristic(initial_board)
+    evaluator = None
+    h_parts = None
+    if incremental:
+        evaluator = IncrementalHeuristic(heuristic, backend, verify_heuristic)
+        initial = evaluator.initial
+        if stats is not None:
+            initial = stats.timed("heuristic", initial)
+            evaluator.child = stats.timed("heuristic", evaluator.child)
+    if stats is not None:
+        backend = InstrumentedBackend(backend, stats)
+    if incremental:
+        cur_h_n, h_parts = initial(initial_board)
+    else:
+        cur_h_n = backend.heuristic(heuristic, initial_board)
 
     # Creates the first state
-    initial_state = BoardState(initial_board, 0, cur_h_n, cur_h_n + 0, None)
+    nodes = NodeStore()
+    initial_state = BoardState(initial_board, 0, cur_h_n, cur_h_n + 0,
+                               nodes.add(-1, 0, 0, 0), h_parts)
 
-    # Creates a PriorityQueue to store all the states in order
-    frontier = PriorityQueue()
+    # Creates a queue to store all the states in order
+    frontier = FRONTIERS[frontier]()
     frontier.put(initial_state)
 
-    # Creates two lists to store the explored and unexplored states
-    explored_states = []
-    unexplored = []
+    # Creates two tables to store the explored and unexplored states,
+    # both keyed by the gameboard
+    explored_states = {}
+    unexplored = {initial_board: initial_state}
 
     # Uses the given choice of heuristics to determine the optimal solution
     # Gets the end state
     end_state = state_search(frontier,
                              heuristic,
                              explored_states,
-                             unexplored)
+                             unexplored,
+                             backend,
+                             nodes,
+                             evaluator,
+                             metric,
+                             stats,
+                             pruner)
+    moves = None
+    if end_state != []:
+        # Gets the moves by following the parents
+        moves = nodes.path(end_state.node)
+    info = {"node_bytes": nodes.memory_usage()}
+    if pruner is not None:
+        info["pruned"] = pruner.to_dict()
+    if stats is not None:
+        stats.generated = len(nodes)
+        stats.node_bytes = info["node_bytes"]
+        if pruner is not None:
+            stats.pruned = pruner.inverse + pruner.commuted
+        stats.duplicates = stats.successors - stats.pruned - (len(nodes) - 1)
+        info["stats"] = stats.to_dict()
+    return moves, len(explored_states), len(nodes), info
+
+
+# This one runs an iterative deepening A* search (IDA*)
+# Each iteration is a depth first search cutting off the states whose f_n
+# is over a bound, the bound growing to the smallest f_n cut off until a
+# goal state is found. Only the current path and the moves left to try
+# along it are kept, so the memory grows with the depth of the solution.
+#   @param:
+#   table_size: the number of gameboards a transposition table may hold,
+#               remembering the smallest g_n each was reached with during
+#               the iteration to skip the repeated ones (0 for no table,
+#               which only avoids the gameboards on the current path and
+#               re-expands the many transpositions of this puzzle)
+#   pruning: the moves dropped from every expanded state, one of PRUNINGS
+#            (see MovePruning)
+#
+#   info reports the number of iterations, of visited states and of the
+#   moves dropped
+def ida_search(heuristic, backend, table_size=10000, pruning="inverse"):
+    initial_board = backend.initial
+    pruner = None
+    if pruning != "none":
+        pruner = MovePruning(backend, pruning)
+    root = BoardState(initial_board, 0, 0, 0, -1)
+    root.h_n = backend.heuristic(heuristic, initial_board)
+    root.f_n = root.h_n
+    bound = root.f_n
+    iterations = 0
+    visits = 0
+    expanded = 0
+    generated = 0
+
+    while True:
+        iterations += 1
+        next_bound = None
+        transpositions = {}
+
+        # The path from the root, with the moves taken and the moves left
+        # to try at every depth
+        path = [root]
+        moves = []
+        children = [None]
+        on_path = {initial_board}
+        visits += 1
+        while path:
+            state = path[-1]
+            if children[-1] is None:
+                # Visits the state at the top of the path
+                if state.f_n > bound:
+                    if next_bound is None or state.f_n < next_bound:
+                        next_bound = state.f_n
+                    children[-1] = iter(())
+                elif backend.is_goal(state):
+                    return moves, expanded, generated, \
+                           ida_info(iterations, visits, pruner)
+                else:
+                    expanded += 1
+                    new_boards = backend.successors(state)
+                    if pruner is not None and moves:
+                        new_boards = pruner.prune(state.board, moves[-1][0],
+                                                  moves[-1][1], new_boards)
+                    children[-1] = iter(new_boards)
+
+            for board, vehicle, delta in children[-1]:
+                generated += 1
+                if board in on_path:
+                    continue
+                g_n = state.g_n + 1
+                if table_size:
+                    known = transpositions.get(board)
+                    if known is not None and known <= g_n:
+                        continue
+                    if known is not None or \
+                       len(transpositions) < table_size:
+                        transpositions[board] = g_n
+                h_n = backend.heuristic(heuristic, board)
+                path.append(BoardState(board, g_n, h_n, g_n + h_n, -1))
+                moves.append((vehicle, delta))
+                children.append(None)
+                on_path.add(board)
+                visits += 1
+                break
+            else:
+                # Every move has been tried, goes back up the path
+                on_path.discard(path.pop().board)
+                children.pop()
+                if moves:
+                    moves.pop()
+
+        # No state was cut off, the whole reachable space has no goal
+        if next_bound is None:
+            return None, expanded, generated, \
+                   ida_info(iterations, visits, pruner)
+        bound = next_bound
+
+
+# Returns the info of ida_search()
+def ida_info(iterations, visits, pruner):
+    info = {"iterations": iterations, "visits": visits}
+    if pruner is not None:
+        info["pruned"] = pruner.to_dict()
+    return info
+
+
+# This one runs a bidirectional A* search meeting in the middle (MM)
+# A forward search grows from the initial board, ordered by the heuristic
+# given, and a backward search from the goal states, ordered by
+# VehicleTable.start_distance_heuristic. Every move can be undone, so the
+# backward search uses the same moves as the forward one. Each side takes
+# out the state of the lowest priority max(f_n, g_n / share), share being
+# the part of the moves it is meant to cover (split forward, 1 - split
+# backward), and the side with the lower priority is expanded. Every path
+# from the initial board to a goal state which has not been found yet
+# goes through a state waiting on each side, so it takes at least
+#   the lowest priority of the two sides
+#   the lowest g_n of the two sides added up, plus the move between them
+# and the search stops once the shortest path found is no longer than the
+# larger of these bounds. A state reached again through a shorter path is
+# queued again, even if it was expanded.
+# The goal states are put in the backward search in order of the cells
+# their vehicles are away from the initial board, which is at most their
+# priority, one distance at a time as the search needs them (see
+# VehicleTable.goal_states), instead of all of them at the start.
+# The moves are the fewest only with the heuristics which never
+# overestimate them (2 and 3). This is not a faster search: on the
+# benchmark corpus it expands more states than astar_search() with
+# heuristic 2, as there are thousands of goal states close to one another
+# and the backward heuristic cannot tell them apart.
+#   @param:
+#   split: the part of the moves the forward search is meant to cover,
+#          between 0 and 1
+#
+#   info reports the number of goal states put in the backward search and
+#   the states expanded on each side
+def bidirectional_search(heuristic, backend, split=0.5):
+    if not 0 < split < 1:
+        raise ValueError("the split must be between 0 and 1")
+    table = backend.table
+    count = len(table.ids)
+    shares = (split, 1 - split)
+
+    # For each side: the best g_n of every gameboard seen, the move from
+    # its parent leading to it, the heap of (priority, order, g_n, board),
+    # the heap of (g_n, order, board) and the expanded gameboards
+    g_n = [{}, {}]
+    parents = [{}, {}]
+    queues = [[], []]
+    depths = [[], []]
+    closed = [set(), set()]
+    expanded = [0, 0]
+    generated = 0
+    order = 0
+    info = {"goals": 0}
+
+    # The estimate of the moves left on each side
+    def h_n(side, board):
+        if side == 0:
+            return backend.heuristic(heuristic, board)
+        return table.start_distance_heuristic(
+            bytes(backend.offset(board, v) for v in range(count)))
+
+    def put(side, board, g, parent):
+        nonlocal order
+        g_n[side][board] = g
+        parents[side][board] = parent
+        closed[side].discard(board)
+        order += 1
+        heapq.heappush(queues[side], (max(g + h_n(side, board),
+                                          g / shares[side]),
+                                      order, g, board))
+        heapq.heappush(depths[side], (g, order, board))
+
+    # Drops the outdated entries from the top of a heap
+    def head(side, queue, g_index, board_index):
+        while queue and (queue[0][board_index] in closed[side] or
+                         g_n[side][queue[0][board_index]] !=
+                         queue[0][g_index]):
+            heapq.heappop(queue)
+        return queue[0] if queue else None
+
+    start = backend.initial
+    put(0, start, 0, None)
+    best = None
+    meet = None
+    if backend.is_goal(BoardState(start, 0, 0, 0, -1)):
+        best, meet = 0, start
+    # The goal states at this distance from the initial board are the next
+    # ones put in the backward search, None once all of them are
+    distance = 0
+    farthest = sum(max(table.start[v], len(table.cells[v]) - 1 -
+                       table.start[v]) for v in range(count))
+
+    while True:
+        top = head(0, queues[0], 2, 3)
+        bottom = head(1, queues[1], 2, 3)
+        if top is None or (bottom is None and distance is None):
+            break
+        # The goal states not put yet wait with g_n 0, and a priority of at
+        # least their distance from the initial board
+        backward = float("inf") if bottom is None else bottom[0]
+        if distance is None:
+            backward_g = head(1, depths[1], 0, 2)[0]
+        else:
+            backward = min(backward, distance)
+            backward_g = 0
+        lowest = head(0, depths[0], 0, 2)[0] + backward_g + 1
+        if best is not None and best <= max(min(top[0], backward), lowest):
+            break
 
-    # Creates a list to store the result gameboard in sequence
-    answer = []
+        side = 0 if top[0] <= backward else 1
+        if side == 1 and distance is not None and \
+           (bottom is None or distance <= bottom[0]):
+            # Puts the goal states at the next distance
+            for offsets in table.goal_states(distance):
+                board = backend.from_offsets(offsets)
+                info["goals"] += 1
+                if board not in g_n[1]:
+                    put(1, board, 0, None)
+                    if board in g_n[0] and \
+                       (best is None or g_n[0][board] < best):
+                        best, meet = g_n[0][board], board
+            distance = distance + 1 if distance < farthest else None
+            continue
+
+        entry = heapq.heappop(queues[side])
+        board = entry[3]
+        closed[side].add(board)
+        expanded[side] += 1
+        for new_board, vehicle, delta in \
+                backend.successors(BoardState(board, 0, 0, 0, -1)):
+            generated += 1
+            # A goal state is 0 moves away from the goal states, whichever
+            # side reaches it
+            goal = backend.is_goal(BoardState(new_board, 0, 0, 0, -1))
+            g = 0 if goal and side == 1 else entry[2] + 1
+            if g_n[side].get(new_board, g + 1) <= g:
+                continue
+            put(side, new_board, g, None if g == 0 else
+                (board, vehicle, delta))
+            if side == 0:
+                ends = (g, 0 if goal else g_n[1].get(new_board))
+            else:
+                ends = (g_n[0].get(new_board), g)
+            if None not in ends and (best is None or sum(ends) < best):
+                best, meet = sum(ends), new_board
+
+    info.update(forward_expanded=expanded[0], backward_expanded=expanded[1])
+    if meet is None:
+        return None, sum(expanded), generated, info
+    # Follows the forward parents back to the initial board, then the
+    # backward parents on to a goal state, undoing each backward move
+    moves = []
+    board = meet
+    while parents[0][board] is not None:
+        board, vehicle, delta = parents[0][board]
+        moves.append((vehicle, delta))
+    moves = reverse(moves)
+    board = meet
+    while parents[1].get(board) is not None:
+        board, vehicle, delta = parents[1][board]
+        moves.append((vehicle, -delta))
+    return moves, sum(expanded), generated, info
+
+
+
+
+# This one runs an anytime weighted A* search (ARA*)
+# A first solution is found quickly by ordering the states by
+# g_n + weight * h_n, then the weight is lowered by weight_step and the
+# search goes on from the states left in the frontier, along with the
+# explored states reached again through a shorter path, until the weight
+# reaches 1, the solution is proven to be within epsilon times the shortest
+# one or the time runs out. The best solution found so far is always
+# returned.
+#   @param:
+#   weight: the weight of h_n in the first search
+#   weight_step: how much the weight is lowered after every search
+#   epsilon: the search stops once the solution is proven to be at most
+#            epsilon times as long as the shortest one
+#   time_limit: the number of seconds the search may run, or None
+#
+#   info reports the number of searches, the weight of the last search
+#   finished, whether the time ran out, and the bound: the solution takes at
+#   most bound times the fewest moves to a goal state, provided the
+#   heuristic never overestimates them (None when no solution was found),
+#   and the bytes of the NodeStore
+def anytime_search(heuristic, backend, weight=3.0, weight_step=0.5,
+                   epsilon=1.0, time_limit=None):
+    if weight < 1 or weight_step <= 0:
+        raise ValueError("the weight must be at least 1 and the weight step "
+                         "positive")
+    deadline = None
+    if time_limit is not None:
+        deadline = time.perf_counter() + time_limit
+    initial_board = backend.initial
+    nodes = NodeStore()
+    h_n = backend.heuristic(heuristic, initial_board)
+    root = BoardState(initial_board, 0, h_n, h_n, nodes.add(-1, 0, 0, 0))
+
+    # states holds the state of every gameboard seen with the best g_n found,
+    # open_states the ones waiting to be explored and incons the explored
+    # ones reached again through a shorter path, explored again by the next
+    # search only
+    states = {initial_board: root}
+    open_states = {initial_board: root}
+    incons = {}
+    goal = None
+    expanded = 0
+    generated = 0
+    searches = 0
+    finished_weight = None
+    out_of_time = False
+
+    while True:
+        searches += 1
+        frontier = HeapFrontier()
+        for state in open_states.values():
+            state.f_n = state.g_n + weight * state.h_n
+            frontier.put(state)
+        closed = set()
+
+        while not frontier.empty():
+            if deadline is not None and time.perf_counter() > deadline:
+                out_of_time = True
+                break
+            curr_head = frontier.get()
+            # Skips the outdated entries left behind in the queue
+            if open_states.get(curr_head.board) is not curr_head:
+                continue
+            # Nothing left can lead to a solution shorter than weight times
+            # the best one
+            if goal is not None and curr_head.f_n >= goal.g_n:
+                break
+            del open_states[curr_head.board]
+            if backend.is_goal(curr_head):
+                if goal is None or curr_head.g_n < goal.g_n:
+                    goal = curr_head
+                continue
+
+            closed.add(curr_head.board)
+            expanded += 1
+            cur_g_n = curr_head.g_n + 1
+            for board, vehicle, delta in backend.successors(curr_head):
+                generated += 1
+                known = states.get(board)
+                if known is not None:
+                    if known.g_n <= cur_g_n:
+                        continue
+                    cur_h_n = known.h_n
+                else:
+                    cur_h_n = backend.heuristic(heuristic, board)
+                node = nodes.add(curr_head.node, vehicle, delta, cur_g_n)
+                state = BoardState(board, cur_g_n, cur_h_n,
+                                   cur_g_n + weight * cur_h_n, node)
+                states[board] = state
+                if board in closed:
+                    incons[board] = state
+                else:
+                    open_states[board] = state
+                    frontier.put(state)
+
+        if not out_of_time:
+            finished_weight = weight
+        bound = anytime_bound(goal, finished_weight, open_states, incons)
+        if out_of_time or weight == 1 or \
+           (bound is not None and bound <= epsilon):
+            break
+        if goal is None and not open_states and not incons:
+            break
+        weight = max(1, weight - weight_step)
+        open_states.update(incons)
+        incons = {}
+
+    moves = None
+    if goal is not None:
+        moves = nodes.path(goal.node)
+    return moves, expanded, generated, \
+           {"searches": searches, "weight": finished_weight, "bound": bound,
+            "out_of_time": out_of_time, "node_bytes": nodes.memory_usage()}
+
+
+# Returns how many times the fewest moves to a goal state the solution of
+# the anytime search may take at most, None if there is no solution
+# Every shortest path to a goal state goes through a state waiting in
+# open_states or incons with its shortest g_n, so the smallest g_n + h_n
+# among them cannot be over the fewest moves.
+#   @param:
+#   goal: the goal state of the best solution, or None
+#   finished_weight: the weight of the last search finished, or None
+#   open_states, incons: the states left to explore
+def anytime_bound(goal, finished_weight, open_states, incons):
+    if goal is None:
+        return None
+    bound = finished_weight
+    lower = None
+    for states in (open_states, incons):
+        for state in states.values():
+            if lower is None or state.g_n + state.h_n < lower:
+                lower = state.g_n + state.h_n
+    if lower is None or goal.g_n == 0:
+        # Nothing is left to explore, no shorter solution exists
+        return 1.0
+    if lower > 0 and (bound is None or goal.g_n / lower < bound):
+        bound = goal.g_n / lower
+    if bound is not None:
+        bound = max(float(bound), 1.0)
+    return bound
 
-    # Fills up the list by getting the parent board repeatedly until reach the
-    # initial board
-    while end_state != initial_state:
-        answer.append(construct_board(end_state.board))
-        end_state = end_state.parent
-    answer.append(construct_board(initial_state.board))
-    answer = reverse(answer)
-    answer = complete_exit_move(answer) # In case it has not reach the exit
 
-    # Prints out the result of the game
-    for board in answer:
-        print_board(board)
-    print ('Total moves: ' + str(len(answer) - 1))
-    print ("Total states explored: " + str(len(explored_states)))
+# This one runs the A* search over several processes with HDA*, see
+# parallel.hda_search() for its options
+def hda_search(heuristic, backend, **options):
+    import parallel
+    return parallel.hda_search(heuristic, backend, **options)
+
+
+# This one runs the A* search with its states on disk, see
+# external.external_search() for its options
+def external_search(heuristic, backend, **options):
+    import external
+    return external.external_search(heuristic, backend, **options)
+
+
+# This one runs the A* search on batches of states in NumPy arrays, see
+# vectorized.vectorized_search() for its options
+def vectorized_search(heuristic, backend, **options):
+    import vectorized
+    return vectorized.vectorized_search(heuristic, backend, **options)
+
+
+# The ways of counting the moves of a solution in the A* search
+#   cells: a move takes one vehicle one cell away
+#   slides: a move slides one vehicle any number of cells in one direction
+#   distance: the same slides, each costing the number of cells travelled
+METRICS = ("cells", "slides", "distance")
+
+
+# The search algorithms that can be chosen in solve()
+SEARCHES = {
+    "astar": astar_search,
+    "idastar": ida_search,
+    "bidirectional": bidirectional_search,
+    "hda": hda_search,
+    "anytime": anytime_search,
+    "external": external_search,
+    "vectorized": vectorized_search,
+}
 
 
 
@@ -97,59 +1107,1334 @@ def rushhour(heuristic, state):
 # This function performs a state search
 # It follows the idea of A* algorithm
 #   @param:
-#   frontier: a PriorityQueue storing all the newly generated states
+#   frontier: a queue storing all the newly generated states, either a
+#             PriorityQueue or one of the classes in FRONTIERS
 #   heuristic: determine which heuristics to be used in the search
-#   explored_states: a list of explored_states
+#   explored_states: a dictionary of the NodeStore indices of the explored
+#                    states keyed by gameboard
 #                    (cannot iterator through PriorityQueue)
-#   unexplored: a list of unexplored states
+#   unexplored: a dictionary of unexplored states keyed by gameboard,
+#               holding the state with the best g_n found so far
+#   backend: the board representation (see StringBackend)
+#   nodes: the NodeStore recording the states created
+#   evaluator: an IncrementalHeuristic updating the h_n of the new states
+#              from their parent, the h_n is computed from scratch when it
+#              is not given
+#   metric: the moves and their costs, one of METRICS
+#   stats: a SearchStats collecting the metrics of the search, or None
+#   pruner: a MovePruning dropping the redundant moves, or None
+#
+#   ***** A gameboard reached again through a shorter path is queued   *****
+#   ***** again instead of being updated inside the PriorityQueue; the *****
+#   ***** outdated entry is skipped when it comes out of the queue.    *****
+#
+#   ***** With the slides and distance metrics, a goal state is queued *****
+#   ***** again with the cost of driving X to the exit added, so that  *****
+#   ***** the solution is the shortest one up to the exit.             *****
 #
 #   ***** returns only the end goal state *****
-def state_search(frontier, heuristic, explored_states, unexplored):
-    if frontier.empty():
-        return []
-
-    curr_head = frontier.get()
-    if reach_goal(curr_head):
-        return curr_head
-    else:
-        new_boards = generate_new_boards(curr_head)
-        explored_states.append(curr_head)
+def state_search(frontier, heuristic, explored_states, unexplored, backend,
+                 nodes, evaluator=None, metric="cells", stats=None,
+                 pruner=None):
+    expand = backend.successors if metric == "cells" else backend.slides
+    by_distance = metric == "distance"
+    table = backend.table
+    exit_col = table.shape.width - table.length[table.x]
+    # The goal states queued again with the cost of the exit, by gameboard
+    exits = {}
+    while not frontier.empty():
+        curr_head = frontier.get()
+
+        # Skips the outdated entries left behind in the queue
+        if unexplored.get(curr_head.board) is not curr_head:
+            continue
+        del unexplored[curr_head.board]
+
+        if backend.is_goal(curr_head):
+            if metric == "cells" or exits.get(curr_head.board) is curr_head:
+                return curr_head
+            exit_cost = exit_col - backend.offset(curr_head.board, table.x)
+            if not by_distance:
+                exit_cost = min(exit_cost, 1)
+            if exit_cost == 0:
+                return curr_head
+            g_n = curr_head.g_n + exit_cost
+            state = BoardState(curr_head.board, g_n, 0, g_n, curr_head.node)
+            exits[curr_head.board] = state
+            frontier.put(state)
+            unexplored[curr_head.board] = state
+            continue
+
+        new_boards = expand(curr_head)
+        node = curr_head.node
+        if pruner is not None and nodes.parent[node] >= 0:
+            new_boards = pruner.prune(curr_head.board, nodes.vehicle[node],
+                                      nodes.delta[node], new_boards)
+        explored_states[curr_head.board] = curr_head.node
+        if stats is not None:
+            start = time.perf_counter()
+            heuristic_time = stats.times["heuristic"]
 
         # Adds the appropriate new states to the queue
-        for board in new_boards:
-            cur_h_n = compute_heuristic(heuristic, board)
-            cur_g_n = curr_head.g_n + 1
+        cur_g_n = curr_head.g_n + 1
+        for board, vehicle, delta in new_boards:
+            if by_distance:
+                cur_g_n = curr_head.g_n + abs(delta)
+            known = unexplored.get(board)
+            if known is not None:
+                # Ignores the boards already reached with as few steps
+                if known.g_n <= cur_g_n:
+                    continue
+                cur_h_n = known.h_n
+                h_parts = known.h_parts
+            else:
+                if board in explored_states:
+                    if nodes.g_n[explored_states[board]] <= cur_g_n:
+                        continue
+                    # Reopens an explored board reached through a shorter
+                    # path
+                    del explored_states[board]
+                    if stats is not None:
+                        stats.reopened += 1
+                if evaluator is not None:
+                    cur_h_n, h_parts = evaluator.child(curr_head.h_n,
+                                                       curr_head.h_parts,
+                                                       board, vehicle, delta)
+                else:
+                    cur_h_n = backend.heuristic(heuristic, board)
+                    h_parts = None
             cur_f_n = cur_h_n + cur_g_n
-            state = BoardState(board, cur_g_n, cur_h_n, cur_f_n, curr_head)
-
-            if check_repeatition(state, unexplored) == True:
-                del state
-            elif check_repeatition(state, explored_states) == True:
-                del state
+            node = nodes.add(curr_head.node, vehicle, delta, cur_g_n)
+            state = BoardState(board, cur_g_n, cur_h_n, cur_f_n, node,
+                               h_parts)
+            frontier.put(state)
+            unexplored[board] = state
+
+        if stats is not None:
+            # The time of the loop above, but for the heuristic
+            stats.times["duplicates"] += time.perf_counter() - start - \
+                (stats.times["heuristic"] - heuristic_time)
+            stats.expansion(len(unexplored), len(explored_states))
+
+    return []
+
+
+
+
+# The search can run on different representations of the gameboard.
+# Every representation is a class built from the initial board string that
+# provides the same members:
+#   initial: the initial gameboard in this representation
+#   table: the VehicleTable of the initial board
+#   is_goal(state): whether the state has reached the goal state
+#   successors(state): a list of (new_board, vehicle, delta) for the
+#                      gameboards one move away from the state
+#   slides(state): the same for the gameboards one slide away, a slide
+#                  moving one vehicle any number of cells in one direction
+#   heuristic(heuristic, board): the h_n of the gameboard
+#   offset(board, vehicle): the offset of the vehicle (see VehicleTable)
+#   from_offsets(offsets): the gameboard with the vehicles at the offsets
+#   to_string(board): the gameboard as a single string
+#
+# This one works directly on the gameboard strings
+class StringBackend(object):
+    def __init__(self, board, shape=STANDARD):
+        self.table = VehicleTable(board, shape)
+        self.shape = shape
+        self.index = {self.table.ids[v]: v for v in range(len(self.table.ids))}
+        self.initial = board
+
+    def is_goal(self, state):
+        return reach_goal(state, self.shape)
+
+    # Finds the vehicle and the direction of each move by comparing the
+    # new gameboards with the current one
+    def successors(self, state):
+        new_boards = []
+        for board in generate_new_boards(state, self.shape):
+            vacated = entered = -1
+            for i in range(len(board)):
+                if board[i] != state.board[i]:
+                    if board[i] == '-':
+                        vacated = i
+                    else:
+                        entered = i
+            # generate_new_boards also moves the empty cells onto themselves
+            if entered < 0:
+                continue
+            new_boards.append((board, self.index[board[entered]],
+                               1 if entered > vacated else -1))
+        return new_boards
+
+    # Follows the one-cell moves of every vehicle as far as they go in the
+    # same direction
+    def slides(self, state):
+        new_boards = []
+        for board, vehicle, delta in self.successors(state):
+            new_boards.append((board, vehicle, delta))
+            step = delta
+            while True:
+                for next_board, next_vehicle, next_step in \
+                        self.successors(BoardState(board, 0, 0, 0, -1)):
+                    if next_vehicle == vehicle and next_step == step:
+                        board = next_board
+                        delta += step
+                        new_boards.append((board, vehicle, delta))
+                        break
+                else:
+                    break
+        return new_boards
+
+    def heuristic(self, heuristic, board):
+        if heuristic >= 2:
+            return self.table.blocker_graph_heuristic(bytes(
+                self.offset(board, v) for v in range(len(self.table.ids))),
+                heuristic == 3)
+        return compute_heuristic(heuristic, board, self.shape)
+
+    def offset(self, board, vehicle):
+        i = board.index(self.table.ids[vehicle])
+        if self.table.horizontal[vehicle]:
+            return i % self.shape.width
+        return i // self.shape.width
+
+    def from_offsets(self, offsets):
+        return self.table.to_string(offsets)
+
+    def to_string(self, board):
+        return board
+
+
+# This one stores a gameboard as the offsets of the vehicles along their
+# lanes (see VehicleTable), packed in a bytes object
+class VehicleBackend(object):
+    def __init__(self, board, shape=STANDARD):
+        self.table = VehicleTable(board, shape)
+        self.initial = self.table.start
+
+    def is_goal(self, state):
+        return self.table.reach_goal(state.board)
+
+    def successors(self, state):
+        return self.table.successors(state.board)
+
+    def slides(self, state):
+        return self.table.slides(state.board)
+
+    def heuristic(self, heuristic, board):
+        if heuristic == 0:
+            return self.table.blocking_heuristic(board)
+        if heuristic >= 2:
+            return self.table.blocker_graph_heuristic(board, heuristic == 3)
+        return custome_heuristic(self.table.to_string(board),
+                                 self.table.shape)
+
+    def offset(self, board, vehicle):
+        return board[vehicle]
+
+    def from_offsets(self, offsets):
+        return bytes(offsets)
+
+    def to_string(self, board):
+        return self.table.to_string(board)
+
+
+# This one stores a gameboard as a single integer: the lowest bits are the
+# occupancy of the cells (bit i for index i of the board string, 36 bits on
+# the standard board) and the vehicle offsets follow in fields of
+# offset_bits bits, just wide enough for the longest lane, so a move is one
+# exclusive or on the occupancy plus one addition on the offset field
+# Python integers have no fixed width, so the same encoding holds any size
+# of gameboard (64 occupancy bits on an 8x8 board).
+class BitboardBackend(object):
+    def __init__(self, board, shape=STANDARD):
+        table = VehicleTable(board, shape)
+        self.table = table
+        self.offset_bits = max(1, (max(table.lane_length) - 2).bit_length())
+        self.offset_mask = (1 << self.offset_bits) - 1
+        self.shift = [shape.size + self.offset_bits * v
+                      for v in range(len(table.ids))]
+
+        # masks[v][offset]: the cells taken by vehicle v at the offset
+        # moves[v][offset]: (bit, change, add) of each one-cell move, where
+        #   bit is the cell which has to be empty, change the cells flipped
+        #   by the move, add the change of the offset field and delta the
+        #   direction of the move
+        self.masks = []
+        self.moves = []
+        for v in range(len(table.ids)):
+            masks = [cells_to_mask(cells) for cells in table.cells[v]]
+            moves = []
+            for offset in range(len(masks)):
+                offset_moves = []
+                for delta, row, bit in table.moves[v][offset]:
+                    change = masks[offset] ^ masks[offset + delta]
+                    offset_moves.append((bit << (row * shape.width), change,
+                                         delta << self.shift[v], delta))
+                moves.append(tuple(offset_moves))
+            self.masks.append(tuple(masks))
+            self.moves.append(tuple(moves))
+
+        # For every offset of X: the exit row without X, the cells of the
+        # exit row to the right of X, and whether X is at the exit
+        x = table.x
+        exit_cells = shape.exit_cells()
+        exit_row = cells_to_mask(exit_cells)
+        self.x_shift = self.shift[x]
+        self.exit_row = []
+        self.ahead = []
+        self.at_exit = []
+        for offset in range(len(self.masks[x])):
+            x_mask = self.masks[x][offset]
+            self.exit_row.append(exit_row & ~x_mask)
+            self.ahead.append(cells_to_mask(exit_cells[offset + 1:])
+                              & ~x_mask)
+            self.at_exit.append(offset + table.length[x] == shape.width)
+
+        self.initial = self.encode(table.start)
+
+    # Packs the offsets of the vehicles into the integer gameboard
+    def encode(self, offsets):
+        board = 0
+        for v in range(len(offsets)):
+            board |= self.masks[v][offsets[v]]
+            board |= offsets[v] << self.shift[v]
+        return board
+
+    # Unpacks the offsets of the vehicles from the integer gameboard
+    def decode(self, board):
+        mask = self.offset_mask
+        return bytes((board >> shift) & mask for shift in self.shift)
+
+    def is_goal(self, state):
+        board = state.board
+        offset = (board >> self.x_shift) & self.offset_mask
+        return self.at_exit[offset] or not board & self.exit_row[offset]
+
+    def successors(self, state):
+        board = state.board
+        mask = self.offset_mask
+        new_boards = []
+        for v in range(len(self.shift)):
+            for bit, change, add, delta in \
+                    self.moves[v][(board >> self.shift[v]) & mask]:
+                if not board & bit:
+                    new_boards.append(((board ^ change) + add, v, delta))
+        return new_boards
+
+    def slides(self, state):
+        board = state.board
+        mask = self.offset_mask
+        new_boards = []
+        for v in range(len(self.shift)):
+            shift = self.shift[v]
+            moves = self.moves[v]
+            for bit, change, add, step in moves[(board >> shift) & mask]:
+                new_board = board
+                delta = 0
+                # Keeps moving one cell in the same direction until blocked
+                while not new_board & bit:
+                    new_board = (new_board ^ change) + add
+                    delta += step
+                    new_boards.append((new_board, v, delta))
+                    for bit, change, add, next_step in \
+                            moves[(new_board >> shift) & mask]:
+                        if next_step == step:
+                            break
+                    else:
+                        break
+        return new_boards
+
+    def heuristic(self, heuristic, board):
+        if heuristic == 0:
+            offset = (board >> self.x_shift) & self.offset_mask
+            num_of_vehicle_blocking = (board & self.ahead[offset]).bit_count()
+            if num_of_vehicle_blocking == 0: return 0
+            return 1 + num_of_vehicle_blocking
+        if heuristic >= 2:
+            return self.table.blocker_graph_heuristic(self.decode(board),
+                                                      heuristic == 3)
+        return custome_heuristic(self.to_string(board), self.table.shape)
+
+    def offset(self, board, vehicle):
+        return (board >> self.shift[vehicle]) & self.offset_mask
+
+    def from_offsets(self, offsets):
+        return self.encode(offsets)
+
+    def to_string(self, board):
+        return self.table.to_string(self.decode(board))
+
+
+# Returns the bit mask with the bits of the given board indices set
+def cells_to_mask(cells):
+    mask = 0
+    for c in cells:
+        mask |= 1 << c
+    return mask
+
+
+# This function checks that a gameboard string is a valid puzzle: one cell
+# per cell of the shape, '-' for the empty ones, X a car on the exit row,
+# and every vehicle a straight line of at least two cells in one row or one
+# column
+#   @param:
+#   board: the gameboard in the form of a single string
+#   shape: the BoardShape of the gameboard
+#
+#   raises ValueError telling what is wrong with the gameboard
+def validate_board(board, shape=STANDARD):
+    width = shape.width
+    if len(board) != shape.size:
+        raise ValueError("the board must have %d cells, not %d" %
+                         (shape.size, len(board)))
+    positions = {}
+    for i in range(len(board)):
+        if board[i] == '-':
+            continue
+        if not board[i].isalnum():
+            raise ValueError("invalid cell %r at row %d, column %d" %
+                             (board[i], i // width + 1, i % width + 1))
+        positions.setdefault(board[i], []).append(i)
+    if 'X' not in positions:
+        raise ValueError("car X is missing")
+
+    for vehicle, cells in positions.items():
+        if len(cells) < 2:
+            raise ValueError("vehicle %s takes a single cell" % vehicle)
+        first = cells[0]
+        # Horizontal cells follow each other in one row, vertical ones are
+        # one row apart in one column
+        if all(c // width == first // width for c in cells):
+            step = 1
+        else:
+            step = width
+        if cells != list(range(first, first + step * len(cells), step)):
+            raise ValueError("vehicle %s is not a straight line of cells"
+                             % vehicle)
+    x_cells = positions['X']
+    if len(x_cells) != 2 or x_cells[0] // width != shape.exit_row or \
+       x_cells[1] // width != shape.exit_row:
+        raise ValueError("X must be a car on the exit row (row %d)" %
+                         (shape.exit_row + 1))
+
+
+# An object storing the fixed information about the vehicles on the
+# gameboard, parsed once from the initial board
+#   ids: the letter of every vehicle, in the order they first appear
+#   horizontal: whether each vehicle moves left and right
+#   lane: the row of a horizontal vehicle or the column of a vertical one
+#   length: the number of cells taken by each vehicle
+#   lane_length: the number of cells along the lane of each vehicle
+#   start: the offsets of the vehicles on the initial board
+#   shape: the BoardShape of the gameboard
+#
+# The offset of a vehicle is the column (horizontal) or the row (vertical)
+# of its first cell, and a gameboard is the bytes of all the offsets.
+# For every vehicle and offset it also precomputes
+#   cells: the indices of the cells taken on the board string
+#   rows: the (row, bits) pairs it adds to the occupancy of the rows
+#   moves: the (delta, row, bit) of its one-cell moves, the bit being the
+#          cell of that row which has to be empty for the move
+#   exit_cols: the columns it takes on the exit row
+class VehicleTable(object):
+    def __init__(self, board, shape=STANDARD):
+        self.shape = shape
+        width = shape.width
+        self.ids = []
+        self.horizontal = []
+        self.lane = []
+        self.length = []
+        self.lane_length = []
+        offsets = []
+        for i in range(len(board)):
+            if board[i] == '-' or board[i] in self.ids:
+                continue
+            row = i // width
+            col = i % width
+            horizontal = col < width - 1 and board[i+1] == board[i]
+            self.ids.append(board[i])
+            self.horizontal.append(horizontal)
+            if horizontal:
+                self.lane.append(row)
+                self.lane_length.append(width)
+                offsets.append(col)
             else:
-                frontier.put(state)
-                unexplored.append(state)
-
-    return state_search(frontier,
-                        heuristic,
-                        explored_states,
-                        unexplored)
+                self.lane.append(col)
+                self.lane_length.append(shape.height)
+                offsets.append(row)
+            self.length.append(board.count(board[i]))
+        self.start = bytes(offsets)
+        self.x = self.ids.index('X')
+
+        self.cells = []
+        self.rows = []
+        self.moves = []
+        self.exit_cols = []
+        for v in range(len(self.ids)):
+            cells, rows, moves, exit_cols = [], [], [], []
+            for offset in range(self.lane_length[v] - self.length[v] + 1):
+                taken = [self.cell(v, offset + k)
+                         for k in range(self.length[v])]
+                cells.append(tuple(taken))
+                rows.append(tuple((c // width, 1 << (c % width))
+                                  for c in taken))
+                exit_cols.append(tuple(c % width for c in taken
+                                       if c // width == shape.exit_row))
+                offset_moves = []
+                if offset > 0:
+                    c = self.cell(v, offset - 1)
+                    offset_moves.append((-1, c // width, 1 << (c % width)))
+                if offset + self.length[v] < self.lane_length[v]:
+                    c = self.cell(v, offset + self.length[v])
+                    offset_moves.append((1, c // width, 1 << (c % width)))
+                moves.append(tuple(offset_moves))
+            self.cells.append(tuple(cells))
+            self.rows.append(tuple(rows))
+            self.moves.append(tuple(moves))
+            self.exit_cols.append(tuple(exit_cols))
+
+        # The results of moved_cells(), filled in when first asked
+        self.moved = {}
+
+        # The cells along the lane of every vehicle, and the results of the
+        # parts of blocker_graph_heuristic(), filled in when first asked
+        self.lane_cells = [tuple(self.cell(v, k)
+                                 for k in range(self.lane_length[v]))
+                           for v in range(len(self.ids))]
+        self.leaving = {}
+        self.vacating = {}
+        self.pushing = {}
+
+        # The cells every vehicle takes on its way between two offsets,
+        # filled in by start_distance_heuristic() when first asked
+        self.sweeping = {}
+
+        # Only these vehicles can ever stand on the exit row besides X
+        self.crossing = [v for v in range(len(self.ids))
+                         if v != self.x and any(self.exit_cols[v])]
+
+    # Returns the offsets of the vehicles of this table on another
+    # gameboard string holding the same vehicles in the same lanes
+    # raises ValueError when the vehicles do not match
+    def offsets_of(self, board):
+        other = VehicleTable(board, self.shape)
+        if sorted(zip(self.ids, self.horizontal, self.lane, self.length)) != \
+           sorted(zip(other.ids, other.horizontal, other.lane, other.length)):
+            raise ValueError("the gameboard holds other vehicles")
+        return bytes(other.start[other.ids.index(i)] for i in self.ids)
+
+    # Returns the index of the k-th cell along the lane of vehicle v
+    def cell(self, v, k):
+        if self.horizontal[v]:
+            return self.lane[v] * self.shape.width + k
+        return k * self.shape.width + self.lane[v]
+
+    # Returns the occupancy of the gameboard as one bit mask per row
+    def occupancy(self, board):
+        occupied = [0] * self.shape.height
+        rows = self.rows
+        for v in range(len(board)):
+            for row, bits in rows[v][board[v]]:
+                occupied[row] |= bits
+        return occupied
+
+    # Returns a list of (new_board, vehicle, delta) for every one-cell move
+    # available on the gameboard, delta being -1 (left/up) or 1 (right/down)
+    def successors(self, board):
+        occupied = self.occupancy(board)
+        moves = self.moves
+        new_boards = []
+        for v in range(len(board)):
+            offset = board[v]
+            for delta, row, bit in moves[v][offset]:
+                if not occupied[row] & bit:
+                    new_boards.append((board[:v] + bytes((offset + delta,))
+                                       + board[v+1:], v, delta))
+        return new_boards
+
+    # Returns a list of (new_board, vehicle, delta) for every slide available
+    # on the gameboard, a slide moving one vehicle any number of cells in
+    # one direction
+    def slides(self, board):
+        occupied = self.occupancy(board)
+        moves = self.moves
+        new_boards = []
+        for v in range(len(board)):
+            for step, row, bit in moves[v][board[v]]:
+                offset = board[v]
+                # Keeps moving one cell in the same direction until blocked
+                while not occupied[row] & bit:
+                    offset += step
+                    new_boards.append((board[:v] + bytes((offset,))
+                                       + board[v+1:], v, offset - board[v]))
+                    for next_step, row, bit in moves[v][offset]:
+                        if next_step == step:
+                            break
+                    else:
+                        break
+        return new_boards
+
+    # Same rule as reach_goal: X at the exit, or no vehicle other than X
+    # on the exit row
+    def reach_goal(self, board):
+        if board[self.x] + self.length[self.x] == self.shape.width:
+            return True
+        exit_cols = self.exit_cols
+        for v in self.crossing:
+            if exit_cols[v][board[v]]:
+                return False
+        return True
+
+    # Same value as blocking_heuristic on the matching gameboard string
+    def blocking_heuristic(self, board):
+        x_col = board[self.x]
+        exit_cols = self.exit_cols
+        num_of_vehicle_blocking = 0
+        for v in self.crossing:
+            for col in exit_cols[v][board[v]]:
+                if col > x_col:
+                    num_of_vehicle_blocking += 1
+        if num_of_vehicle_blocking == 0: return 0
+        return 1 + num_of_vehicle_blocking
+
+    # Returns a lower bound on the one-cell moves left to a goal state,
+    # which never overestimates them (heuristic 2), or on the slides left
+    # when slides is True (heuristic 3)
+    # A goal state is reached either by taking every vehicle off the exit
+    # row or by driving X to the exit past the vehicles ahead of it, so the
+    # smaller cost of the two is taken. Each is found by blocker_cost() from
+    # the vehicles which have to leave the exit row.
+    def blocker_graph_heuristic(self, board, slides=False):
+        owner = [-1] * self.shape.size
+        cells = self.cells
+        for v in range(len(board)):
+            for c in cells[v][board[v]]:
+                owner[c] = v
+        x = self.x
+        x_col = board[x]
+        blockers = []
+        ahead = []
+        for c in self.shape.exit_cells():
+            col = c % self.shape.width
+            v = owner[c]
+            if v >= 0 and v != x and v not in blockers:
+                blockers.append(v)
+                if col > x_col:
+                    ahead.append(v)
+        if not blockers:
+            return 0
+        h_n = self.blocker_cost(board, owner, blockers, (), slides)
+        # With no blocker behind X, driving X out costs the same and more
+        x_moves = self.shape.width - self.length[x] - x_col
+        if slides:
+            # X drives out in one slide
+            x_moves = min(x_moves, 1)
+        if len(ahead) < len(blockers) and x_moves + len(ahead) < h_n:
+            h_n = min(h_n, x_moves + self.blocker_cost(board, owner, ahead,
+                                                       (x,), slides))
+        return min(h_n, DEAD_END)
+
+    # Returns a lower bound on the moves taking the blockers off the exit
+    # row, DEAD_END when one of them never can
+    # Every blocker leaves the exit row upwards or downwards, and all the
+    # choices are tried. A blocker passes through every offset on its way,
+    # and the vehicles in the cells it takes there have to leave them (see
+    # leave_options), which costs each of these vehicles at least the
+    # longest of the moves it needs for one of them (see vacate). When such
+    # a vehicle cannot make that move without pushing some other vehicle
+    # out of its way, one more move is counted, as long as the vehicles it
+    # may push are counted nowhere else (see push_set).
+    # Counted in slides, every one of these vehicles has to slide at least
+    # once, however far it goes, so each counts one slide instead of its
+    # cells, and a vehicle both leaving the exit row and in the way of
+    # another blocker may do both in the same slide, so it counts once.
+    #   @param:
+    #   board: the offsets of the vehicles
+    #   owner: the vehicle in every cell, -1 for the empty ones
+    #   blockers: the vehicles which have to leave the exit row
+    #   counted: the other vehicles whose moves are counted by the caller
+    #   slides: whether the moves are counted in slides instead of cells
+    def blocker_cost(self, board, owner, blockers, counted, slides=False):
+        # The options of every blocker as (moves, needed), needed mapping
+        # each vehicle in its way to the moves it needs
+        options = []
+        for b in blockers:
+            lane = tuple(owner[c] for c in self.lane_cells[b])
+            key = (b, board[b], lane)
+            if key not in self.leaving:
+                self.leaving[key] = self.leave_options(b, board[b], owner)
+            if not self.leaving[key]:
+                return DEAD_END
+            b_options = []
+            for moves, demands in self.leaving[key]:
+                needed = {}
+                for w, group in demands:
+                    cost = self.vacate(w, board[w], group)
+                    if cost > needed.get(w, 0):
+                        needed[w] = cost
+                b_options.append((moves, needed))
+            options.append(b_options)
+
+        best = DEAD_END
+        pushes = {}
+        choices = [0] * len(blockers)
+        while True:
+            # Adds up the moves of the blockers and the vehicles they need
+            # out of their way for this choice of directions
+            total = 0
+            needed = {}
+            for i in range(len(blockers)):
+                moves, b_needed = options[i][choices[i]]
+                total += moves
+                for w, cost in b_needed.items():
+                    if cost > needed.get(w, 0):
+                        needed[w] = cost
+            total += sum(needed.values())
+            if slides and total < DEAD_END:
+                moved = set(w for w, cost in needed.items() if cost)
+                total = len(moved.union(blockers).difference(counted))
+            if total < best:
+                # Counts one move for every vehicle pushed which is not
+                # counted yet, each from a different set
+                taken = set(blockers)
+                taken.update(needed)
+                taken.update(counted)
+                for w, cost in needed.items():
+                    if (w, cost) not in pushes:
+                        pushes[w, cost] = self.push_set(board, owner, w, cost)
+                    pushed = pushes[w, cost]
+                    if pushed and taken.isdisjoint(pushed):
+                        taken.update(pushed)
+                        total += 1
+                best = min(best, total)
+
+            # Moves on to the next choice of directions
+            i = 0
+            while i < len(blockers):
+                choices[i] += 1
+                if choices[i] < len(options[i]):
+                    break
+                choices[i] = 0
+                i += 1
+            if i == len(blockers):
+                return best
+
+    # Returns a list of (moves, demands) for every way the vehicle can leave
+    # the exit row from the offset, moves being the number of cells it
+    # travels and demands the (vehicle, cells) pairs of the other vehicles
+    # in its way, each needing to leave the cells at the same time
+    def leave_options(self, b, offset, owner):
+        options = []
+        for step in (-1, 1):
+            demands = []
+            p = offset
+            while self.exit_cols[b][p]:
+                p += step
+                if p < 0 or p >= len(self.cells[b]):
+                    break
+                taken = {}
+                for c in self.cells[b][p]:
+                    w = owner[c]
+                    if w >= 0 and w != b:
+                        taken.setdefault(w, []).append(c)
+                demands.extend((w, frozenset(group))
+                               for w, group in taken.items())
+            else:
+                options.append((abs(p - offset), tuple(demands)))
+        return options
+
+    # Returns the fewest cells vehicle w has to travel from the offset to
+    # leave every one of the cells at once, DEAD_END if it never can
+    def vacate(self, w, offset, group):
+        key = (w, offset, group)
+        if key not in self.vacating:
+            moves = DEAD_END
+            for step in (-1, 1):
+                p = offset
+                while 0 <= p < len(self.cells[w]):
+                    if group.isdisjoint(self.cells[w][p]):
+                        moves = min(moves, abs(p - offset))
+                        break
+                    p += step
+            self.vacating[key] = moves
+        return self.vacating[key]
+
+    # Returns the vehicles of which at least one has to move for vehicle w
+    # to travel the given number of cells, an empty set when w can do it
+    # without moving any of them
+    # w may travel either way, so this is all the vehicles in its way on
+    # both sides, and nothing when one side is free.
+    def push_set(self, board, owner, w, moves):
+        offset = board[w]
+        lane = tuple(owner[c] for c in self.lane_cells[w])
+        key = (w, offset, moves, lane)
+        if key not in self.pushing:
+            pushed = set()
+            for step in (-1, 1):
+                p = offset + step * moves
+                if p < 0 or p >= len(self.cells[w]):
+                    continue
+                in_way = set()
+                for k in range(1, moves + 1):
+                    for c in self.cells[w][offset + step * k]:
+                        if owner[c] >= 0 and owner[c] != w:
+                            in_way.add(owner[c])
+                if not in_way:
+                    pushed = set()
+                    break
+                pushed |= in_way
+            self.pushing[key] = frozenset(pushed)
+        return self.pushing[key]
+
+    # Returns a lower bound on the one-cell moves from the initial board to
+    # the gameboard, which the backward side of bidirectional_search()
+    # orders its states by
+    # Every vehicle away from its initial offset travels at least the cells
+    # between the two, and takes every cell along the way at some time, so
+    # a vehicle at its initial offset in one of those cells has to leave
+    # them all and come back, at least twice the cells it travels to leave
+    # them (see vacate), DEAD_END when it never can.
+    def start_distance_heuristic(self, board):
+        start = self.start
+        h_n = 0
+        swept = []
+        for v in range(len(board)):
+            if board[v] != start[v]:
+                h_n += abs(board[v] - start[v])
+                swept.append(self.swept_cells(v, board[v], start[v]))
+        if not swept:
+            return 0
+        for w in range(len(board)):
+            if board[w] != start[w]:
+                continue
+            cells = self.cells[w][board[w]]
+            away = 0
+            for group in swept:
+                if not group.isdisjoint(cells):
+                    away = max(away, self.vacate(w, board[w], group))
+            h_n += 2 * away
+        return min(h_n, DEAD_END)
+
+    # Returns the cells vehicle v takes on its way from one offset to
+    # another, as a frozenset
+    def swept_cells(self, v, old_offset, new_offset):
+        key = (v, old_offset, new_offset)
+        if key not in self.sweeping:
+            low, high = sorted((old_offset, new_offset))
+            self.sweeping[key] = frozenset(
+                c for offset in range(low, high + 1)
+                for c in self.cells[v][offset])
+        return self.sweeping[key]
+
+    # Returns the indices of the cells left and of the cells entered when
+    # vehicle v moves from one offset to another
+    def moved_cells(self, v, old_offset, new_offset):
+        key = (v, old_offset, new_offset)
+        if key not in self.moved:
+            old_cells = self.cells[v][old_offset]
+            new_cells = self.cells[v][new_offset]
+            self.moved[key] = (
+                tuple(c for c in old_cells if c not in new_cells),
+                tuple(c for c in new_cells if c not in old_cells))
+        return self.moved[key]
+
+    # Generates the offsets of every placement of the vehicles which does
+    # not overlap and satisfies reach_goal, whether it can be reached from
+    # the initial board or not
+    # Vehicles moving along the same lane can never pass each other, so
+    # only the placements keeping their order on the initial board are
+    # generated.
+    #   @param:
+    #   distance: when given, only the placements whose offsets differ from
+    #             those of the initial board by this many cells in all are
+    #             generated
+    def goal_states(self, distance=None):
+        count = len(self.ids)
+        masks = [[cells_to_mask(cells) for cells in self.cells[v]]
+                 for v in range(count)]
+        x_exit = self.shape.width - self.length[self.x]
+        order = [self.x] + [v for v in range(count) if v != self.x]
+        start = self.start
+
+        # reach[i]: the most cells the vehicles placed from the i-th one on
+        # can be away from the initial board, to drop the placements which
+        # can no longer add up to the distance
+        reach = [0] * (count + 1)
+        for i in range(count - 1, -1, -1):
+            v = order[i]
+            reach[i] = reach[i + 1] + max(start[v],
+                                          len(masks[v]) - 1 - start[v])
+
+        # mates[v]: the vehicles placed before v in the same lane
+        mates = []
+        for i in range(count):
+            v = order[i]
+            mates.append([m for m in order[:i]
+                          if self.horizontal[m] == self.horizontal[v]
+                          and self.lane[m] == self.lane[v]])
+
+        # Places the vehicles one at a time in order, going back when no
+        # offset is left for the current vehicle
+        offsets = bytearray(count)
+        choices = [iter(range(len(masks[self.x])))]
+        occupied = [0]
+        spent = [0]
+        while choices:
+            depth = len(choices) - 1
+            v = order[depth]
+            for offset in choices[-1]:
+                mask = masks[v][offset]
+                if occupied[-1] & mask:
+                    continue
+                away = spent[-1] + abs(offset - start[v])
+                if distance is not None and \
+                   not away <= distance <= away + reach[depth + 1]:
+                    continue
+                # Unless X is at the exit, the exit row must be left to X
+                if v != self.x and offsets[self.x] != x_exit and \
+                   self.exit_cols[v][offset]:
+                    continue
+                if not self.keeps_order(v, offset, mates[depth], offsets):
+                    continue
+                offsets[v] = offset
+                if len(choices) == count:
+                    yield bytes(offsets)
+                    continue
+                occupied.append(occupied[-1] | mask)
+                spent.append(away)
+                choices.append(iter(range(len(masks[order[depth + 1]]))))
+                break
+            else:
+                choices.pop()
+                occupied.pop()
+                spent.pop()
+
+    # Returns whether vehicle v at the offset stays on the same side of its
+    # lane mates as on the initial board
+    def keeps_order(self, v, offset, mates, offsets):
+        for m in mates:
+            if self.start[m] < self.start[v]:
+                if offsets[m] > offset:
+                    return False
+            elif offsets[m] < offset:
+                return False
+        return True
+
+    # Returns the lowest and highest offsets every vehicle could ever reach
+    # from the initial board, as two lists
+    # Every vehicle starts with the range of its initial offset, and the
+    # range grows by one cell while the cell past its end is not always
+    # taken by another vehicle (a cell taken at every offset of its range)
+    # and the lane mates ahead leave room for it. Once nothing grows, no
+    # move can take a vehicle out of its range, so no reachable gameboard
+    # is missed; the ranges may be wider than what can really be reached.
+    def offset_ranges(self):
+        count = len(self.ids)
+        length = self.length
+        low = list(self.start)
+        high = list(self.start)
+
+        # behind[v] and ahead[v]: the lane mates before and after v
+        behind = [[] for _ in range(count)]
+        ahead = [[] for _ in range(count)]
+        for v in range(count):
+            for w in range(count):
+                if w != v and self.horizontal[w] == self.horizontal[v] and \
+                   self.lane[w] == self.lane[v]:
+                    if self.start[w] < self.start[v]:
+                        behind[v].append(w)
+                    else:
+                        ahead[v].append(w)
+
+        changed = True
+        while changed:
+            changed = False
+            always = {}
+            for v in range(count):
+                for k in range(high[v], low[v] + length[v]):
+                    always[self.cell(v, k)] = v
+            for v in range(count):
+                if low[v] > 0 and \
+                   self.cell(v, low[v] - 1) not in always and \
+                   all(low[w] + length[w] < low[v] for w in behind[v]):
+                    low[v] -= 1
+                    changed = True
+                end = high[v] + length[v]
+                if end < self.lane_length[v] and \
+                   self.cell(v, end) not in always and \
+                   all(end < high[w] for w in ahead[v]):
+                    high[v] += 1
+                    changed = True
+        return low, high
+
+    # This function looks for a reason the puzzle can never be solved,
+    # without searching
+    # The cheap structural check comes first: a horizontal vehicle on the
+    # exit row to the right of X can never be passed. Then the ranges of
+    # offset_ranges() tell whether X can ever reach the exit, and if it
+    # cannot, whether a vehicle stays on the exit row at every offset it
+    # can reach, which rules out every goal state.
+    #
+    #   returns a message telling why there is no solution, or None when
+    #   the puzzle may be solvable
+    def unsolvable(self):
+        x = self.x
+        for v in self.crossing:
+            if self.horizontal[v] and self.start[v] > self.start[x]:
+                return "vehicle %s is on the exit row to the right of X" % \
+                       self.ids[v]
+
+        low, high = self.offset_ranges()
+        if high[x] + self.length[x] == self.shape.width:
+            return None
+        for v in self.crossing:
+            if all(self.exit_cols[v][offset]
+                   for offset in range(low[v], high[v] + 1)):
+                # Names the vehicle in the way of X when there is one
+                cell = self.cell(x, high[x] + self.length[x])
+                for w in range(len(self.ids)):
+                    if w != x and all(cell in self.cells[w][offset]
+                                      for offset in range(low[w],
+                                                          high[w] + 1)):
+                        return "car X can never get past vehicle %s" % \
+                               self.ids[w]
+                return "car X can never reach the exit"
+        return None
+
+    # Returns the offsets after playing the (vehicle, delta) moves
+    def apply(self, board, moves):
+        offsets = bytearray(board)
+        for v, delta in moves:
+            offsets[v] += delta
+        return bytes(offsets)
+
+    # Returns the moves taking X from its offset on the gameboard to the
+    # exit, one cell at a time or as a single slide
+    def exit_moves(self, board, slide=False):
+        cells = self.shape.width - self.length[self.x] - board[self.x]
+        if slide:
+            return [(self.x, cells)] if cells else []
+        return [(self.x, 1)] * cells
+
+    # Generates the gameboard strings from the initial board through every
+    # one of the (vehicle, delta) moves, one at a time
+    def replay(self, moves):
+        offsets = bytearray(self.start)
+        yield self.to_string(offsets)
+        for v, delta in moves:
+            offsets[v] += delta
+            yield self.to_string(offsets)
+
+    # Returns the moves written as the letter of the vehicle followed by the
+    # signed number of cells, such as "A+1" or "X-2"
+    def move_names(self, moves):
+        return ["%s%+d" % (self.ids[v], delta) for v, delta in moves]
+
+    # Reads back the moves written by move_names()
+    def parse_moves(self, names):
+        return [(self.ids.index(name[0]), int(name[1:])) for name in names]
+
+    # Converts the gameboard back to a single string
+    def to_string(self, board):
+        string = ['-'] * self.shape.size
+        for v in range(len(board)):
+            for c in self.cells[v][board[v]]:
+                string[c] = self.ids[v]
+        return "".join(string)
+
+
+# The h_n blocker_graph_heuristic() gives the gameboards from which no goal
+# state can ever be reached
+DEAD_END = 1000
+
+
+# The representations that can be chosen in rushhour()
+BACKENDS = {
+    "string": StringBackend,
+    "vehicles": VehicleBackend,
+    "bitboard": BitboardBackend,
+}
+
+
+
+
+# An object computing the h_n of the new states from the h_n of their parent
+# A new state only differs from its parent by the move of one vehicle, so
+# only the parts of the heuristic reading the cells changed by that move
+# are computed again. The parts kept for every state are
+#   heuristic 0: (column of X, number of blocking cells)
+#   heuristic 1: the parts returned by custome_heuristic_parts()
+# Moving X changes every part, which are then computed from scratch.
+#   @param:
+#   heuristic: the choice of heuristic to adopt
+#   backend: the board representation used in the search
+#   verify: whether every updated h_n is checked against the h_n computed
+#           from scratch
+class IncrementalHeuristic(object):
+    def __init__(self, heuristic, backend, verify=False):
+        self.heuristic = heuristic
+        self.backend = backend
+        self.verify = verify
+
+    # Returns the h_n and its parts for a gameboard, computed from scratch
+    def initial(self, board):
+        if self.heuristic >= 2:
+            return self.backend.heuristic(self.heuristic, board), None
+        if self.heuristic == 0:
+            h_n = self.backend.heuristic(0, board)
+            x_col = self.backend.offset(board, self.backend.table.x)
+            return h_n, (x_col, 0 if h_n == 0 else h_n - 1)
+        return custome_heuristic_parts(self.backend.to_string(board),
+                                       self.backend.table.shape)
+
+    # Returns the h_n and its parts for a gameboard reached by moving the
+    # vehicle by delta from a gameboard with the given h_n and parts
+    def child(self, h_n, parts, board, vehicle, delta):
+        table = self.backend.table
+        # The blocker graph heuristic keeps its own tables of sub-results
+        if vehicle == table.x or self.heuristic >= 2:
+            result = self.initial(board)
+        else:
+            offset = self.backend.offset(board, vehicle)
+            if self.heuristic == 0:
+                result = update_blocking_heuristic(
+                    h_n, parts, table.exit_cols[vehicle][offset - delta],
+                    table.exit_cols[vehicle][offset])
+            else:
+                left, entered = table.moved_cells(vehicle, offset - delta,
+                                                  offset)
+                result = update_custome_heuristic(h_n, parts, self.backend,
+                                                  board, left + entered)
+        if self.verify:
+            expected = self.backend.heuristic(self.heuristic, board)
+            assert result[0] == expected, \
+                "incremental h_n %d != %d for %s" % \
+                (result[0], expected, self.backend.to_string(board))
+        return result
+
+
+# The ways of pruning the moves of an expanded state, see MovePruning
+#   none: every move is kept
+#   inverse: the move undoing the move which reached the state is dropped
+#   commute: the inverse move and the moves only reordering independent
+#            moves are dropped
+PRUNINGS = ("none", "inverse", "commute")
+
+
+# An object dropping the moves of an expanded state which are redundant
+# with the move that reached it
+# The move undoing the last move only leads back to the parent, which was
+# always reached in fewer moves.
+# Two one-cell moves of different vehicles can be made in either order,
+# reaching the same gameboard in as many moves, unless the second one
+# enters the cell left by the first one. Of the two orders only the one
+# moving the vehicle of the smaller index first is kept (a partial-order
+# reduction), so a move of a vehicle of a smaller index than the last one
+# is dropped when the two are independent; the many orders of the same
+# independent moves are then cut off before they are generated instead of
+# being found as duplicates. This only holds for one-cell moves.
+#   @param:
+#   backend: the board representation used in the search
+#   pruning: one of PRUNINGS
+#
+# The counters:
+#   inverse: the inverse moves dropped
+#   commuted: the independent moves dropped
+class MovePruning(object):
+    def __init__(self, backend, pruning="inverse"):
+        if pruning not in PRUNINGS:
+            raise ValueError("unknown pruning: " + str(pruning))
+        self.backend = backend
+        self.table = backend.table
+        self.commute = pruning == "commute"
+        self.inverse = 0
+        self.commuted = 0
+
+    # This function drops the redundant moves from the successors of a
+    # gameboard
+    #   @param:
+    #   board: the gameboard expanded
+    #   vehicle, delta: the last move, which reached the gameboard
+    #   new_boards: the list of (new_board, vehicle, delta) of its moves
+    #
+    #   returns the list of the moves kept
+    def prune(self, board, vehicle, delta, new_boards):
+        left = None
+        if self.commute:
+            offset = self.backend.offset(board, vehicle)
+            left = self.table.moved_cells(vehicle, offset - delta,
+                                          offset)[0][0]
+        kept = []
+        for new_board, v, d in new_boards:
+            if v == vehicle:
+                if d == -delta:
+                    self.inverse += 1
+                    continue
+            elif v < vehicle and left is not None:
+                offset = self.backend.offset(new_board, v)
+                if self.table.moved_cells(v, offset - d,
+                                          offset)[1][0] != left:
+                    self.commuted += 1
+                    continue
+            kept.append((new_board, v, d))
+        return kept
+
+    # Returns the counters as a dictionary
+    def to_dict(self):
+        return {"inverse": self.inverse, "commuted": self.commuted}
+
+
+# This function updates the blocking heuristic after a vehicle other than X
+# has moved
+#   @param:
+#   h_n: the value of the heuristic before the move
+#   parts: (column of X, number of blocking cells) before the move
+#   old_cols: the columns taken on the third row before the move
+#   new_cols: the columns taken on the third row after the move
+#
+#   returns the h_n and its parts after the move
+def update_blocking_heuristic(h_n, parts, old_cols, new_cols):
+    if not old_cols and not new_cols:
+        return h_n, parts
+    x_col, num_of_vehicle_blocking = parts
+    # Only the cells to the right of X count
+    for col in old_cols:
+        if col > x_col:
+            num_of_vehicle_blocking -= 1
+    for col in new_cols:
+        if col > x_col:
+            num_of_vehicle_blocking += 1
+    if num_of_vehicle_blocking == 0:
+        return 0, (x_col, 0)
+    return 1 + num_of_vehicle_blocking, (x_col, num_of_vehicle_blocking)
 
 
+# This function computes the customized heuristic like custome_heuristic,
+# and also returns the parts needed to update it after a move
+#   @param:
+#   board: the current gameboard
+#   shape: the BoardShape of the gameboard
+#
+#   returns the h_n value and its parts (x_steps, blockers), where x_steps
+#   is the number of steps for car X to reach the exit and blockers maps
+#   the index of every blocking cell to the result of
+#   custome_blocking_steps() for it
+def custome_heuristic_parts(board, shape=STANDARD):
+    x_steps = 0
+    blockers = {}
+    foundX = False
+    exit_cells = shape.exit_cells()
+    for i in exit_cells:
+        if board[i] == 'X':
+            foundX = True
+            x_steps += exit_cells.stop - i - 2
+        if (foundX == True and board[i] != 'X' and board[i] != '-'):
+            blockers[i] = custome_blocking_steps(i, board, shape)
+    num_of_steps = x_steps
+    for steps, rows in blockers.values():
+        num_of_steps += steps
+    return num_of_steps, (x_steps, blockers)
+
+# This function computes the steps custome_heuristic counts for the
+# blocking vehicle found at the given index of the exit row
+#   @param:
+#   index: the index of the blocking cell
+#   board: the current gameboard
+#   shape: the BoardShape of the gameboard
+#
+#   returns (steps, rows), rows being the rows searched for vehicles besides
+#   the column of the blocking vehicle, the steps only change when a cell
+#   in that column or in one of these rows changes
+def custome_blocking_steps(index, board, shape=STANDARD):
+    width = shape.width
+    pos = find_vehicle_vertical(index, board, shape)
+    col = pos[1]
+    # If the vehicle found is a truck, the rows of the vehicles below it
+    if pos[2] - pos[0] == 2:
+        rows = tuple(r for r in range(pos[2] + 1, shape.height)
+                     if board[r*width + col] != '-')
+        return check_truck(pos, board, shape), rows
+    # If the vehicle found is a car, the row above it when it is blocked
+    # there (check_car looks for the blocking vehicle on the first row
+    # when it is blocked below)
+    if car_blocked_above(pos, board, shape):
+        return check_car(pos, board, shape), (pos[0] - 1,)
+    # When the cell of the first row is empty, find_vehicle_horizontal
+    # follows the empty cells past the end of the first row into the next
+    # ones, at most up to X on the exit row
+    if car_blocked_below(pos, board, shape):
+        if board[col] == '-':
+            return check_car(pos, board, shape), \
+                   tuple(range(max(shape.exit_row, 1)))
+        return check_car(pos, board, shape), (0,)
+    return check_car(pos, board, shape), ()
+
+# This function updates the customized heuristic after a vehicle other
+# than X has moved
+#   @param:
+#   h_n: the value of the heuristic before the move
+#   parts: the parts of the heuristic before the move
+#          (see custome_heuristic_parts)
+#   backend: the board representation used in the search
+#   board: the gameboard after the move, in that representation
+#   cells: the indices of the cells changed by the move
+#
+#   returns the h_n value and its parts after the move
+def update_custome_heuristic(h_n, parts, backend, board, cells):
+    x_steps, blockers = parts
+    shape = backend.table.shape
+    width = shape.width
+    rows = set(c // width for c in cells)
+    cols = set(c % width for c in cells)
+
+    # Finds the blocking vehicles which read one of the changed cells
+    # The blocking cells themselves only change when the exit row changes
+    if shape.exit_row not in rows:
+        stale = [i for i in blockers
+                 if i % width in cols or not rows.isdisjoint(blockers[i][1])]
+        if not stale:
+            return h_n, parts
+        indices = blockers.keys()
+    else:
+        stale = None
+
+    board = backend.to_string(board)
+    if stale is None:
+        indices = []
+        foundX = False
+        for i in shape.exit_cells():
+            if board[i] == 'X':
+                foundX = True
+            if (foundX == True and board[i] != 'X' and board[i] != '-'):
+                indices.append(i)
+        stale = indices
+
+    new_blockers = {}
+    num_of_steps = x_steps
+    for i in indices:
+        if i in stale or i not in blockers:
+            new_blockers[i] = custome_blocking_steps(i, board, shape)
+        else:
+            new_blockers[i] = blockers[i]
+        num_of_steps += new_blockers[i][0]
+    return num_of_steps, (x_steps, new_blockers)
 
 
 # This function determines whether the input state has reached the goal state
 #      ***** Here we think that as long as there is no
-#            blocking vehicles on the third row blocking
+#            blocking vehicles on the exit row blocking
 #            the car X, it has reached the goal state.   *****
 #   @param:
 #   curr_head: the state of the game to be determined
+#   shape: the BoardShape of the gameboard
 #
 #   returns True/False on whether it has reached the goal state
-def reach_goal(curr_head):
-    cur_board = construct_board(curr_head.board)
-    if cur_board[2][4] == 'X' and cur_board[2][5] == 'X': return True
-    for char in cur_board[2]:
+def reach_goal(curr_head, shape=STANDARD):
+    cur_board = construct_board(curr_head.board, shape)
+    exit_row = cur_board[shape.exit_row]
+    if exit_row[-2] == 'X' and exit_row[-1] == 'X': return True
+    for char in exit_row:
         if char != 'X' and char != '-':
             return False
     return True
@@ -157,32 +2442,18 @@ def reach_goal(curr_head):
 
 
 
-# This function checks for repeatition and eliminates redundant search
-#   @param:
-#   cur_state: the state to be checked for repeatitions
-#   states: a list of states to be searched
-#
-#   returns True/False on whether it has repeatitions
-def check_repeatition(cur_state, states):
-    for state in states:
-        if cur_state.board == state.board:
-            return True
-    return False
-
-
-
-
 # This function compute the h_n of the given gameboard
 #   @param:
 #   heuristic: the choice of heuristic to adopt
 #   board: the current gameboard
+#   shape: the BoardShape of the gameboard
 #
 #   returns the computed h_n value
-def compute_heuristic(heuristic, board):
+def compute_heuristic(heuristic, board, shape=STANDARD):
     if heuristic == 0:
-        return blocking_heuristic(board)
+        return blocking_heuristic(board, shape)
     else:
-        return custome_heuristic(board)
+        return custome_heuristic(board, shape)
 
 
 
@@ -203,27 +2474,29 @@ def compute_heuristic(heuristic, board):
 #
 #   @param:
 #   board: the current gameboard
+#   shape: the BoardShape of the gameboard
 #
 #   returns the h_n value
-def custome_heuristic(board):
+def custome_heuristic(board, shape=STANDARD):
     num_of_steps = 0
     # This variable helps eliminate the vehicles before the X car
     foundX = False
-    for i in range(12, 18):
+    exit_cells = shape.exit_cells()
+    for i in exit_cells:
         if board[i] == 'X':
             foundX = True
             # Adds the number of steps needed to reach the exit
-            num_of_steps += 18 - i - 2
+            num_of_steps += exit_cells.stop - i - 2
         # If a vehicle is found, determine the type of the vehicle and
         # whether the vehicle has been blocked by other vehicles
         if (foundX == True and board[i] != 'X' and board[i] != '-'):
-            pos = find_vehicle_vertical(i, board)
+            pos = find_vehicle_vertical(i, board, shape)
             # If the vehicle found is a truck
             if pos[2] - pos[0] == 2:
-                num_of_steps += check_truck(pos, board)
+                num_of_steps += check_truck(pos, board, shape)
             # If the vehicle found is a car
             else:
-                num_of_steps += check_car(pos, board)
+                num_of_steps += check_car(pos, board, shape)
     return num_of_steps
 
 # This function determines the minimum number of steps needed to move a
@@ -232,29 +2505,24 @@ def custome_heuristic(board):
 #   pos: the coordinates of the truck
 #        in the form of [x_start, y_start, x_end, y_end]
 #   board: the current gameboard
+#   shape: the BoardShape of the gameboard
 #
 #   returns the minimum number of steps needed to move a vertical truck out
 #   of car X's way
-def check_truck(pos, board):
+def check_truck(pos, board, shape=STANDARD):
     steps = 0
-    # If it is positioned from the first row to the third row,
-    # the only choice to move it away is to move down 3 times
-    if pos[0] == 0:
-        steps += 3
-        # Check whether the spaces below the truck is empty
-        steps += check_space_below_truck(3-pos[0], board, pos)
-    # If it is positioned from the second row to the fourth row,
-    # the only choice to move it away is to move down 2 times
-    elif pos[0] == 1:
-        steps += 2
-        # Check whether the spaces below the truck is empty
-        steps += check_space_below_truck(3-pos[0], board, pos)
-    # If it is positioned from the third row to the fifth row,
-    # the only choice to move it away is to move down 1 time
-    else:
-        steps += 1
-        # Check whether the spaces below the truck is empty
-        steps += check_space_below_truck(3-pos[0], board, pos)
+    # The number of times it has to move down to clear the exit row: on
+    # the standard board 3 times from the first row to the third row, 2
+    # times from the second row to the fourth row and 1 time from the
+    # third row to the fifth row
+    space = shape.exit_row + 1 - pos[0]
+    # When the board ends too close below it, the only choice left is to
+    # move it up until it clears the exit row
+    if pos[2] + space >= shape.height:
+        return pos[2] + 1 - shape.exit_row
+    steps += space
+    # Check whether the spaces below the truck is empty
+    steps += check_space_below_truck(space, board, pos, shape)
 
     return steps
 
@@ -265,17 +2533,20 @@ def check_truck(pos, board):
 #   board: the current gameboard
 #   pos: the coordinates of the truck
 #        in the form of [x_start, y_start, x_end, y_end]
+#   shape: the BoardShape of the gameboard
 #
 #   returns the minimum number of steps needed to empty the spaces
-def check_space_below_truck(space, board, pos):
+def check_space_below_truck(space, board, pos, shape=STANDARD):
     steps = 0
+    width = shape.width
     for i in range(1, space+1):
-        if board[(pos[2]+i)*6 + pos[1]] != '-':
+        if board[(pos[2]+i)*width + pos[1]] != '-':
             steps += 1
             # It the space is not empty,
             # finds the position of the blocking vehicle
-            block_pos = find_vehicle_horizontal((pos[2]+i)*6 + pos[1], board)
-            steps += blocked_blocking_vehicle(pos, block_pos, board)
+            block_pos = find_vehicle_horizontal((pos[2]+i)*width + pos[1],
+                                                board, shape)
+            steps += blocked_blocking_vehicle(pos, block_pos, board, shape)
     return steps
 
 # This function detemines the minimum number of steps needed to move the
@@ -286,14 +2557,17 @@ def check_space_below_truck(space, board, pos):
 #   block_pos: the coordinates of the vehicle blocks the blocking vehicle
 #        in the form of [x_start, y_start, x_end, y_end]
 #   board: the current gameboard
+#   shape: the BoardShape of the gameboard
 #
 #   returns the minimum number of steps needed to move the blocking vehicle
-def blocked_blocking_vehicle(pos, block_pos, board):
+def blocked_blocking_vehicle(pos, block_pos, board, shape=STANDARD):
     steps = 0
+    width = shape.width
+    last = width - 1
     # If both sides of the blocking vehicle has been blocked or
     # one side is blocked and the other side hits the wall
-    if ((block_pos[1] == 0 or board[block_pos[0]*6 + block_pos[1] - 1] == '-')
-        and (block_pos[3] == 5 or board[block_pos[2]*6 + block_pos[3] + 1] == '-')):
+    if ((block_pos[1] == 0 or board[block_pos[0]*width + block_pos[1] - 1] == '-')
+        and (block_pos[3] == last or board[block_pos[2]*width + block_pos[3] + 1] == '-')):
         steps += 1
     # Check how many steps needed to move the blocking vehicle
     # if the blocking vehicle blocks the truck in the middle,
@@ -302,7 +2576,7 @@ def blocked_blocking_vehicle(pos, block_pos, board):
         steps += 1
     # If one side of the vehicle hits the wall and it blocks the truck
     # at some other position, an extra step is also needed
-    elif (block_pos[3] == 5 and pos[3] != 5):
+    elif (block_pos[3] == last and pos[3] != last):
         steps += 1
     return steps
 
@@ -313,53 +2587,71 @@ def blocked_blocking_vehicle(pos, block_pos, board):
 #   pos: the coordinates of the car
 #        in the form of [x_start, y_start, x_end, y_end]
 #   board: the current gameboard
+#   shape: the BoardShape of the gameboard
 #
 #   returns the minimum number of steps needed to move a vertical car out
 #   of car X's way
-def check_car(pos, board):
+def check_car(pos, board, shape=STANDARD):
     steps = 1
-    # If the car is placed on the second and third row, and there is a
-    # vehicle blocking the car on top (the first row),
-    # then, an extra step is needed
-    if (pos[0] == 1 and board[pos[1]] != '-'):
+    width = shape.width
+    last = width - 1
+    # If the car is placed on the row above the exit row and the exit row
+    # (the second and third row), and there is a vehicle blocking the car
+    # on top (the first row), then, an extra step is needed
+    if car_blocked_above(pos, board, shape):
         steps += 1
         # Finds the position of the vehicle blocking the car
-        block_pos = find_vehicle_horizontal(pos[1], board)
+        block_pos = find_vehicle_horizontal((pos[0]-1)*width + pos[1],
+                                            board, shape)
         # If both sides of that vehicle has been blocked or
         # one side is blocked and the other side hits the wall,
         # then, an extra step is needed
-        if ((block_pos[1] == 0 or board[block_pos[1] - 1] != '-') and
-        (block_pos[3] == 5 or board[block_pos[3] + 1] != '-')):
+        if ((block_pos[1] == 0 or board[block_pos[0]*width + block_pos[1] - 1] != '-') and
+        (block_pos[3] == last or board[block_pos[2]*width + block_pos[3] + 1] != '-')):
             steps += 1
-    # If the car is placed on the third and fourth row, and there is a
-    # vehicle blocking the car on the bottom (the fifth row)
-    # then, an extra step is needed
-    elif (pos[2] == 3 and board[(pos[2]+1)*6 + pos[3]] != '-'):
+    # If the car is placed on the exit row and the row below (the third and
+    # fourth row), and there is a vehicle blocking the car on the bottom
+    # (the fifth row) then, an extra step is needed
+    elif car_blocked_below(pos, board, shape):
         steps += 1
         # Finds the position of the vehicle blocking the car
-        block_pos = find_vehicle_horizontal(pos[1], board)
+        block_pos = find_vehicle_horizontal(pos[1], board, shape)
         # If both sides of that vehicle has been blocked or
         # one side is blocked and the other side hits the wall,
         # then, an extra step is needed
-        if ((block_pos[1] == 0 or board[block_pos[0]*6 + block_pos[1] - 1] != '-') and
-        (block_pos[3] == 5 or board[block_pos[2]*6 + block_pos[3] + 1] != '-')):
+        if ((block_pos[1] == 0 or board[block_pos[0]*width + block_pos[1] - 1] != '-') and
+        (block_pos[3] == last or board[block_pos[2]*width + block_pos[3] + 1] != '-')):
             steps += 1
     return steps
 
+# Whether a vertical car ending on the exit row is blocked by a vehicle in
+# the cell above it
+def car_blocked_above(pos, board, shape=STANDARD):
+    return pos[0] == shape.exit_row - 1 and pos[0] > 0 and \
+           board[(pos[0]-1)*shape.width + pos[1]] != '-'
+
+# Whether a vertical car starting on the exit row is blocked by a vehicle
+# in the cell below it
+def car_blocked_below(pos, board, shape=STANDARD):
+    return pos[2] == shape.exit_row + 1 and pos[2] + 1 < shape.height and \
+           board[(pos[2]+1)*shape.width + pos[3]] != '-'
+
+
 
 
 
 # This function computes the blocking heuristic
 #   @param:
 #   board: the current gameboard
+#   shape: the BoardShape of the gameboard
 #
 #   returns the computed h_n value
-def blocking_heuristic(board):
+def blocking_heuristic(board, shape=STANDARD):
     num_of_vehicle_blocking = 0
 
-    # check the third row for the number of vehicles blocking the path
+    # check the exit row for the number of vehicles blocking the path
     foundX = False
-    for i in range(12, 18):
+    for i in shape.exit_cells():
         if board[i] == 'X': foundX = True
         if (foundX == True and board[i] != 'X' and board[i] != '-'):
             num_of_vehicle_blocking += 1
@@ -374,15 +2666,16 @@ def blocking_heuristic(board):
 # We check for all the possible moves with every vehicle on the board
 #   @param:
 #   state: the base state
+#   shape: the BoardShape of the gameboard
 #
 #   returns a list of newly generated states
-def generate_new_boards(state):
+def generate_new_boards(state, shape=STANDARD):
     new_boards = []
     visited = {}
     cur_board = state.board
     for i in range(0, len(cur_board)):
         if cur_board[i] not in visited:
-            boards_moved = move_vehicle(i, cur_board)
+            boards_moved = move_vehicle(i, cur_board, shape)
             for board in boards_moved:
                 new_boards.append(board)
             visited[cur_board[i]] = True
@@ -392,29 +2685,30 @@ def generate_new_boards(state):
 #   @param:
 #   index: the index to detemine the specific vehicle
 #   board: gameboard stored in a single string
+#   shape: the BoardShape of the gameboard
 #
 #   returns a list of newly generated states for moving one vehicle
-def move_vehicle(index, board):
+def move_vehicle(index, board, shape=STANDARD):
     boards_moved = []
     # The vehicle is horizontal
     if ((index > 0 and board[index-1] == board[index]) or
         (index + 1 < len(board) and board[index+1] == board[index])):
-        start_end_pos = find_vehicle_horizontal(index, board)
+        start_end_pos = find_vehicle_horizontal(index, board, shape)
         # Checks for left and right with horizontal vehicle
-        left = move_left(board, start_end_pos)
+        left = move_left(board, start_end_pos, shape)
         if left != []:
             boards_moved.append(left)
-        right = move_right(board, start_end_pos)
+        right = move_right(board, start_end_pos, shape)
         if right != []:
             boards_moved.append(right)
     # The vehicle is vertical
     else:
-        start_end_pos = find_vehicle_vertical(index, board)
+        start_end_pos = find_vehicle_vertical(index, board, shape)
         # Checks for up and down for vertical vehicle
-        up = move_up(board, start_end_pos)
+        up = move_up(board, start_end_pos, shape)
         if up != []:
             boards_moved.append(up)
-        down = move_down(board, start_end_pos)
+        down = move_down(board, start_end_pos, shape)
         if down != []:
             boards_moved.append(down)
     return boards_moved
@@ -422,35 +2716,36 @@ def move_vehicle(index, board):
 # This function finds the start and end coordinates of vertical vehicles
 #   @param:
 #   index: the index to detemine the specific vehicle
-#   board_string: gameboard stored in a single string
+#   board: gameboard stored in a single string
+#   shape: the BoardShape of the gameboard
 #
 #   return the coordinates of the vehicle in the form of a lists
 #   [x_start, y_start, x_end, y_end]
-def find_vehicle_vertical(index, board_string):
-    board = construct_board(board_string)
-    row = int(index / 6)
-    col = int(index % 6)
+def find_vehicle_vertical(index, board, shape=STANDARD):
+    width = shape.width
+    row = int(index / width)
+    col = int(index % width)
     # Creates a list storing the starting and ending position
     res_pos = []
     up = row
     down = row
 
     # Finds the starting position
-    while (up >= 0 and board[up][col] == board[row][col]):
+    while (up >= 0 and board[up*width + col] == board[index]):
         up -= 1
 
     # Adding the starting coordinates of the vehicle
-    if (up >= 0 and board[up][col] == board[row][col]):
+    if (up >= 0 and board[up*width + col] == board[index]):
         res_pos.append(up)
     else: res_pos.append(up+1)
     res_pos.append(col)
 
     # Finds the ending position
-    while (down < len(board) and board[down][col] == board[row][col]):
+    while (down < shape.height and board[down*width + col] == board[index]):
         down += 1
 
     # Adding the ending coordinates of the vehicle
-    if (down < len(board) and board[down][col] == board[row][col]):
+    if (down < shape.height and board[down*width + col] == board[index]):
         res_pos.append(down)
     else: res_pos.append(down-1)
     res_pos.append(col)
@@ -462,12 +2757,14 @@ def find_vehicle_vertical(index, board_string):
 #   @param:
 #   index: the index to detemine the specific vehicle
 #   board_string: gameboard stored in a single string
+#   shape: the BoardShape of the gameboard
 #
 #   return the coordinates of the vehicle in the form of a lists
 #   [x_start, y_start, x_end, y_end]
-def find_vehicle_horizontal(index, board):
-    row = int(index / 6)
-    col = int(index % 6)
+def find_vehicle_horizontal(index, board, shape=STANDARD):
+    width = shape.width
+    row = int(index / width)
+    col = int(index % width)
     # Creates a list storing the starting and ending position
     res_pos = []
     left = index
@@ -480,8 +2777,8 @@ def find_vehicle_horizontal(index, board):
     # Adding the starting coordinates of the vehicle
     res_pos.append(row)
     if (left >= 0 and board[left] == board[index]):
-        res_pos.append(left % 6)
-    else: res_pos.append((left+1) % 6)
+        res_pos.append(left % width)
+    else: res_pos.append((left+1) % width)
 
     # Finds the ending position
     while (right < len(board) and board[right] == board[index]):
@@ -490,8 +2787,8 @@ def find_vehicle_horizontal(index, board):
     # Adding the ending coordinates of the vehicle
     res_pos.append(row)
     if (right < len(board) and board[right] == board[index]):
-        res_pos.append(right % 6)
-    else: res_pos.append((right-1) % 6)
+        res_pos.append(right % width)
+    else: res_pos.append((right-1) % width)
 
     return res_pos
 
@@ -502,11 +2799,12 @@ def find_vehicle_horizontal(index, board):
 #   curr_board: a single string storing the current board state
 #   pos: the coordinates of the moving vehicle in the form of
 #        [x_start, y_start, x_end, y_end]
+#   shape: the BoardShape of the gameboard
 #
 #   All four functions return the new gameboard in the form of a single string
 
-def move_up(curr_board, pos):
-    board = construct_board(curr_board)
+def move_up(curr_board, pos, shape=STANDARD):
+    board = construct_board(curr_board, shape)
     # If the starting position is already on the first row
     # or there is a vehicle blocking it moving up
     if pos[0] == 0 or board[pos[0] - 1][pos[1]] != '-':
@@ -517,8 +2815,8 @@ def move_up(curr_board, pos):
     board[pos[2]][pos[3]] = '-'
     return board_to_string(board)
 
-def move_down(curr_board, pos):
-    board = construct_board(curr_board)
+def move_down(curr_board, pos, shape=STANDARD):
+    board = construct_board(curr_board, shape)
     # If the ending position is already on the last row
     # or there is a vehicle blocking it moving down
     if pos[2] >= len(board) - 1 or board[pos[2] + 1][pos[3]] != '-':
@@ -529,8 +2827,8 @@ def move_down(curr_board, pos):
     board[pos[0]][pos[1]] = '-'
     return board_to_string(board)
 
-def move_left(curr_board, pos):
-    board = construct_board(curr_board)
+def move_left(curr_board, pos, shape=STANDARD):
+    board = construct_board(curr_board, shape)
     # If the starting position is already on the first col
     # or there is a vehicle blocking it moving left
     if pos[1] == 0 or board[pos[0]][pos[1] - 1] != '-':
@@ -541,11 +2839,11 @@ def move_left(curr_board, pos):
     board[pos[2]][pos[3]] = '-'
     return board_to_string(board)
 
-def move_right(curr_board, pos):
-    board = construct_board(curr_board)
+def move_right(curr_board, pos, shape=STANDARD):
+    board = construct_board(curr_board, shape)
     # If the starting position is already on the last col
     # or there is a vehicle blocking it moving right
-    if pos[3] == len(board) - 1 or board[pos[2]][pos[3] + 1] != '-':
+    if pos[3] == len(board[0]) - 1 or board[pos[2]][pos[3] + 1] != '-':
         return []
 
     # Move right
@@ -574,15 +2872,17 @@ def board_to_string(board):
 # Constructs the board from a single string
 #   @param:
 #   string: the gameboard in the form of a single string
+#   shape: the BoardShape of the gameboard
 #
 #   returns an 2D array storing the gameboard
-def construct_board(string):
-    board = [] * 6
+def construct_board(string, shape=STANDARD):
+    width = shape.width
+    board = []
     for i in range(0, len(string)):
-        if i % 6 == 0:
-            new_row = [] * 6
+        if i % width == 0:
+            new_row = []
             new_row.append(string[i])
-        elif i % 6 == 5:
+        elif i % width == width - 1:
             new_row.append(string[i])
             board.append(new_row)
         else:
@@ -605,35 +2905,6 @@ def print_board(board):
 
 
 
-# This function completes the move from the current position to the exit
-# when there is not blocking vehicles on the way
-# Since we consider any state with no blocking vehicles blocking car X the
-# goal state, car X might not reach the exit as we return the goal state
-# Thus, we need to check and make sure that it reaches the exit
-#   @param:
-#   ans: a list of gameboard from the initial state to the goal state
-#
-#   ***** we build on the last gameboard of the list to *****
-#   ***** complete the move to the exit.                *****
-#
-#   returns a complete step by step solution of the game
-def complete_exit_move(ans):
-    cur_board = ans[len(ans) - 1]
-    car_pos_end = 0
-    for i in range(len(cur_board[2])):
-        if cur_board[2][i] == 'X':
-            car_pos_end = i + 1
-            break
-    for i in range(car_pos_end+1, len(cur_board[2])):
-        board = copy.deepcopy(cur_board)
-        board[2][i] = 'X'
-        board[2][i-2] = '-'
-        ans.append(board)
-        cur_board = board
-    return ans
-
-
-
 # This helper function reverses the order of a list and is taken from
 # professor's code on pegpuzzle
 def reverse(st):
@@ -0,0 +1,526 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import time
+
+import rushhour
+
+
+# Serves Rush Hour searches to asyncio code, in process or over HTTP
+#
+# A SolverService runs the searches in a fixed number of worker processes,
+# each taking one search at a time through a pipe. The event loop never
+# blocks: the reply of a worker is read when its pipe becomes readable.
+#
+# Requests for the same gameboard, exit row and heuristic made while a
+# search of it is queued or running are merged into that search, and all
+# of them get its result. Every request may give its own deadline; a
+# request past its deadline gets a "timeout" result, and once no request
+# waits for a search any more the search is cancelled: it is dropped if it
+# is still queued, and its worker is sent SIGUSR1 to end it if it is
+# running, so the worker is free for the next search at once.
+#
+# Every search has a number, and the number of the search to cancel is
+# written to a value shared with the worker before the signal is sent. The
+# worker only ends the search of that number, so a signal arriving after
+# its search is over never cancels the next one, and a signal arriving
+# before the search has started still cancels it as soon as it starts.
+#
+# At most max_queue searches wait for a worker. A new search past that is
+# refused with ServiceBusy right away, instead of making every request
+# wait longer. A search cancelled while queued no longer counts: it is
+# only skipped when a worker takes it out of the queue.
+#
+# The results are dictionaries, as in batch.py:
+#   status: "solved", "unsolvable", "timeout", "cancelled", "invalid",
+#           "memory" or "error"
+#   moves: the number of moves of the solution
+#   solution: the moves, such as "A+1"
+#   explored: the number of states explored
+#   generated: the number of states generated
+#   time: the wall time of the search in seconds
+#   reason: why an "unsolvable" puzzle can never be solved, when it was
+#           found without searching
+#   error: the reason of an "invalid" or "error" status
+#   coalesced: true when the request was merged into a search already asked
+#              for by another request
+#
+# The HTTP server takes
+#   POST /solve: a JSON object with the "board" (a list of rows or a
+#                string) and optionally "exit_row", "heuristic" and
+#                "timeout" in seconds, replies with the result (status 503
+#                when the service is busy)
+#   GET /stats: the counters of the service
+
+
+
+
+# Raised by SolverService.solve() when too many searches are waiting
+class ServiceBusy(Exception):
+    pass
+
+
+# Raised in a worker when its search is cancelled
+class SearchCancelled(Exception):
+    pass
+
+
+# The number of the search running in the worker, -1 when it is idle,
+# SIGUSR1 is ignored unless it is the one to cancel
+current = -1
+
+# The shared value holding the number of the search to cancel, set in the
+# worker by worker_main()
+cancelled = None
+
+
+# The SIGUSR1 handler ending the search of a worker
+def cancel(signum, frame):
+    if current >= 0 and cancelled.value == current:
+        raise SearchCancelled()
+
+
+# This function runs one search in a worker
+#   @param:
+#   task: (number, heuristic, rows, exit_row)
+#   search_options: the options of rushhour.solve()
+#
+#   returns the result as a dictionary
+#   raises SearchCancelled when the search is cancelled as it ends
+def run_search(task, search_options):
+    global current
+    number, heuristic, rows, exit_row = task
+    result = {}
+    start = time.perf_counter()
+    try:
+        current = number
+        # The search may have been cancelled before it started
+        if cancelled.value == number:
+            raise SearchCancelled()
+        solution = rushhour.solve(heuristic, rows, exit_row=exit_row,
+                                  **search_options)
+    except SearchCancelled:
+        result["status"] = "cancelled"
+        return result
+    except MemoryError:
+        result["status"] = "memory"
+        return result
+    except Exception as error:
+        result["status"] = "error"
+        result["error"] = repr(error)
+        return result
+    finally:
+        current = -1
+        result["time"] = round(time.perf_counter() - start, 6)
+
+    result["explored"] = solution.expanded
+    result["generated"] = solution.generated
+    if not solution.solved:
+        result["status"] = "unsolvable"
+        if "unsolvable" in solution.info:
+            result["reason"] = solution.info["unsolvable"]
+        return result
+    result["status"] = "solved"
+    result["moves"] = solution.length
+    result["solution"] = solution.move_names()
+    return result
+
+
+# The main loop of a worker process, running the searches sent through
+# the connection until it is sent None or closed
+#   @param:
+#   connection: the worker's end of the pipe
+#   search_options: the options of rushhour.solve()
+#   to_cancel: the shared value of the number of the search to cancel
+def worker_main(connection, search_options, to_cancel):
+    global cancelled
+    cancelled = to_cancel
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGUSR1, cancel)
+    while True:
+        try:
+            task = connection.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        # The signal may also come in while run_search() is not in its
+        # try statement, just before it returns
+        try:
+            result = run_search(task, search_options)
+        except SearchCancelled:
+            result = {"status": "cancelled"}
+        connection.send(result)
+    connection.close()
+
+
+# A worker process and its end of the pipe
+class Worker(object):
+    def __init__(self, search_options):
+        self.connection, child = multiprocessing.Pipe()
+        self.to_cancel = multiprocessing.RawValue('q', -1)
+        self.process = multiprocessing.Process(
+            target=worker_main, args=(child, search_options, self.to_cancel),
+            daemon=True)
+        self.process.start()
+        child.close()
+
+    # Ends the search of the given number, whether it is running in the
+    # worker or about to start
+    def cancel(self, number):
+        self.to_cancel.value = number
+        if self.process.is_alive():
+            os.kill(self.process.pid, signal.SIGUSR1)
+
+    def close(self):
+        try:
+            self.connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+# One search asked for by one or more requests
+#   key: what the requests have in common (see SolverService.solve)
+#   task: what is sent to the worker (see run_search), starting with the
+#         number of the search
+#   future: the result of the search
+#   waiters: the number of requests waiting for the result
+#   worker: the Worker running the search, None while it is queued
+#   queued: whether the search waits in the queue and has not been
+#           cancelled
+class Job(object):
+    def __init__(self, key, task, future):
+        self.key = key
+        self.task = task
+        self.future = future
+        self.waiters = 0
+        self.worker = None
+        self.queued = False
+
+
+
+
+# The service running the searches
+#   workers: the number of worker processes (the number of CPUs if None)
+#   max_queue: the largest number of searches waiting for a worker
+#   heuristic: the heuristic of the requests which do not give one
+#   search_options: the other options of rushhour.solve() for every search,
+#                   such as backend, frontier or mode
+#
+# It is used from a running event loop:
+#   async with SolverService(workers=4) as service:
+#       result = await service.solve(board, timeout=2.0)
+class SolverService(object):
+    def __init__(self, workers=None, max_queue=64, heuristic=0,
+                 **search_options):
+        if max_queue < 1:
+            raise ValueError("max_queue must be at least 1")
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.heuristic = heuristic
+        self.search_options = search_options
+        self.jobs = {}
+        self.queue = None
+        # The number of searches in the queue which have not been cancelled
+        self.waiting = 0
+        self.dispatchers = []
+        self.counters = {"requests": 0, "searches": 0, "coalesced": 0,
+                         "busy": 0, "timeouts": 0, "cancelled": 0,
+                         "restarts": 0}
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    # Starts the worker processes
+    async def start(self):
+        self.queue = asyncio.Queue()
+        for _ in range(self.workers):
+            worker = Worker(self.search_options)
+            self.dispatchers.append(
+                asyncio.ensure_future(self.dispatch(worker)))
+
+    # Stops the worker processes, the requests still waiting are cancelled
+    async def close(self):
+        for dispatcher in self.dispatchers:
+            dispatcher.cancel()
+        await asyncio.gather(*self.dispatchers, return_exceptions=True)
+        self.dispatchers = []
+        for job in self.jobs.values():
+            job.future.cancel()
+        self.jobs = {}
+
+    # Returns the counters of the service
+    def stats(self):
+        stats = dict(self.counters)
+        stats["queued"] = self.waiting
+        stats["running"] = sum(1 for job in self.jobs.values()
+                               if job.worker is not None)
+        return stats
+
+    # This function solves a gameboard
+    #   @param:
+    #   state: the gameboard, as a list of rows or a single string (see
+    #          rushhour.parse_state)
+    #   heuristic: the choice of heuristic, the one of the service if None
+    #   exit_row: the row of the exit, the middle row if None
+    #   timeout: the time to wait for the result in seconds, None for no
+    #            limit
+    #
+    #   returns the result as a dictionary
+    #   raises ServiceBusy when the search would wait past max_queue
+    async def solve(self, state, heuristic=None, exit_row=None,
+                    timeout=None):
+        self.counters["requests"] += 1
+        if heuristic is None:
+            heuristic = self.heuristic
+        try:
+            board, shape = rushhour.parse_state(state, exit_row)
+            rushhour.validate_board(board, shape)
+        except (ValueError, TypeError) as error:
+            return {"status": "invalid", "error": str(error)}
+
+        key = (board, shape, heuristic)
+        job = self.jobs.get(key)
+        coalesced = job is not None
+        if coalesced:
+            self.counters["coalesced"] += 1
+        else:
+            if self.waiting >= self.max_queue:
+                self.counters["busy"] += 1
+                raise ServiceBusy("%d searches are waiting" % self.max_queue)
+            rows = [board[i:i+shape.width]
+                    for i in range(0, shape.size, shape.width)]
+            job = Job(key, (self.counters["searches"], heuristic, rows,
+                            shape.exit_row),
+                      asyncio.get_running_loop().create_future())
+            self.jobs[key] = job
+            job.queued = True
+            self.waiting += 1
+            self.queue.put_nowait(job)
+            self.counters["searches"] += 1
+
+        job.waiters += 1
+        try:
+            result = dict(await asyncio.wait_for(asyncio.shield(job.future),
+                                                 timeout))
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            self.leave(job)
+            return {"status": "timeout"}
+        except asyncio.CancelledError:
+            self.leave(job)
+            raise
+        if coalesced:
+            result["coalesced"] = True
+        return result
+
+    # Drops a request waiting for a job, and cancels the job when no other
+    # request waits for it
+    def leave(self, job):
+        job.waiters -= 1
+        if job.waiters > 0 or job.future.done():
+            return
+        self.counters["cancelled"] += 1
+        job.future.cancel()
+        if job.queued:
+            job.queued = False
+            self.waiting -= 1
+        if self.jobs.get(job.key) is job:
+            del self.jobs[job.key]
+        if job.worker is not None:
+            job.worker.cancel(job.task[0])
+
+    # Waits for the reply of a worker without blocking the event loop
+    async def receive(self, worker):
+        loop = asyncio.get_running_loop()
+        reply = loop.create_future()
+
+        def readable():
+            loop.remove_reader(worker.connection.fileno())
+            try:
+                reply.set_result(worker.connection.recv())
+            except (EOFError, OSError) as error:
+                reply.set_exception(error)
+
+        loop.add_reader(worker.connection.fileno(), readable)
+        try:
+            return await reply
+        finally:
+            if not reply.done():
+                loop.remove_reader(worker.connection.fileno())
+
+    # The loop feeding the jobs of the queue to one worker, started again
+    # when the worker process dies
+    async def dispatch(self, worker):
+        try:
+            while True:
+                job = await self.queue.get()
+                if not job.queued:
+                    continue
+                job.queued = False
+                self.waiting -= 1
+                job.worker = worker
+                try:
+                    worker.connection.send(job.task)
+                    result = await self.receive(worker)
+                except (EOFError, OSError):
+                    result = {"status": "error",
+                              "error": "the worker process ended early"}
+                    worker.close()
+                    worker = Worker(self.search_options)
+                    self.counters["restarts"] += 1
+                job.worker = None
+                if self.jobs.get(job.key) is job:
+                    del self.jobs[job.key]
+                if not job.future.done():
+                    job.future.set_result(result)
+        finally:
+            worker.close()
+
+
+
+
+# Writes an HTTP response with a JSON body
+async def respond(writer, status, body):
+    reasons = {200: "OK", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 503: "Service Unavailable"}
+    data = (json.dumps(body) + "\n").encode()
+    writer.write(("HTTP/1.1 %d %s\r\n"
+                  "Content-Type: application/json\r\n"
+                  "Content-Length: %d\r\n"
+                  "Connection: close\r\n\r\n"
+                  % (status, reasons[status], len(data))).encode() + data)
+    await writer.drain()
+
+
+# This function serves one HTTP request
+#   @param:
+#   service: the SolverService
+#   reader, writer: the streams of the connection
+async def handle_http(service, reader, writer):
+    try:
+        request = await reader.readline()
+        parts = request.decode("latin-1").split()
+        if len(parts) < 2:
+            return
+        method, path = parts[0], parts[1]
+        length = "0"
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = value
+        try:
+            length = int(length)
+            if length < 0:
+                raise ValueError("negative length")
+        except ValueError:
+            await respond(writer, 400, {"status": "invalid",
+                                        "error": "invalid Content-Length"})
+            return
+        body = await reader.readexactly(length) if length else b""
+
+        if path == "/stats":
+            await respond(writer, 200, service.stats())
+            return
+        if path != "/solve":
+            await respond(writer, 404, {"error": "unknown path " + path})
+            return
+        if method != "POST":
+            await respond(writer, 405, {"error": "use POST"})
+            return
+        try:
+            puzzle = json.loads(body)
+            if not isinstance(puzzle, dict):
+                raise ValueError("the request must be a JSON object")
+            timeout = puzzle.get("timeout")
+            if timeout is not None:
+                timeout = float(timeout)
+        except ValueError as error:
+            await respond(writer, 400, {"status": "invalid",
+                                        "error": str(error)})
+            return
+        try:
+            result = await service.solve(puzzle.get("board"),
+                                         puzzle.get("heuristic"),
+                                         puzzle.get("exit_row"), timeout)
+        except ServiceBusy as error:
+            await respond(writer, 503, {"status": "busy",
+                                        "error": str(error)})
+            return
+        await respond(writer, 400 if result["status"] == "invalid" else 200,
+                      result)
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+# This function runs the HTTP server until it is interrupted
+#   @param:
+#   service: the SolverService, not started yet
+#   host, port: the TCP address to listen on, used when path is None
+#   path: the Unix socket to listen on
+async def serve(service, host="127.0.0.1", port=8080, path=None):
+    async with service:
+        def handler(reader, writer):
+            return handle_http(service, reader, writer)
+
+        if path is not None:
+            server = await asyncio.start_unix_server(handler, path)
+        else:
+            server = await asyncio.start_server(handler, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve Rush Hour searches over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address to listen on")
+    parser.add_argument("--port", type=int, default=8080,
+                        help="port to listen on")
+    parser.add_argument("--unix", default=None,
+                        help="Unix socket to listen on instead of a port")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="number of worker processes")
+    parser.add_argument("--max-queue", type=int, default=64,
+                        help="searches waiting for a worker before new "
+                             "ones are refused")
+    parser.add_argument("--heuristic", type=int, default=0,
+                        help="0 for blocking, 1 for the custom heuristic, "
+                             "2 for the blocker graph heuristic, 3 for the "
+                             "same counting slides")
+    parser.add_argument("--backend", default="vehicles",
+                        choices=sorted(rushhour.BACKENDS))
+    parser.add_argument("--mode", default="astar",
+                        choices=sorted(rushhour.SEARCHES))
+    args = parser.parse_args(argv)
+
+    service = SolverService(args.workers, args.max_queue, args.heuristic,
+                            backend=args.backend, mode=args.mode)
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import inspect
+import sqlite3
+import time
+
+import rushhour
+
+
+# The columns of the key of an entry, and the condition matching one key
+KEY_COLUMNS = "board, heuristic, mode, metric, frontier, backend, options"
+KEY_MATCH = "board = ? AND heuristic = ? AND mode = ? AND metric = ? AND" \
+            " frontier = ? AND backend = ? AND options = ?"
+
+
+# An on-disk cache of solutions stored in a sqlite database
+# Every entry is keyed by the initial board string (see cache_key), the
+# heuristic, and the search that was run: its mode, metric, frontier,
+# backend and the other options which may change the moves found (see
+# options_key). It stores the moves of the solution found, or the reason a
+# board can never be solved (see rushhour.VehicleTable.unsolvable).
+#
+# The database runs in write-ahead-log mode, so any number of processes can
+# read it while one of them writes. Every entry records when it was last
+# used, so that the least recently used ones are removed once there are
+# more than max_entries; a hit only writes that time when it is more than
+# refresh seconds old, so most lookups only read. The number of entries is
+# kept in the counts table, updated along with the entries, so a put never
+# has to count them.
+#   @param:
+#   path: the file of the database
+#   max_entries: the number of entries kept
+#   timeout: the number of seconds to wait for a lock held by another
+#            process
+#   refresh: the age in seconds past which a hit records its time of use
+class SolutionCache(object):
+    def __init__(self, path, max_entries=100000, timeout=30.0, refresh=60.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path, timeout=timeout,
+                                          isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            # The entries of the earlier versions of the cache were not
+            # keyed by the frontier, the backend and the options, which
+            # change the moves found with heuristics 0 and 1, so they are
+            # dropped
+            columns = [row[1] for row in self.connection.execute(
+                "PRAGMA table_info(solutions)")]
+            if columns and "frontier" not in columns:
+                self.connection.execute("DROP TABLE solutions")
+                self.connection.execute("DROP TABLE IF EXISTS counts")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS solutions ("
+                " board TEXT NOT NULL,"
+                " heuristic INTEGER NOT NULL,"
+                " mode TEXT NOT NULL,"
+                " metric TEXT NOT NULL,"
+                " frontier TEXT NOT NULL,"
+                " backend TEXT NOT NULL,"
+                " options TEXT NOT NULL,"
+                " moves TEXT,"
+                " reason TEXT,"
+                " used REAL NOT NULL,"
+                " PRIMARY KEY (board, heuristic, mode, metric, frontier,"
+                " backend, options)) WITHOUT ROWID")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS solutions_used ON solutions"
+                " (used)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS counts ("
+                " entries INTEGER NOT NULL)")
+            self.connection.execute(
+                "INSERT INTO counts SELECT COUNT(*) FROM solutions WHERE"
+                " NOT EXISTS (SELECT * FROM counts)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    # Looks up the solution of a board
+    #   @param:
+    #   board: the initial board as a single string (see cache_key)
+    #   heuristic: the heuristic the solution was found with
+    #   mode, metric, frontier, backend: the search it was found with
+    #   options: the other options of the search (see options_key)
+    #
+    #   returns (found, names, reason), names being the list of moves
+    #   written such as "A+1", or None for a board without a solution, and
+    #   reason why such a board can never be solved
+    def get(self, board, heuristic, mode="astar", metric="cells",
+            frontier="heap", backend="vehicles", options=""):
+        key = (board, heuristic, mode, metric, frontier, backend, options)
+        row = self.connection.execute(
+            "SELECT moves, reason, used FROM solutions WHERE " + KEY_MATCH,
+            key).fetchone()
+        if row is None:
+            self.misses += 1
+            return False, None, None
+        self.hits += 1
+        now = time.time()
+        if now - row[2] > self.refresh:
+            self.connection.execute(
+                "UPDATE solutions SET used = ? WHERE " + KEY_MATCH,
+                (now,) + key)
+        if row[0] is None:
+            return True, None, row[1]
+        return True, row[0].split(), None
+
+    # Stores the solution of a board, removing the least recently used
+    # entries beyond max_entries
+    #   @param:
+    #   board: the initial board as a single string (see cache_key)
+    #   heuristic: the heuristic the solution was found with
+    #   names: the list of moves written such as "A+1", or None for a board
+    #          without a solution
+    #   reason: why a board without a solution can never be solved
+    #   mode, metric, frontier, backend: the search the solution was found
+    #                                    with
+    #   options: the other options of the search (see options_key)
+    def put(self, board, heuristic, names, reason=None, mode="astar",
+            metric="cells", frontier="heap", backend="vehicles", options=""):
+        key = (board, heuristic, mode, metric, frontier, backend, options)
+        moves = None if names is None else " ".join(names)
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            known = self.connection.execute(
+                "SELECT 1 FROM solutions WHERE " + KEY_MATCH, key).fetchone()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?,"
+                " ?, ?, ?, ?)", key + (moves, reason, time.time()))
+            if known is None:
+                self.connection.execute(
+                    "UPDATE counts SET entries = entries + 1")
+            entries = len(self)
+            if entries > self.max_entries:
+                removed = self.connection.execute(
+                    "DELETE FROM solutions WHERE (" + KEY_COLUMNS + ") IN"
+                    " (SELECT " + KEY_COLUMNS + " FROM solutions ORDER BY"
+                    " used LIMIT ?)", (entries - self.max_entries,)).rowcount
+                self.connection.execute(
+                    "UPDATE counts SET entries = entries - ?", (removed,))
+
+    # Returns the number of entries in the cache
+    def __len__(self):
+        return self.connection.execute(
+            "SELECT entries FROM counts").fetchone()[0]
+
+    # Returns the hit and miss statistics of this connection
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+
+
+
+# Returns the key of a gameboard in the cache: the board string itself for
+# the standard 6x6 board, and the board string after its shape otherwise,
+# such as "7x7:3:" for a 7x7 board with the exit on its fourth row
+#   @param:
+#   board: the initial board as a single string
+#   shape: the rushhour.BoardShape of the board
+def cache_key(board, shape):
+    if shape == rushhour.STANDARD:
+        return board
+    return "%dx%d:%d:%s" % (shape.height, shape.width, shape.exit_row, board)
+
+
+# The options of rushhour.solve() which never change the moves found, left
+# out of the key of the cache
+NEUTRAL_OPTIONS = ("stats", "incremental", "verify_heuristic")
+
+
+# Returns the other options of the search as they are written in the key
+# of the cache, such as "pruning='commute' table_size=0"
+def options_key(options):
+    return " ".join("%s=%r" % (name, options[name])
+                    for name in sorted(options)
+                    if name not in NEUTRAL_OPTIONS)
+
+
+# The parameters of rushhour.solve(), read once for every cached_solve()
+SOLVE_SIGNATURE = inspect.signature(rushhour.solve)
+
+
+# A Solution read from the cache, which only builds the VehicleTable of the
+# board when it is first used, such as by Solution.boards(), so that a hit
+# does not pay for it
+#   @param:
+#   board: the initial board as a single string
+#   shape: the rushhour.BoardShape of the board
+#   The other parameters are those of rushhour.Solution
+class CachedSolution(rushhour.Solution):
+    __slots__ = ("board", "shape", "loaded")
+
+    def __init__(self, board, shape, moves, time, info=None):
+        self.board = board
+        self.shape = shape
+        rushhour.Solution.__init__(self, None, moves, 0, 0, time, info)
+
+    @property
+    def table(self):
+        if self.loaded is None:
+            self.loaded = rushhour.VehicleTable(self.board, self.shape)
+        return self.loaded
+
+    @table.setter
+    def table(self, table):
+        self.loaded = table
+
+
+# Reads back the moves written by rushhour.VehicleTable.move_names()
+# without building the VehicleTable, whose vehicles are numbered in the
+# order their first cell comes in the board
+#   @param:
+#   board: the initial board as a single string
+#   names: the list of moves written such as "A+1"
+#
+#   returns the list of (vehicle, delta) moves
+def parse_moves(board, names):
+    ids = {}
+    for cell in board:
+        if cell != '-' and cell not in ids:
+            ids[cell] = len(ids)
+    return [(ids[name[0]], int(name[1:])) for name in names]
+
+
+# Returns whether rushhour.solve() in this mode always finds the same moves
+# for the same key, the only searches the cache holds
+# The anytime search stops on a time limit, and HDA* expands the states in
+# the order its processes happen to run, which changes the moves found
+# unless the heuristic never overestimates them (heuristics 2 and 3).
+def deterministic_search(heuristic, mode):
+    if mode == "anytime":
+        return False
+    if mode == "hda":
+        return heuristic in (2, 3)
+    return True
+
+
+# This function solves a gameboard like rushhour.solve(), answering from
+# the cache when the board has been solved before with the same search
+# Only the searches which always find the same moves (see
+# deterministic_search) use the cache, the others are passed on to
+# rushhour.solve(). A board without a solution is only stored when it was
+# found unsolvable without searching, and the reason is given back under
+# info["unsolvable"].
+# A solution read from the cache reports 0 expanded and generated states,
+# and is a CachedSolution.
+#   @param:
+#   cache: the SolutionCache
+#   heuristic: the choice to heuristic to use in solve the game
+#   state: the initial state of the gameboard
+#   The other parameters are passed on to rushhour.solve()
+#
+#   returns a rushhour.Solution
+def cached_solve(cache, heuristic, state, *args, **kwargs):
+    start = time.perf_counter()
+    arguments = SOLVE_SIGNATURE.bind(heuristic, state, *args, **kwargs)
+    arguments.apply_defaults()
+    mode = arguments.arguments["mode"]
+    if not deterministic_search(heuristic, mode):
+        return rushhour.solve(heuristic, state, *args, **kwargs)
+    metric = arguments.arguments["metric"]
+    frontier = arguments.arguments["frontier"]
+    if frontier is None:
+        frontier = rushhour.default_frontier(heuristic, metric)
+    search = (mode, metric, frontier, arguments.arguments["backend"],
+              options_key(arguments.arguments["options"]))
+
+    board, shape = rushhour.parse_state(state,
+                                        arguments.arguments["exit_row"])
+    key = cache_key(board, shape)
+    found, names, reason = cache.get(key, heuristic, *search)
+    if found:
+        moves = None if names is None else parse_moves(board, names)
+        info = {} if reason is None else {"unsolvable": reason}
+        return CachedSolution(board, shape, moves,
+                              time.perf_counter() - start, info)
+
+    solution = rushhour.solve(heuristic, state, *args, **kwargs)
+    if solution.solved:
+        cache.put(key, heuristic, solution.move_names(), None, *search)
+    elif "unsolvable" in solution.info:
+        cache.put(key, heuristic, None, solution.info["unsolvable"], *search)
+    return solution
@@ -0,0 +1,83 @@
+import json
+import multiprocessing
+import os
+
+import pytest
+
+import batch
+
+BOARD = "JGGFFFJ-HCCCXXH----IAA--DI----DEEBBB"
+ROWS = [BOARD[i:i+6] for i in range(0, 36, 6)]
+# A few seconds with heuristic 0 and the string backend
+HARD = "J-BBBIJ-HEEIXXHCKG-LLCKG---FDDAA-F--"
+
+
+def test_parse_puzzle_formats():
+    assert batch.parse_puzzle(BOARD) == (None, ROWS, 2)
+    assert batch.parse_puzzle(" ".join(ROWS)) == (None, ROWS, 2)
+    assert batch.parse_puzzle(json.dumps(ROWS)) == (None, ROWS, 2)
+    assert batch.parse_puzzle(json.dumps({"id": "p1", "board": BOARD,
+                                          "exit_row": 2})) == \
+        ("p1", ROWS, 2)
+    assert batch.parse_puzzle("") is None
+    assert batch.parse_puzzle("   # a comment") is None
+
+
+@pytest.mark.parametrize("line", [
+    "not a board",
+    BOARD[:-1],
+    json.dumps({"board": 7}),
+    json.dumps({"board": BOARD, "exit_row": "2"}),
+    BOARD.replace("X", "-"),
+])
+def test_parse_puzzle_rejects(line):
+    with pytest.raises(ValueError):
+        batch.parse_puzzle(line)
+
+
+def test_solve_batch_results():
+    lines = ["# puzzles", BOARD, "", "hello",
+             json.dumps({"id": "p1", "board": ROWS})]
+    results = sorted(batch.solve_batch(lines, workers=2, solution=True),
+                     key=lambda result: result["index"])
+    assert [result["index"] for result in results] == [2, 4, 5]
+    assert results[0]["status"] == "solved"
+    assert results[0]["moves"] == len(results[0]["solution"])
+    assert results[1]["status"] == "invalid"
+    assert "not a gameboard" in results[1]["error"]
+    assert results[2]["id"] == "p1"
+    assert results[2]["moves"] == results[0]["moves"]
+
+
+def test_solve_batch_timeout():
+    results = list(batch.solve_batch([HARD, BOARD], workers=1, timeout=0.2,
+                                     backend="string"))
+    statuses = {result["index"]: result["status"] for result in results}
+    # The worker goes on with the next puzzle after the timeout
+    assert statuses == {1: "timeout", 2: "solved"}
+
+
+# Runs one puzzle in a worker set up with a limit of the address space
+# it already has, which leaves no room for the search
+def run_with_memory_limit(connection):
+    with open("/proc/self/status") as f:
+        size_kb = next(int(line.split()[1]) for line in f
+                       if line.startswith("VmSize"))
+    batch.init_worker({"heuristic": 0, "backend": "vehicles",
+                       "frontier": None, "timeout": None, "solution": False,
+                       "stats": False}, size_kb // 1024)
+    connection.send(batch.solve_line((1, HARD)))
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/status"),
+                    reason="reads the address space from /proc")
+def test_memory_limit():
+    # A fresh interpreter, the heap of a fork of pytest may hold enough
+    # free memory for the search
+    context = multiprocessing.get_context("spawn")
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=run_with_memory_limit, args=(sender,))
+    process.start()
+    result = receiver.recv()
+    process.join()
+    assert result["status"] == "memory"
@@ -0,0 +1,64 @@
+import struct
+import sys
+
+import pytest
+
+import benchmark
+import cluster
+import rushhour
+
+BOARD = "JGGFFFJ-HCCCXXH----IAA--DI----DEEBBB"
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "cluster.bin")
+    cluster.build_cluster(BOARD, path)
+    return path
+
+
+def test_table_round_trip(path):
+    table = rushhour.VehicleTable(BOARD)
+    distances = cluster.cluster_distances(table)
+    with cluster.ClusterTable(path) as stored:
+        assert stored.size == len(distances)
+        for board, entry in distances.items():
+            assert stored.entry_of(board) == entry
+        assert stored.distance(BOARD) == distances[table.start][0]
+        solution = stored.solve(BOARD)
+        assert benchmark.goal_distance(solution) == distances[table.start][0]
+        assert list(solution.boards())[0] == BOARD
+
+
+def test_table_rejects_other_gameboards(path):
+    with cluster.ClusterTable(path) as stored:
+        with pytest.raises(KeyError):
+            stored.entry_of(bytes(len(stored.table.ids)))
+
+
+def test_file_is_little_endian(path):
+    table = rushhour.VehicleTable(BOARD)
+    distances = cluster.cluster_distances(table)
+    keys = sorted(distances)
+    with open(path, "rb") as f:
+        data = f.read()
+    magic, width, size, board = cluster.HEADER.unpack_from(data)
+    assert (magic, width, size, board) == \
+        (cluster.MAGIC, len(table.ids), len(keys), BOARD.encode("ascii"))
+    start = cluster.HEADER.size + size * width + size * width % 2
+    assert list(struct.unpack_from("<%dH" % size, data, start)) == \
+        [distances[key][0] for key in keys]
+
+
+# The distances are copied and swapped on a big-endian host; here both the
+# writer and the reader take that path, which must give back the same
+# entries
+def test_big_endian_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "byteorder",
+                        "big" if sys.byteorder == "little" else "little")
+    path = str(tmp_path / "cluster.bin")
+    cluster.build_cluster(BOARD, path)
+    table = rushhour.VehicleTable(BOARD)
+    with cluster.ClusterTable(path) as stored:
+        for board, entry in cluster.cluster_distances(table).items():
+            assert stored.entry_of(board) == entry
@@ -0,0 +1,87 @@
+import os
+
+import pytest
+
+import benchmark
+import external
+import rushhour
+
+PUZZLES = {puzzle["id"]: puzzle for puzzle in benchmark.load_corpus()}
+
+
+def test_move_codes():
+    for vehicle in range(external.MAX_VEHICLES):
+        for delta in (-1, 1):
+            code = external.encode_move(vehicle, delta)
+            assert 0 < code < 256
+            assert external.decode_move(code) == (vehicle, delta)
+
+
+# Records of two bytes: one for the state, one for the move
+def record(state, move=1):
+    return bytes((state, move))
+
+
+@pytest.mark.parametrize("merge_files", [2, external.MERGE_FILES])
+def test_merge_drops_the_duplicates(tmp_path, monkeypatch, merge_files):
+    monkeypatch.setattr(external, "MERGE_FILES", merge_files)
+    buckets = external.BucketFiles(str(tmp_path), 2, 3)
+    older = (2, 5)
+    for state in (4, 9):
+        buckets.add(older, record(state))
+    assert buckets.merge(older)[1] == 2
+
+    bucket = (3, 5)
+    # The states come in several runs and in the buffer, some of them more
+    # than once through different moves
+    states = [7, 3, 9, 3, 1, 8, 7, 4, 2, 8, 6, 3, 5]
+    for i, state in enumerate(states):
+        buckets.add(bucket, record(state, 1 + i % 2))
+    assert buckets.spills == 4
+    assert buckets.pending[bucket] == len(states)
+    path, count = buckets.merge(bucket)
+    # 4 and 9 were expanded one move earlier
+    expected = sorted(set(states) - {4, 9})
+    assert count == len(expected)
+    assert [r[0] for r in buckets.read(path)] == expected
+    assert bucket not in buckets.pending
+    # Only the expanded files are left
+    assert sorted(os.listdir(str(tmp_path))) == \
+        sorted(os.path.basename(p) for p in buckets.done[older] +
+               buckets.done[bucket])
+
+    # A bucket taken again only keeps the states it did not expand yet
+    for state in (2, 10, 10):
+        buckets.add(bucket, record(state))
+    path, count = buckets.merge(bucket)
+    assert [r[0] for r in buckets.read(path)] == [10]
+
+    assert buckets.find(bucket, bytes((10,))) == record(10)
+    assert buckets.find(bucket, bytes((5,)))[0] == 5
+    assert buckets.find(bucket, bytes((4,))) is None
+
+
+def test_merge_of_nothing_new(tmp_path):
+    buckets = external.BucketFiles(str(tmp_path), 2, 100)
+    buckets.add((0, 1), record(1))
+    buckets.merge((0, 1))
+    buckets.add((0, 1), record(1))
+    assert buckets.merge((0, 1)) == (None, 0)
+    assert len(os.listdir(str(tmp_path))) == 1
+
+
+@pytest.mark.parametrize("name", ["e1", "m1", "m2"])
+def test_external_search_spills(tmp_path, name):
+    solution = rushhour.solve(2, PUZZLES[name]["board"], mode="external",
+                              memory_states=50, directory=str(tmp_path))
+    assert benchmark.goal_distance(solution) == PUZZLES[name]["distance"]
+    assert solution.info["spills"] > 0
+    assert solution.info["bytes_read"] > 0
+    # The files are deleted at the end
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_external_search_arguments():
+    with pytest.raises(ValueError):
+        rushhour.solve(2, PUZZLES["e1"]["board"], mode="external",
+                       memory_states=0)
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+import cluster
+import generator
+import rushhour
+
+
+def run(seed, workers, count=4):
+    return list(generator.generate(count, seed=seed, min_distance=8,
+                                   max_cluster=20000, workers=workers))
+
+
+def test_same_seed_same_puzzles_with_any_workers():
+    puzzles = run(7, 1)
+    assert len(puzzles) == 4
+    assert run(7, 3) == puzzles
+    # The first puzzles of a longer run are the same as well
+    assert run(7, 2, count=5)[:4] == puzzles
+    assert run(8, 2) != puzzles
+
+
+def test_puzzles_are_hardest_of_their_cluster():
+    puzzles = run(7, 2)
+    assert len({puzzle["board"] for puzzle in puzzles}) == len(puzzles)
+    for puzzle in puzzles:
+        assert puzzle["board"] == generator.canonical(puzzle["board"])
+        assert puzzle["grade"] == generator.grade(puzzle["distance"])
+        table = rushhour.VehicleTable(puzzle["board"])
+        distances = cluster.cluster_distances(table)
+        assert len(distances) == puzzle["cluster_size"]
+        assert distances[table.start][0] == puzzle["distance"] >= 8
+        assert max(entry[0] for entry in distances.values()
+                   if entry is not None) == puzzle["distance"]
+
+
+def test_random_boards_are_valid():
+    rng = random.Random(3)
+    for _ in range(200):
+        board = generator.random_board(rng, rushhour.STANDARD, 12)
+        rushhour.validate_board(board)
+
+
+def test_canonical():
+    assert generator.canonical("QQ-X") == "AA-X"
+    assert generator.canonical("ZZYYXX") == "AABBXX"
+
+
+def test_generate_rejects_an_empty_range():
+    with pytest.raises(ValueError):
+        next(generator.generate(1, min_vehicles=5, max_vehicles=4,
+                                workers=1))
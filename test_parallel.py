@@ -0,0 +1,38 @@
+import pytest
+
+import benchmark
+import parallel
+import rushhour
+
+PUZZLES = {puzzle["id"]: puzzle for puzzle in benchmark.load_corpus()}
+MEDIUM = [name for name, puzzle in PUZZLES.items()
+          if puzzle["grade"] == "medium"]
+
+
+@pytest.mark.parametrize("workers", [1, 3, 4])
+@pytest.mark.parametrize("name", MEDIUM)
+def test_hda_finds_fewest_moves(name, workers):
+    solution = rushhour.solve(2, PUZZLES[name]["board"], mode="hda",
+                              workers=workers)
+    assert benchmark.goal_distance(solution) == PUZZLES[name]["distance"]
+    assert solution.info["workers"] == workers
+    assert sum(solution.info["worker_expanded"]) == solution.expanded
+
+
+# The search ends once the whole cluster is expanded without a goal state
+@pytest.mark.parametrize("workers", [1, 2])
+def test_hda_ends_without_a_goal_state(workers):
+    board, shape = rushhour.parse_state(
+        "------------XX-AA-------------------")
+    backend = rushhour.BACKENDS["vehicles"](board, shape)
+    moves, expanded, generated, info = parallel.hda_search(
+        2, backend, workers=workers)
+    assert moves is None
+    # Each of the six gameboards of the cluster is expanded once
+    assert expanded == 6
+
+
+def test_hda_ends_on_a_goal_state():
+    solution = rushhour.solve(2, "------------" "----XX" + "-" * 18,
+                              mode="hda", workers=2)
+    assert solution.moves == []
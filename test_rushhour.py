@@ -0,0 +1,111 @@
+import pytest
+
+import benchmark
+import cluster
+import rushhour
+
+BOARD = "JGGFFFJ-HCCCXXH----IAA--DI----DEEBBB"
+PUZZLES = {puzzle["id"]: puzzle for puzzle in benchmark.load_corpus()}
+
+
+@pytest.mark.parametrize("board,error", [
+    (BOARD[:-1], "the board must have 36 cells, not 35"),
+    (BOARD[:-1] + ".", "invalid cell '.' at row 6, column 6"),
+    (BOARD.replace("X", "A"), "car X is missing"),
+    (BOARD[:-1] + "K", "vehicle K takes a single cell"),
+    ("JGGFFFJ-HCCCXXH---JIAA--DI----DEEBBB",
+     "vehicle J is not a straight line of cells"),
+    ("JGGFFFJ-HCCCXXH-----AA--DI-I--DEEBBB",
+     "vehicle I is not a straight line of cells"),
+    ("-----AA-----XX----" + "-" * 18,
+     "vehicle A is not a straight line of cells"),
+    ("-" * 12 + "XXX---" + "-" * 18,
+     "X must be a car on the exit row (row 3)"),
+    ("XX" + "-" * 34, "X must be a car on the exit row (row 3)"),
+])
+def test_validate_board(board, error):
+    with pytest.raises(ValueError) as raised:
+        rushhour.validate_board(board)
+    assert str(raised.value) == error
+    with pytest.raises(ValueError):
+        rushhour.solve(2, board)
+
+
+@pytest.mark.parametrize("board,reason", [
+    ("------------XX-AA-" + "-" * 18,
+     "vehicle A is on the exit row to the right of X"),
+    # T can never leave the exit row, held by C and the two trucks below
+    ("-----T-----TXX---T-----C-----CDDDBBB",
+     "car X can never get past vehicle T"),
+])
+def test_unsolvable(board, reason):
+    table = rushhour.VehicleTable(board)
+    assert table.unsolvable() == reason
+    assert cluster.cluster_distances(table)[table.start] is None
+    solution = rushhour.solve(2, board)
+    assert solution.moves is None
+    assert solution.expanded == 0
+    assert solution.info["unsolvable"] == reason
+    # Without the check the search runs out of gameboards
+    solution = rushhour.solve(2, board, precheck=False)
+    assert solution.moves is None
+    assert solution.expanded > 0
+
+
+# No gameboard from which a goal state can be reached is ever reported as
+# unsolvable
+@pytest.mark.parametrize("name", ["t1", "t2", "e1"])
+def test_solvable_boards_are_not_reported(name):
+    table = rushhour.VehicleTable(PUZZLES[name]["board"])
+    for board, entry in cluster.cluster_distances(table).items():
+        if entry is not None:
+            other = rushhour.VehicleTable(table.to_string(board))
+            assert other.unsolvable() is None
+
+
+# X has just moved right, leaving the cell A can move down into
+PRUNED = "A-CC--A------XX---" + "-" * 18
+
+
+@pytest.mark.parametrize("pruning,kept,counts", [
+    ("none", [(0, 1), (1, -1), (1, 1), (2, -1), (2, 1)], (0, 0)),
+    ("inverse", [(0, 1), (1, -1), (1, 1), (2, 1)], (1, 0)),
+    # C could have moved before X, A could not
+    ("commute", [(0, 1), (2, 1)], (1, 2)),
+])
+def test_move_pruning(pruning, kept, counts):
+    backend = rushhour.BACKENDS["vehicles"](PRUNED)
+    assert backend.table.ids == ['A', 'C', 'X']
+    moves = backend.table.successors(backend.initial)
+    pruner = rushhour.MovePruning(backend, pruning)
+    if pruning != "none":
+        moves = pruner.prune(backend.initial, 2, 1, moves)
+    assert [(v, d) for new_board, v, d in moves] == kept
+    assert pruner.to_dict() == {"inverse": counts[0], "commuted": counts[1]}
+
+
+def test_move_pruning_options():
+    backend = rushhour.BACKENDS["vehicles"](PRUNED)
+    with pytest.raises(ValueError):
+        rushhour.MovePruning(backend, "everything")
+    with pytest.raises(ValueError):
+        rushhour.solve(2, BOARD, pruning="commute", metric="distance")
+
+
+# The pruned moves never change the length of the solutions; IDA*
+# generates fewer gameboards with every setting, while A* may break the
+# ties of its frontier another way
+@pytest.mark.parametrize("mode", ["astar", "idastar"])
+@pytest.mark.parametrize("name", ["e1", "e2", "m1", "m2"])
+def test_pruning_keeps_fewest_moves(mode, name):
+    board = PUZZLES[name]["board"]
+    solutions = {pruning: rushhour.solve(2, board, mode=mode,
+                                         pruning=pruning)
+                 for pruning in rushhour.PRUNINGS}
+    for solution in solutions.values():
+        assert benchmark.goal_distance(solution) == PUZZLES[name]["distance"]
+    assert "pruned" not in solutions["none"].info
+    assert solutions["inverse"].info["pruned"]["commuted"] == 0
+    if mode == "idastar":
+        assert solutions["commute"].generated < \
+            solutions["inverse"].generated < solutions["none"].generated
@@ -0,0 +1,151 @@
+import collections
+import functools
+import random
+
+import pytest
+
+import benchmark
+import cluster
+import rushhour
+
+PUZZLES = {puzzle["id"]: puzzle for puzzle in benchmark.load_corpus()}
+
+# The slower searches only get the puzzles up to these grades, to keep the
+# run short
+UP_TO_EASY = [name for name, puzzle in PUZZLES.items()
+              if puzzle["grade"] in ("trivial", "easy")]
+UP_TO_MEDIUM = [name for name, puzzle in PUZZLES.items()
+                if puzzle["grade"] in ("trivial", "easy", "medium")]
+UP_TO_HARD = [name for name, puzzle in PUZZLES.items()
+              if puzzle["grade"] != "expert"]
+
+# The searches which always find the fewest moves to a goal state, as
+# (mode, heuristic, options, puzzles)
+EXACT_SEARCHES = [
+    ("astar", 3, {}, list(PUZZLES)),
+    ("astar", 2, {"incremental": True}, list(PUZZLES)),
+    ("idastar", 2, {}, UP_TO_MEDIUM),
+    ("idastar", 2, {"pruning": "commute"}, UP_TO_MEDIUM),
+    ("bidirectional", 2, {}, list(PUZZLES)),
+    ("bidirectional", 3, {"split": 0.9}, UP_TO_HARD),
+    ("anytime", 2, {"weight": 2.0}, list(PUZZLES)),
+    ("hda", 2, {"workers": 2}, UP_TO_HARD),
+    ("external", 2, {"memory_states": 1000}, UP_TO_MEDIUM),
+    ("vectorized", 2, {}, list(PUZZLES)),
+]
+
+
+# Returns (distance, exit) of a puzzle of the corpus from the whole cluster
+# of its gameboard (see cluster.cluster_distances)
+@functools.lru_cache(maxsize=None)
+def exact(name, slides=False):
+    board, shape = rushhour.parse_state(PUZZLES[name]["board"])
+    table = rushhour.VehicleTable(board, shape)
+    return cluster.cluster_distances(table, slides=slides)[table.start]
+
+
+def backend_puzzles():
+    for backend in rushhour.BACKENDS:
+        for name in PUZZLES if backend != "string" else UP_TO_EASY:
+            yield backend, name
+
+
+@pytest.mark.parametrize("name", list(PUZZLES))
+def test_corpus_distances(name):
+    assert exact(name)[0] == PUZZLES[name]["distance"]
+
+
+@pytest.mark.parametrize("frontier", list(rushhour.FRONTIERS))
+@pytest.mark.parametrize("backend,name", list(backend_puzzles()))
+def test_blocker_graph_finds_fewest_moves(backend, name, frontier):
+    solution = rushhour.solve(2, PUZZLES[name]["board"], backend=backend,
+                              frontier=frontier)
+    assert benchmark.goal_distance(solution) == exact(name)[0]
+
+
+@pytest.mark.parametrize("mode,heuristic,options,name", [
+    (mode, heuristic, options, name)
+    for mode, heuristic, options, names in EXACT_SEARCHES
+    for name in names])
+def test_search_finds_fewest_moves(mode, heuristic, options, name):
+    if mode == "vectorized":
+        pytest.importorskip("numpy")
+    solution = rushhour.solve(heuristic, PUZZLES[name]["board"], mode=mode,
+                              **options)
+    assert benchmark.goal_distance(solution) == exact(name)[0]
+
+
+@pytest.mark.parametrize("backend,name", list(backend_puzzles()))
+def test_fewest_slides(backend, name):
+    # The heuristic given does not matter, the slides are searched with
+    # heuristic 3
+    solution = rushhour.solve(2, PUZZLES[name]["board"], backend=backend,
+                              metric="slides")
+    assert len(solution.moves) == sum(exact(name, slides=True))
+
+
+# Heuristics 0 and 1 may overestimate, their answers are kept as they were
+# with the PriorityQueue frontier
+@pytest.mark.parametrize("heuristic", [0, 1])
+@pytest.mark.parametrize("backend,name", list(backend_puzzles()))
+def test_default_frontier_keeps_the_moves(backend, name, heuristic):
+    board = PUZZLES[name]["board"]
+    solution = rushhour.solve(heuristic, board, backend=backend)
+    reference = rushhour.solve(heuristic, board, backend=backend,
+                               frontier="priorityqueue")
+    assert solution.length == reference.length
+    assert benchmark.goal_distance(solution) >= exact(name)[0]
+
+
+# The bucket frontier takes the states out in the order of the heap with
+# the same tie-breaking
+def test_bucket_frontier_order():
+    generator = random.Random(5)
+    heap = rushhour.HeapFrontier()
+    bucket = rushhour.BucketFrontier()
+    for step in range(5000):
+        if generator.random() < 0.6 or heap.empty():
+            g_n = generator.randrange(40)
+            h_n = generator.randrange(40)
+            state = rushhour.BoardState(b"", g_n, h_n, g_n + h_n, step)
+            heap.put(state)
+            bucket.put(state)
+        else:
+            assert bucket.get() is heap.get()
+        assert bucket.empty() == heap.empty()
+    while not heap.empty():
+        assert bucket.get() is heap.get()
+    assert bucket.empty()
+
+
+# The backward estimate of the bidirectional search never overestimates
+# the moves from the initial board
+@pytest.mark.parametrize("name", UP_TO_EASY)
+def test_start_distance_heuristic(name):
+    board, shape = rushhour.parse_state(PUZZLES[name]["board"])
+    table = rushhour.VehicleTable(board, shape)
+    distances = {table.start: 0}
+    layer = [table.start]
+    while layer:
+        next_layer = []
+        for board in layer:
+            for new_board, vehicle, delta in table.successors(board):
+                if new_board not in distances:
+                    distances[new_board] = distances[board] + 1
+                    next_layer.append(new_board)
+        layer = next_layer
+    for board, distance in distances.items():
+        assert table.start_distance_heuristic(board) <= distance
+
+
+@pytest.mark.parametrize("name", UP_TO_EASY)
+def test_goal_states_by_distance(name):
+    board, shape = rushhour.parse_state(PUZZLES[name]["board"])
+    table = rushhour.VehicleTable(board, shape)
+    by_distance = collections.Counter()
+    for offsets in table.goal_states():
+        by_distance[sum(abs(a - b) for a, b in zip(offsets, table.start))] \
+            += 1
+    for distance in range(max(by_distance) + 2):
+        goals = list(table.goal_states(distance))
+        assert len(set(goals)) == len(goals) == by_distance[distance]
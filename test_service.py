@@ -0,0 +1,68 @@
+import asyncio
+import multiprocessing
+import time
+
+import service
+
+# Four seconds with the string backend, a search the deadlines cut short
+HARD = "J-BBBIJ-HEEIXXHCKG-LLCKG---FDDAA-F--"
+EASY = "JGGFFFJ-HCCCXXH----IAA--DI----DEEBBB"
+
+
+def test_deadline_frees_the_worker():
+    async def run():
+        async with service.SolverService(workers=1,
+                                         backend="string") as solver:
+            assert await solver.solve(HARD, timeout=0.2) == \
+                {"status": "timeout"}
+            # The only worker is free again long before the hard search
+            # would have ended
+            start = time.perf_counter()
+            result = await solver.solve(EASY, timeout=2.0)
+            assert time.perf_counter() - start < 2.0
+            assert result["status"] == "solved"
+            return solver.stats()
+
+    stats = asyncio.run(run())
+    assert stats["timeouts"] == 1
+    assert stats["cancelled"] == 1
+    assert stats["restarts"] == 0
+
+
+def test_cancel_before_the_search_starts(monkeypatch):
+    to_cancel = multiprocessing.RawValue('q', 7)
+    monkeypatch.setattr(service, "cancelled", to_cancel)
+    result = service.run_search((7, 0, [EASY[i:i+6] for i in range(0, 36, 6)],
+                                 None), {})
+    assert result["status"] == "cancelled"
+    assert service.current == -1
+
+
+def test_cancel_of_an_earlier_search_is_ignored(monkeypatch):
+    to_cancel = multiprocessing.RawValue('q', 6)
+    monkeypatch.setattr(service, "cancelled", to_cancel)
+    result = service.run_search((7, 0, [EASY[i:i+6] for i in range(0, 36, 6)],
+                                 None), {})
+    assert result["status"] == "solved"
+
+
+def test_bad_content_length_is_answered():
+    async def run(length):
+        server = await asyncio.start_server(
+            lambda reader, writer: service.handle_http(
+                service.SolverService(workers=1), reader, writer),
+            "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"POST /solve HTTP/1.1\r\n"
+                         b"Content-Length: " + length + b"\r\n\r\n")
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+        return response
+
+    for length in (b"ten", b"-1"):
+        response = asyncio.run(run(length))
+        assert response.startswith(b"HTTP/1.1 400 ")
+        assert b"invalid Content-Length" in response
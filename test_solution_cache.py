@@ -0,0 +1,97 @@
+import itertools
+import time
+
+import rushhour
+import solution_cache
+
+BOARD = "JGGFFFJ-HCCCXXH----IAA--DI----DEEBBB"
+# The car A on the exit row to the right of X never lets it out
+BLOCKED = "------------XX-AA-------------------"
+
+
+def test_keys_are_kept_apart(tmp_path):
+    with solution_cache.SolutionCache(str(tmp_path / "cache.db")) as cache:
+        cache.put(BOARD, 2, ["X+1"])
+        assert cache.get(BOARD, 2) == (True, ["X+1"], None)
+        for key in [{"heuristic": 3}, {"mode": "idastar"},
+                    {"metric": "slides"}, {"frontier": "bucket"},
+                    {"backend": "string"}, {"options": "pruning='commute'"}]:
+            arguments = dict({"heuristic": 2}, **key)
+            assert cache.get(BOARD, **arguments) == (False, None, None)
+        shape = rushhour.BoardShape(6, 6, 3)
+        assert solution_cache.cache_key(BOARD, rushhour.STANDARD) == BOARD
+        assert solution_cache.cache_key(BOARD, shape) == "6x6:3:" + BOARD
+        assert cache.get(solution_cache.cache_key(BOARD, shape), 2) == \
+            (False, None, None)
+        assert cache.stats() == {"hits": 1, "misses": 7, "hit_rate": 0.125,
+                                 "entries": 1}
+
+
+def test_options_key_leaves_out_the_neutral_options():
+    assert solution_cache.options_key({"stats": True, "table_size": 0,
+                                       "pruning": "commute"}) == \
+        "pruning='commute' table_size=0"
+    assert solution_cache.options_key({"incremental": True}) == ""
+
+
+def test_least_recently_used_are_removed(tmp_path, monkeypatch):
+    clock = itertools.count()
+    monkeypatch.setattr(time, "time", lambda: next(clock))
+    path = str(tmp_path / "cache.db")
+    with solution_cache.SolutionCache(path, max_entries=3,
+                                      refresh=0) as cache:
+        for heuristic in range(3):
+            cache.put(BOARD, heuristic, ["X+%d" % heuristic])
+        # The hit makes heuristic 0 the most recently used
+        assert cache.get(BOARD, 0)[0]
+        cache.put(BOARD, 3, ["X+3"])
+        assert len(cache) == 3
+        assert not cache.get(BOARD, 1)[0]
+        assert all(cache.get(BOARD, heuristic)[0]
+                   for heuristic in (0, 2, 3))
+
+
+def test_counts_follow_the_entries(tmp_path):
+    path = str(tmp_path / "cache.db")
+    with solution_cache.SolutionCache(path, max_entries=2) as cache:
+        cache.put(BOARD, 2, ["X+1"])
+        cache.put(BOARD, 2, ["X+2"])
+        assert len(cache) == 1
+        cache.put(BOARD, 3, None, "blocked")
+        cache.put(BOARD, 0, ["X+1"])
+        assert len(cache) == 2
+    with solution_cache.SolutionCache(path) as cache:
+        assert len(cache) == 2
+        assert len(cache) == cache.connection.execute(
+            "SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+
+def test_cached_solve_hit(tmp_path):
+    with solution_cache.SolutionCache(str(tmp_path / "cache.db")) as cache:
+        solution = solution_cache.cached_solve(cache, 2, BOARD)
+        hit = solution_cache.cached_solve(cache, 2, BOARD)
+        assert isinstance(hit, solution_cache.CachedSolution)
+        assert hit.moves == solution.moves
+        assert hit.expanded == 0
+        assert hit.move_names() == solution.move_names()
+        assert list(hit.boards()) == list(solution.boards())
+        # The default frontier of heuristic 2 is part of the key
+        assert cache.get(BOARD, 2, frontier="bucket")[0]
+        assert solution_cache.cached_solve(cache, 2, BOARD,
+                                           frontier="heap").expanded > 0
+
+
+def test_cached_solve_unsolvable(tmp_path):
+    with solution_cache.SolutionCache(str(tmp_path / "cache.db")) as cache:
+        solution = solution_cache.cached_solve(cache, 2, BLOCKED)
+        hit = solution_cache.cached_solve(cache, 2, BLOCKED)
+        assert not hit.solved
+        assert hit.info["unsolvable"] == solution.info["unsolvable"]
+
+
+def test_parse_moves():
+    board, shape = rushhour.parse_state(BOARD)
+    table = rushhour.VehicleTable(board, shape)
+    moves = rushhour.solve(2, BOARD).moves
+    assert solution_cache.parse_moves(board,
+                                      table.move_names(moves)) == moves
@@ -0,0 +1,414 @@
+try:
+    import numpy
+except ImportError:
+    raise ImportError("the vectorized search needs NumPy (pip install numpy)")
+
+
+# Runs the A* search on batches of states held as NumPy arrays
+#
+# A batch of gameboards is an array of N rows of the vehicle offsets (see
+# rushhour.VehicleTable), one unsigned byte each. The moves, the goal test
+# and the heuristics are computed for a whole batch at once, looping over
+# the vehicles and their offsets instead of over the gameboards:
+#   the occupancy of every cell is filled in from the cells of every
+#   vehicle at its offset, with one more cell which is always taken, standing
+#   for the moves off the edge of the board
+#   a move of a vehicle is legal on the rows where the cell it enters is
+#   free, and its children are the copies of those rows with one offset
+#   changed
+#   the blocking and custom heuristics read the cells of the exit row and
+#   the few cells around the vehicles standing on it
+# The blocker graph heuristic follows the graph of the blockers of every
+# gameboard, which does not fit in arrays, so it is still computed one
+# gameboard at a time.
+#
+# The search takes the states out of the frontier a batch at a time, all
+# with the smallest f_n, the smaller h_n first; a goal state taken out is
+# then no longer than any other as in astar_search(). Only the table of the
+# best g_n of every gameboard and the parents are kept in dictionaries,
+# keyed by the offsets packed in one integer.
+
+
+
+
+# The vehicle offsets of a batch of gameboards and the tables to compute
+# their moves and heuristics
+#   @param:
+#   table: the rushhour.VehicleTable of the initial board
+class VectorTable(object):
+    def __init__(self, table):
+        self.table = table
+        shape = table.shape
+        self.shape = shape
+        self.count = len(table.ids)
+        self.size = shape.size
+        self.x = table.x
+        self.horizontal = numpy.array(table.horizontal, dtype=bool)
+        self.length = numpy.array(table.length, dtype=numpy.int64)
+
+        # cells[v]: the cells taken by vehicle v at every offset
+        # entered[v][delta]: the cell entered by the move of vehicle v by
+        #                    delta from every offset, the cell past the
+        #                    last one when there is no such move
+        # exit_cols[v]: the columns taken on the exit row at every offset,
+        #               -1 for none
+        self.cells = []
+        self.entered = []
+        self.exit_cols = []
+        for v in range(self.count):
+            self.cells.append(numpy.array(table.cells[v], dtype=numpy.int64))
+            entered = {-1: [], 1: []}
+            for offset in range(len(table.cells[v])):
+                for delta in (-1, 1):
+                    entered[delta].append(self.size)
+                for delta, row, bit in table.moves[v][offset]:
+                    entered[delta][-1] = row * shape.width + \
+                                         bit.bit_length() - 1
+            self.entered.append({delta: numpy.array(cells, dtype=numpy.int64)
+                                 for delta, cells in entered.items()})
+            cols = [list(c) + [-1] * (table.length[v] - len(c))
+                    for c in table.exit_cols[v]]
+            self.exit_cols.append(numpy.array(cols, dtype=numpy.int64))
+
+        # The offsets are packed into one integer key when they fit
+        bits = max(1, (max(table.lane_length) - 1).bit_length())
+        self.packed = bits * self.count <= 63
+        self.shifts = numpy.arange(self.count, dtype=numpy.uint64) * \
+                      numpy.uint64(bits)
+
+    # Returns the keys of the gameboards of a batch, as a list
+    def keys(self, batch):
+        if self.packed:
+            return numpy.bitwise_or.reduce(
+                batch.astype(numpy.uint64) << self.shifts, axis=1).tolist()
+        return [row.tobytes() for row in batch]
+
+    # Returns the occupancy of a batch, one more column standing for the
+    # cells off the board, and the vehicle in every cell (-1 for none)
+    def occupancy(self, batch):
+        n = len(batch)
+        occupied = numpy.zeros((n, self.size + 1), dtype=bool)
+        occupied[:, self.size] = True
+        owner = numpy.full((n, self.size + 1), -1, dtype=numpy.int64)
+        rows = numpy.arange(n)[:, None]
+        for v in range(self.count):
+            taken = self.cells[v][batch[:, v]]
+            occupied[rows, taken] = True
+            owner[rows, taken] = v
+        return occupied, owner
+
+    # This function finds the one-cell moves of a batch
+    #   @param:
+    #   batch: the gameboards
+    #   occupied: the occupancy of the batch
+    #
+    #   returns (children, parents, vehicles, deltas): the gameboards
+    #   reached, the row of the batch each comes from and the move
+    def successors(self, batch, occupied):
+        rows = numpy.arange(len(batch))
+        children = []
+        parents = []
+        vehicles = []
+        deltas = []
+        for v in range(self.count):
+            offsets = batch[:, v]
+            for delta in (-1, 1):
+                legal = numpy.nonzero(
+                    ~occupied[rows, self.entered[v][delta][offsets]])[0]
+                if len(legal) == 0:
+                    continue
+                moved = batch[legal]
+                moved[:, v] += delta if delta > 0 else 255
+                children.append(moved)
+                parents.append(legal)
+                vehicles.append(numpy.full(len(legal), v))
+                deltas.append(numpy.full(len(legal), delta))
+        if not children:
+            empty = numpy.zeros(0, dtype=numpy.int64)
+            return numpy.zeros((0, self.count), dtype=numpy.uint8), \
+                   empty, empty, empty
+        return numpy.concatenate(children), numpy.concatenate(parents), \
+               numpy.concatenate(vehicles), numpy.concatenate(deltas)
+
+    # Returns whether every gameboard of a batch satisfies reach_goal
+    def reach_goal(self, batch):
+        table = self.table
+        goal = batch[:, self.x] + table.length[self.x] == self.shape.width
+        clear = numpy.ones(len(batch), dtype=bool)
+        for v in table.crossing:
+            clear &= self.exit_cols[v][batch[:, v], 0] < 0
+        return goal | clear
+
+    # Same values as VehicleTable.blocking_heuristic for a batch
+    def blocking_heuristic(self, batch):
+        x_col = batch[:, self.x].astype(numpy.int64)[:, None]
+        blocking = numpy.zeros(len(batch), dtype=numpy.int64)
+        for v in self.table.crossing:
+            blocking += (self.exit_cols[v][batch[:, v]] > x_col).sum(axis=1)
+        return numpy.where(blocking == 0, 0, blocking + 1)
+
+    # Same values as rushhour.custome_heuristic for a batch
+    # The vehicles standing on the exit row to the right of X are taken one
+    # offset at a time, each offset giving the cells to look at.
+    def custom_heuristic(self, batch, occupied, owner):
+        table = self.table
+        shape = self.shape
+        width = shape.width
+        x = self.x
+        x_length = table.length[x]
+        x_col = batch[:, x].astype(numpy.int64)
+        x_end = x_col + x_length - 1
+        # The steps counted for every cell of X
+        h_n = x_length * (width - 2) - x_length * x_col - \
+              x_length * (x_length - 1) // 2
+
+        for v in table.crossing:
+            offsets = batch[:, v]
+            if table.horizontal[v]:
+                # One step for every cell of the vehicle right of X
+                cols = offsets.astype(numpy.int64)[:, None] + \
+                       numpy.arange(table.length[v])
+                h_n += (cols > x_end[:, None]).sum(axis=1)
+                continue
+            col = table.lane[v]
+            for offset in range(len(table.cells[v])):
+                if not table.exit_cols[v][offset]:
+                    continue
+                rows = numpy.nonzero((offsets == offset) & (col > x_end))[0]
+                if len(rows) == 0:
+                    continue
+                top = offset
+                bottom = offset + table.length[v] - 1
+                if table.length[v] == 3:
+                    h_n[rows] += self.truck_steps(batch, occupied, owner,
+                                                  rows, top, bottom, col)
+                else:
+                    h_n[rows] += self.car_steps(batch, occupied, owner,
+                                                rows, top, bottom, col)
+        return h_n
+
+    # Returns the first and last columns found by find_vehicle_horizontal
+    # from an occupied cell of every row
+    def run(self, batch, owner, rows, cell):
+        owners = owner[rows, cell]
+        col = cell % self.shape.width
+        horizontal = self.horizontal[owners]
+        left = numpy.where(horizontal,
+                           batch[rows, owners].astype(numpy.int64), col)
+        right = numpy.where(horizontal, left + self.length[owners] - 1, col)
+        return left, right
+
+    # Same values as check_truck for the rows of a batch with a vertical
+    # truck from top to bottom in column col
+    def truck_steps(self, batch, occupied, owner, rows, top, bottom, col):
+        shape = self.shape
+        width = shape.width
+        last = width - 1
+        space = shape.exit_row + 1 - top
+        if bottom + space >= shape.height:
+            return bottom + 1 - shape.exit_row
+        steps = numpy.full(len(rows), space, dtype=numpy.int64)
+        for i in range(1, space + 1):
+            row = bottom + i
+            cell = row * width + col
+            blocked = numpy.nonzero(occupied[rows, cell])[0]
+            if len(blocked) == 0:
+                continue
+            at = rows[blocked]
+            left, right = self.run(batch, owner, at, cell)
+            # blocked_blocking_vehicle() checks the cells beside the
+            # blocking vehicle for being free
+            free = ((left == 0) | ~occupied[at, row * width + left - 1]) & \
+                   ((right == last) |
+                    ~occupied[at, row * width + right + 1])
+            middle = (left < col) & (right > col)
+            wall = ~middle & (right == last) & (col != last)
+            steps[blocked] += 1 + free + middle + wall
+        return steps
+
+    # Same values as check_car for the rows of a batch with a vertical car
+    # from top to bottom in column col
+    def car_steps(self, batch, occupied, owner, rows, top, bottom, col):
+        shape = self.shape
+        width = shape.width
+        last = width - 1
+        steps = numpy.ones(len(rows), dtype=numpy.int64)
+        below = numpy.ones(len(rows), dtype=bool)
+
+        if top == shape.exit_row - 1 and top > 0:
+            row = top - 1
+            cell = row * width + col
+            above = occupied[rows, cell]
+            below = ~above
+            blocked = numpy.nonzero(above)[0]
+            if len(blocked):
+                at = rows[blocked]
+                left, right = self.run(batch, owner, at, cell)
+                stuck = ((left == 0) |
+                         occupied[at, row * width + left - 1]) & \
+                        ((right == last) |
+                         occupied[at, row * width + right + 1])
+                steps[blocked] += 1 + stuck
+
+        if bottom == shape.exit_row + 1 and bottom + 1 < shape.height:
+            blocked = numpy.nonzero(
+                below & occupied[rows, (bottom + 1) * width + col])[0]
+            if len(blocked):
+                at = rows[blocked]
+                steps[blocked] += 1
+                # check_car() looks for the blocking vehicle at the index of
+                # the column, which is the cell of the first row
+                taken = occupied[at, col]
+                stuck = numpy.zeros(len(at), dtype=bool)
+                found = numpy.nonzero(taken)[0]
+                if len(found):
+                    left, right = self.run(batch, owner, at[found], col)
+                    stuck[found] = \
+                        ((left == 0) | occupied[at[found], left - 1]) & \
+                        ((right == last) | occupied[at[found], right + 1])
+                # From a free cell find_vehicle_horizontal() runs over the
+                # free cells up to the next vehicle, past the end of the row
+                free = numpy.nonzero(~taken)[0]
+                if len(free):
+                    after = occupied[at[free], col + 1:self.size + 1]
+                    end = (col + numpy.argmax(after, axis=1)) % width
+                    stuck[free] = (end == last) | occupied[at[free], end + 1]
+                steps[blocked] += stuck
+        return steps
+
+    # Returns the h_n of every gameboard of a batch
+    def heuristic(self, heuristic, batch):
+        if heuristic == 0:
+            return self.blocking_heuristic(batch)
+        if heuristic == 1:
+            occupied, owner = self.occupancy(batch)
+            return self.custom_heuristic(batch, occupied, owner)
+        table = self.table
+        return numpy.array([table.blocker_graph_heuristic(row.tobytes(),
+                                                            heuristic == 3)
+                            for row in batch], dtype=numpy.int64)
+
+
+
+
+# This function runs the batched A* search
+#   @param:
+#   heuristic: the choice of heuristic to use in the search
+#   backend: the board representation (see rushhour.StringBackend), the
+#            batches always hold the offsets of the vehicles
+#   batch_size: the largest number of states expanded at once
+#
+#   info reports the number of batches expanded and the largest one
+def vectorized_search(heuristic, backend, batch_size=1024):
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    table = backend.table
+    vectors = VectorTable(table)
+    start = numpy.frombuffer(table.start, dtype=numpy.uint8)[None, :].copy()
+    start_key = vectors.keys(start)[0]
+
+    # best: the smallest g_n every gameboard was reached with
+    # parents: the parent key and the move reaching every gameboard
+    # expanded: the g_n every expanded gameboard was expanded with
+    # buckets: the waiting states by f_n and then h_n, as lists of
+    #          (gameboards, g_n, keys)
+    best = {start_key: 0}
+    parents = {start_key: None}
+    expanded = {}
+    h_n = int(vectors.heuristic(heuristic, start)[0])
+    buckets = {h_n: {h_n: [(start, [0], [start_key])]}}
+    generated = 1
+    batches = 0
+    largest = 0
+
+    while buckets:
+        # Takes up to batch_size states of the smallest f_n, skipping the
+        # ones reached since through a shorter path
+        f_n = min(buckets)
+        layer = buckets[f_n]
+        boards = []
+        g_ns = []
+        keys = []
+        while layer and len(keys) < batch_size:
+            h_n = min(layer)
+            chunks = layer[h_n]
+            chunk, chunk_g, chunk_keys = chunks.pop()
+            if not chunks:
+                del layer[h_n]
+            keep = [i for i in range(len(chunk_keys))
+                    if best[chunk_keys[i]] == chunk_g[i] and
+                    expanded.get(chunk_keys[i]) != chunk_g[i]]
+            if len(keep) < len(chunk_keys):
+                chunk = chunk[keep]
+                chunk_g = [chunk_g[i] for i in keep]
+                chunk_keys = [chunk_keys[i] for i in keep]
+            boards.append(chunk)
+            g_ns += chunk_g
+            keys += chunk_keys
+        if not layer:
+            del buckets[f_n]
+        if not keys:
+            continue
+        batch = numpy.concatenate(boards)
+
+        goals = numpy.nonzero(vectors.reach_goal(batch))[0]
+        if len(goals):
+            moves = trace(parents, keys[goals[0]])
+            return moves, len(expanded), generated, \
+                   {"batches": batches, "largest_batch": largest}
+
+        for i in range(len(keys)):
+            expanded[keys[i]] = g_ns[i]
+        batches += 1
+        largest = max(largest, len(keys))
+
+        occupied, owner = vectors.occupancy(batch)
+        children, rows, vehicles, deltas = vectors.successors(batch,
+                                                              occupied)
+        # Drops the children already reached with as few moves
+        child_keys = vectors.keys(children)
+        keep = []
+        child_g = []
+        for i in range(len(child_keys)):
+            g_n = g_ns[rows[i]] + 1
+            known = best.get(child_keys[i])
+            if known is not None and known <= g_n:
+                continue
+            best[child_keys[i]] = g_n
+            parents[child_keys[i]] = (keys[rows[i]], int(vehicles[i]),
+                                      int(deltas[i]))
+            keep.append(i)
+            child_g.append(g_n)
+        if not keep:
+            continue
+        children = children[keep]
+        child_keys = [child_keys[i] for i in keep]
+        generated += len(keep)
+
+        h_ns = vectors.heuristic(heuristic, children)
+        f_ns = h_ns + numpy.array(child_g)
+        # Files the children by (f_n, h_n) in as few chunks as possible
+        order = numpy.lexsort((h_ns, f_ns))
+        pairs = numpy.stack((f_ns[order], h_ns[order]), axis=1)
+        starts = numpy.nonzero(numpy.any(pairs[1:] != pairs[:-1],
+                                         axis=1))[0] + 1
+        for group in numpy.split(order, starts):
+            f_child = int(f_ns[group[0]])
+            h_child = int(h_ns[group[0]])
+            buckets.setdefault(f_child, {}).setdefault(h_child, []).append(
+                (children[group], [child_g[i] for i in group],
+                 [child_keys[i] for i in group]))
+
+    return None, len(expanded), generated, \
+           {"batches": batches, "largest_batch": largest}
+
+
+# Returns the list of (vehicle, delta) moves from the initial board to the
+# gameboard of a key
+def trace(parents, key):
+    moves = []
+    while parents[key] is not None:
+        key, vehicle, delta = parents[key]
+        moves.append((vehicle, delta))
+    moves.reverse()
+    return moves